@@ -100,23 +100,18 @@ class TimeseriesMetricsAdapter(ABCAsynchronous):
     def launch(self, time_series, algorithms = None):
         """ 
         Launch algorithm and build results. 
+        The input TimeSeries is read from disk only once. Each selected metric gets its own copy of the data
+        (the last one gets the data as read), thus a metric changing its input can not alter the input of the next ones.
         """
         if algorithms is None:
             algorithms = self.available_algorithms.keys()
         shape = time_series.read_data_shape()
         log_debug_array(LOG, time_series, "time_series")
         
-        metrics_results = {}
+        ##-------------------- Fill Algorithms for Analysis ------------------##
+        accepted_algorithms = []
         for algorithm_name in algorithms:
-            ##------------- NOTE: Assumes 4D, Simulator timeSeries. --------------##
-            node_slice = [slice(shape[0]), slice(shape[1]), slice(shape[2]), slice(shape[3])]
-            
-            ##---------- Iterate over slices and compose final result ------------##
             unstored_ts = TimeSeries(use_storage=False)
-            
-            unstored_ts.data = time_series.read_data_slice(tuple(node_slice))
-            
-            ##-------------------- Fill Algorithm for Analysis -------------------##
             algorithm = self.available_algorithms[algorithm_name](time_series=unstored_ts)
             ## Validate that current algorithm's filter is valid.
             if (algorithm.accept_filter is not None and 
@@ -124,9 +119,20 @@ class TimeseriesMetricsAdapter(ABCAsynchronous):
                 LOG.warning('Measure algorithm will not be computed because of incompatibility on input. '
                             'Filters failed on algo: '+ str(algorithm_name))
                 continue
+            accepted_algorithms.append((algorithm_name, algorithm, unstored_ts))
+        
+        metrics_results = {}
+        if len(accepted_algorithms) > 0:
+            ##------------- NOTE: Assumes 4D, Simulator timeSeries. --------------##
+            node_slice = [slice(shape[0]), slice(shape[1]), slice(shape[2]), slice(shape[3])]
+            input_data = time_series.read_data_slice(tuple(node_slice))
+            
+        for idx, (algorithm_name, algorithm, unstored_ts) in enumerate(accepted_algorithms):
+            LOG.debug("Applying measure: "+ str(algorithm_name))
+            if idx < len(accepted_algorithms) - 1:
+                unstored_ts.data = input_data.copy()
             else:
-                LOG.debug("Applying measure: "+ str(algorithm_name))
-                
+                unstored_ts.data = input_data
             unstored_result = algorithm.evaluate()
             ##----------------- Prepare a Float object for result ----------------##
             metrics_results[algorithm_name] = unstored_result
@@ -34,6 +34,7 @@ from tvb.adapters.exporters.exceptions import ExportException, InvalidExportData
 from tvb.basic.config.settings import TVBSettings as cfg
 from tvb.core.entities.model.model_burst import BURST_INFO_FILE, BURSTS_DICT_KEY, DT_BURST_MAP
 from tvb.core.entities.file.fileshelper import FilesHelper
+from tvb.core.entities.file.zipstream import ZipStreamer, ZipMember
 from tvb.core.entities.transient.burst_export_entities import BurstInformation, WorkflowInformation
 from tvb.core.entities.transient.burst_export_entities import WorkflowStepInformation, WorkflowViewStepInformation
 from tvb.core.entities.storage import dao
@@ -42,6 +43,8 @@ from tvb.basic.logger.builder import get_logger
 LOG = get_logger(__name__)
 BURST_PAGE_SIZE = 100
 DATAYPES_PAGE_SIZE = 100
+## Project exports currently running in this process {project_id: (processed bytes, total bytes)}
+EXPORTS_PROGRESS = {}
 
 class ExportManager:
     """
@@ -144,8 +147,63 @@ class ExportManager:
         Given a project root and the TVB storage_path, create a ZIP
         ready for export.
         :param project: project object which identifies project to be exported
-        :param project)name: name of the project to be exported
-        :param export_folder: folder where to store export result( e.g zip file)
+        :returns: path of the ZIP file
+        """
+        zip_file_name, members = self._prepare_project_export(project)
+        export_folder = self._build_data_export_folder(project)    
+        result_path = os.path.join(export_folder, zip_file_name) 
+        
+        # pack project content into a ZIP file
+        zip_content = ZipStreamer().stream(members, self._progress_callback(project.id))
+        with open(result_path, 'wb') as zip_file:
+            for block in self._track_progress(project.id, zip_content):
+                zip_file.write(block)
+        return result_path
+    
+    
+    def stream_project(self, project):
+        """
+        Same as export_project, but the ZIP is produced as a sequence of strings 
+        (e.g. sent directly in the HTTP response), without writing it on disk.
+        :param project: project object which identifies project to be exported
+        :returns: tuple (ZIP file name, generator of the archive content)
+        """
+        zip_file_name, members = self._prepare_project_export(project)
+        zip_content = ZipStreamer().stream(members, self._progress_callback(project.id))
+        return zip_file_name, self._track_progress(project.id, zip_content)
+    
+    
+    @staticmethod
+    def get_export_progress(project_id):
+        """
+        :returns: tuple (processed bytes, total bytes) for the project export currently running, or None.
+        """
+        return EXPORTS_PROGRESS.get(project_id)
+    
+    
+    @staticmethod
+    def _progress_callback(project_id):
+        """ Function recording the progress of the export for a project. """
+        def _update(processed_size, total_size):
+            EXPORTS_PROGRESS[project_id] = (processed_size, total_size)
+        return _update
+    
+    
+    @staticmethod
+    def _track_progress(project_id, content):
+        """ Forget the progress of an export, once its content was produced (or the client gave up). """
+        EXPORTS_PROGRESS[project_id] = (0, None)
+        try:
+            for block in content:
+                yield block
+        finally:
+            EXPORTS_PROGRESS.pop(project_id, None)
+    
+    
+    def _prepare_project_export(self, project):
+        """
+        Gather bursts information and the list of files to be exported for a project.
+        :returns: tuple (ZIP file name, list of ZipMember)
         """
         if project is None:
             raise ExportException("Please provide project to be exported")
@@ -168,26 +226,18 @@ class ExportManager:
                 datatype_burst_mapping[datatype.gid] = datatype.fk_parent_burst
         
             
-        # Compute path and name of the zip file
+        # Compute name of the zip file
         now = datetime.now()
         date_str = now.strftime("%Y-%m-%d_%H-%M")
         zip_file_name = "%s_%s.%s" % (date_str, project.name, self.ZIP_FILE_EXTENSION)
         
-        export_folder = self._build_data_export_folder(project)    
-        result_path = os.path.join(export_folder, zip_file_name) 
-        
-        bursts_file_name = os.path.join(project_folder, BURST_INFO_FILE)
+        # Bursts information is written only in the export archive, not in the project folder.
         burst_info = {BURSTS_DICT_KEY : bursts_dict,
                       DT_BURST_MAP : datatype_burst_mapping}
-        with open(bursts_file_name, 'w') as bursts_file:
-            bursts_file.write(json.dumps(burst_info))
-            
-        # pack project content into a ZIP file
-        result_zip = files_helper.zip_folder(result_path, project_folder)
-        
-        # remove these files, since we only want them in export archive
-        os.remove(bursts_file_name)
-        return result_zip
+        members = [member for member in ZipStreamer.folder_members(project_folder) 
+                   if member.archive_name != BURST_INFO_FILE]
+        members.append(ZipMember(BURST_INFO_FILE, data=json.dumps(burst_info)))
+        return zip_file_name, members
     
     
     def _build_workflow_step_info(self, workflow):
@@ -37,6 +37,7 @@ from tvb.simulator.monitors import Monitor
 from tvb.simulator.integrators import Integrator
 from tvb.simulator.coupling import Coupling
 from tvb.simulator.noise import Noise
+from tvb.basic.config.settings import TVBSettings as cfg
 from tvb.core.adapters.abcadapter import ABCAsynchronous
 from tvb.core.adapters.exceptions import LaunchException
 from tvb.basic.traits.parameters_factory import get_traited_subclasses
@@ -150,6 +151,11 @@ class SimulatorAdapter(ABCAsynchronous):
         self.log.debug("%s: Initializing Coupling..." % str(self))
         coupling_inst = self.available_couplings[str(coupling)](**coupling_parameters)
         
+        ## Arrays read from H5 are shared (read-only) between instances, but the simulator may change its inputs.
+        connectivity.detach_cached_arrays()
+        if surface is not None:
+            surface.detach_cached_arrays()
+        
         self.log.debug("Initializing Cortex...")
         if surface is not None and surface_parameters is not None:
             cortex_entity = Cortex(use_storage=False).populate_cortex(surface, surface_parameters)
@@ -247,30 +253,42 @@ class SimulatorAdapter(ABCAsynchronous):
                 selected_state_vars = [self.algorithm.model.state_variables[idx] 
                                        for idx in self.algorithm.monitors[m_ind].voi]
                 result_datatypes[m_name].labels_dimensions = {result_datatypes[m_name].labels_ordering[1]: selected_state_vars}
+            ## Keep integrating while previous results are written to disk.
+            result_datatypes[m_name].enable_async_writes(cfg.SIMULATION_WRITE_QUEUE_SIZE)
         
         #### Create Simulator State entity and persist it in DB. H5 file will be empty now.
         simulation_state = SimulationState(storage_path=self.storage_path)
         self._capture_operation_results([simulation_state])
         
         ### Run simulation
-        self.log.debug("%s: Starting simulation..." % str(self))
-        for result in self.algorithm(simulation_length = simulation_length):
-            for j in range(len(monitors)):
-                if result[j] is not None:
-                    expected_rows = int(simulation_length / result_datatypes[monitors[j]].sample_period)
-                    result_datatypes[monitors[j]].write_time_slice([result[j][0]], expected_rows)
-                    result_datatypes[monitors[j]].write_data_slice([result[j][1]], expected_rows)
-        
-        self.log.debug("%s: Completed simulation, starting to store simulation state " % str(self))
-        ### Populate H5 file for simulator state. This step could also be done while running sim, in background.
-        simulation_state.populate_from(self.algorithm)
-        self._capture_operation_results([simulation_state])
+        close_errors = []
+        try:
+            self.log.debug("%s: Starting simulation..." % str(self))
+            for result in self.algorithm(simulation_length = simulation_length):
+                for j in range(len(monitors)):
+                    if result[j] is not None:
+                        expected_rows = int(simulation_length / result_datatypes[monitors[j]].sample_period)
+                        result_datatypes[monitors[j]].write_time_slice([result[j][0]], expected_rows)
+                        result_datatypes[monitors[j]].write_data_slice([result[j][1]], expected_rows)
+            
+            self.log.debug("%s: Completed simulation, starting to store simulation state " % str(self))
+            ### Populate H5 file for simulator state. This step could also be done while running sim, in background.
+            simulation_state.populate_from(self.algorithm)
+            self._capture_operation_results([simulation_state])
+        finally:
+            ## Stop background writers and give files back, also when the simulation fails 
+            ## (worker processes are reused for the next operations).
+            for result in result_datatypes.values():
+                try:
+                    result.close_file()
+                except Exception, excep:
+                    self.log.exception(excep)
+                    close_errors.append(excep)
+        if close_errors:
+            raise close_errors[0]
         
         self.log.debug("%s: Simulation state persisted, returning results " % str(self))
-        final_results = []
-        for result in result_datatypes.values():
-            result.close_file()
-            final_results.append(result)
+        final_results = result_datatypes.values()
         self.log.info("%s: Adapter simulation finished!!" % str(self))
         return final_results
     
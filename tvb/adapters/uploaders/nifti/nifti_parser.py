@@ -22,7 +22,10 @@
 .. moduleauthor:: Calin Pavel <calin.pavel@codemart.ro>
 """
 import os
+import gzip
+import numpy
 import nibabel as nib
+from tvb.basic.config.settings import TVBSettings as cfg
 from tvb.basic.logger.builder import get_logger
 from tvb.core.adapters.exceptions import ParseException
 from tvb.datatypes.time_series import TimeSeriesVolume
@@ -80,12 +83,15 @@ class NIFTIParser():
         has_time_dimension = len(nifti_data_shape) > 3
         time_dim_size = nifti_data_shape[3] if has_time_dimension else 1
         
-        nifti_data = nifti_image.get_data()
-        if has_time_dimension:
+        if len(nifti_data_shape) == 4:
+            self._write_time_blocks(nifti_image, data_file, time_series)
+        elif has_time_dimension:
+            # Time is not the slowest varying dimension on disk, so frames are not contiguous.
+            nifti_data = nifti_image.get_data()
             for i in range(time_dim_size):
                 time_series.write_data_slice([nifti_data[:, :, :, i, ...]])
         else:
-            time_series.write_data_slice([nifti_data])
+            time_series.write_data_slice([nifti_image.get_data()])
         time_series.close_file() # Force closing HDF5 file 
             
         # Extract sample unit measure
@@ -105,4 +111,61 @@ class NIFTIParser():
         # Get voxtel dimensions for x,y, z
         volume.voxel_size = [zooms[0], zooms[1], zooms[2]]
         
-        return time_series      
+        return time_series
+    
+    
+    def _write_time_blocks(self, nifti_image, data_file, time_series):
+        """
+        Copy a 4D image into the TimeSeries, in blocks of consecutive time frames.
+        NIFTI data is stored in Fortran order, thus each frame (the volume at one time point) is contiguous 
+        on disk and frames can be read sequentially, from a plain or from a gzip compressed file, 
+        without having the entire image in memory.
+        """
+        nifti_image_hdr = nifti_image.get_header()
+        data_shape = nifti_image_hdr.get_data_shape()
+        data_type = nifti_image_hdr.get_data_dtype()
+        frame_shape = tuple(data_shape[:3])
+        frame_bytes = int(numpy.prod(frame_shape)) * data_type.itemsize
+        frames_per_block = max(1, int(cfg.NIFTI_IMPORT_BLOCK_SIZE * 1024 * 1024 / max(frame_bytes, 1)))
+        slope, inter = nifti_image_hdr.get_slope_inter()
+        is_scaled = slope is not None and (slope != 1.0 or (inter is not None and inter != 0.0))
+        
+        image_file = self._get_image_file_name(nifti_image, data_file)
+        self.logger.debug("Importing %d frames from %s, in blocks of %d frames." % (data_shape[3], image_file, 
+                                                                                    frames_per_block))
+        # Next block is read from file, while the previous one is written in H5.
+        time_series.enable_async_writes(1)
+        if image_file.endswith('.gz'):
+            file_reader = gzip.open(image_file, 'rb')
+        else:
+            file_reader = open(image_file, 'rb')
+        try:
+            file_reader.seek(nifti_image_hdr.get_data_offset())
+            for start in xrange(0, data_shape[3], frames_per_block):
+                nr_frames = min(frames_per_block, data_shape[3] - start)
+                raw_block = file_reader.read(nr_frames * frame_bytes)
+                if len(raw_block) < nr_frames * frame_bytes:
+                    raise ParseException("File %s is truncated. Expected %d time frames." % (data_file, data_shape[3]))
+                # Inside a frame X varies fastest, then Y and Z.
+                block = numpy.frombuffer(raw_block, data_type).reshape((nr_frames,) + frame_shape[::-1])
+                block = numpy.ascontiguousarray(block.transpose(0, 3, 2, 1), dtype=data_type.newbyteorder('='))
+                if is_scaled:
+                    block = block * slope + (inter or 0.0)
+                time_series.write_data_slice(block, data_shape[3])
+        finally:
+            try:
+                file_reader.close()
+            finally:
+                ## Stop the background writer (and release the H5 file), also for a truncated file.
+                time_series.close_file()
+    
+    
+    @staticmethod
+    def _get_image_file_name(nifti_image, data_file):
+        """
+        Path of the file holding image data (different than the header file, for .hdr/.img pairs).
+        """
+        try:
+            return nifti_image.file_map['image'].filename or data_file
+        except (AttributeError, KeyError):
+            return data_file      
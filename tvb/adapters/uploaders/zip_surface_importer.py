@@ -23,8 +23,10 @@
 .. moduleauthor:: Bogdan Neacsa <bogdan.neacsa@codemart.ro>
 """
 import numpy
+import zipfile
+from StringIO import StringIO
+from multiprocessing.pool import ThreadPool
 from tvb.core.adapters.abcadapter import ABCSynchronous
-from tvb.core.entities.file.fileshelper import FilesHelper
 from tvb.datatypes.surfaces import Surface, CorticalSurface, SkinAir, BrainSkull, SkullSkin, EEGCap, FaceSurface
 from tvb.datatypes.surfaces_data import CORTICAL, OUTER_SKIN, OUTER_SKULL, INNER_SKULL, EEG_CAP, FACE
 from tvb.core.adapters.exceptions import LaunchException
@@ -44,6 +46,8 @@ class ZIPSurfaceImporter(ABCSynchronous):
     VERTICES_TOKEN = "vertices"
     NORMALS_TOKEN = "normals"
     TRIANGLES_TOKEN = "triangles"
+    ## Maximum number of archive members parsed at the same time.
+    MAX_PARSING_THREADS = 4
         
     def __init__(self):
         ABCSynchronous.__init__(self)
@@ -83,22 +87,26 @@ class ZIPSurfaceImporter(ABCSynchronous):
 
     def launch(self, uploaded, surface_type, zero_based_triangles = False):
         """
-        Execute import operations: unpack ZIP and build Surface object as result.
+        Execute import operations: read files from ZIP and build Surface object as result.
         """
         if uploaded is None:
             raise LaunchException ("Please select ZIP file which contains data to import")
   
         self.logger.debug("Start to import surface: '%s' from file: %s"%(surface_type, uploaded))
         try:
-            files = FilesHelper().unpack_zip(uploaded, self.storage_path)
+            zip_archive = zipfile.ZipFile(uploaded)
         except IOError:
             exception_str = "Did not find the specified ZIP at %s" % uploaded
             raise LaunchException(exception_str)
+        except zipfile.BadZipfile:
+            raise LaunchException("Invalid ZIP file %s" % uploaded)
         
         vertices = []
         normals = []
         triangles = []
-        for file_name in files:
+        for file_name in zip_archive.namelist():
+            if file_name.endswith('/'):
+                continue
             if file_name.lower().find(self.VERTICES_TOKEN) >= 0:
                 vertices.append(file_name)            
                 continue
@@ -128,8 +136,10 @@ class ZIPSurfaceImporter(ABCSynchronous):
             
         surface.storage_path = self.storage_path
 
-        all_vertices, all_normals, all_triangles = self._process_files(vertices, normals, triangles)
-        FilesHelper.remove_files(files, True)
+        try:
+            all_vertices, all_normals, all_triangles = self._process_files(zip_archive, vertices, normals, triangles)
+        finally:
+            zip_archive.close()
         surface.zero_based_triangles = zero_based_triangles
         surface.vertices = all_vertices
         surface.vertex_normals = all_normals
@@ -161,36 +171,68 @@ class ZIPSurfaceImporter(ABCSynchronous):
 
 
     @staticmethod
-    def _process_files(list_of_vertices, list_of_normals, list_of_triangles):
+    def _process_files(zip_archive, list_of_vertices, list_of_normals, list_of_triangles):
         """
-        Read vertices, normals and triangles from files.
+        Read vertices, normals and triangles from files in the ZIP archive.
+        Archive members are parsed in parallel threads, directly from the ZIP (no extraction on disk). 
+        Triangles from each file are shifted with the number of vertices in the previous files.
         """
         if len(list_of_vertices) != len(list_of_normals) != len(list_of_triangles):
             raise Exception("The number of vertices files should be equal to the normals/triangles files.")
-        vertices = []
-        normals = []
-        triangles = []
-        vertices_files_lengths = []
+        
+        jobs = ([(zip_archive, file_name, numpy.float32) for file_name in list_of_vertices + list_of_normals] + 
+                [(zip_archive, file_name, numpy.int32) for file_name in list_of_triangles])
+        nr_threads = max(1, min(ZIPSurfaceImporter.MAX_PARSING_THREADS, len(jobs)))
+        pool = ThreadPool(nr_threads)
+        try:
+            results = pool.map(_read_matrix, jobs)
+        finally:
+            pool.close()
+            pool.join()
+        nr_vertices_files = len(list_of_vertices)
+        vertices = results[:nr_vertices_files]
+        normals = results[nr_vertices_files: nr_vertices_files + len(list_of_normals)]
+        triangles = results[nr_vertices_files + len(list_of_normals):]
+        
+        ## Offset of each triangles file, is the number of vertices in all previous vertices files.
+        offsets = numpy.cumsum([0] + [len(current_vertices) for current_vertices in vertices])
+        triangles = [current_triangles.astype(numpy.int64) + offsets[i] 
+                     for i, current_triangles in enumerate(triangles)]
+        
+        return (_concatenate(vertices, numpy.float64), 
+                _concatenate(normals, numpy.float64), 
+                _concatenate(triangles, numpy.int64))
     
-        for i in range(len(list_of_vertices)):
-            current_vertices = numpy.loadtxt(list_of_vertices[i], dtype=numpy.float32)
-            current_normals = numpy.loadtxt(list_of_normals[i], dtype=numpy.float32)
-            vertices_files_lengths.append(len(current_vertices))
-            vertices.extend(current_vertices)
-            normals.extend(current_normals)
     
-        increment_value = 0
-        for i in range(len(list_of_triangles)):
-            current_triangles = numpy.loadtxt(list_of_triangles[i], dtype=numpy.int32)
-            if not i:
-                triangles.extend(current_triangles)
-                continue
-            increment_value = increment_value + vertices_files_lengths[i - 1]
-            for j in range(len(current_triangles)):
-                current_triangles[j] = current_triangles[j] + increment_value
-            triangles.extend(current_triangles)
     
-        return (numpy.array(vertices, dtype=numpy.float64), 
-                numpy.array(normals, dtype=numpy.float64), 
-                numpy.array(triangles, dtype=numpy.int64))
+def _read_matrix(job):
+    """
+    Parse one text member of the ZIP archive, into a 2D array of the given type.
+    The whole buffer is parsed by numpy in C; when the content is not a plain 
+    whitespace separated matrix (e.g. it has comments), we fall back on numpy.loadtxt.
+    """
+    zip_archive, file_name, dtype = job
+    content = zip_archive.read(file_name)
+    lines = [line for line in content.splitlines() if line.strip()]
+    if not lines:
+        return numpy.array([], dtype=dtype)
+    nr_columns = len(lines[0].split())
+    try:
+        values = numpy.fromstring(content, dtype=dtype, sep=' ')
+    except ValueError:
+        ## Newer numpy versions refuse text which can not be fully parsed, instead of stopping early.
+        values = None
+    if values is None or values.size != nr_columns * len(lines):
+        return numpy.loadtxt(StringIO(content), dtype=dtype, ndmin=2)
+    return values.reshape((len(lines), nr_columns))
 
+
+
+def _concatenate(arrays, dtype):
+    """
+    Join arrays read from multiple files, on the first dimension.
+    """
+    arrays = [one_array for one_array in arrays if one_array.size]
+    if not arrays:
+        return numpy.array([], dtype=dtype)
+    return numpy.concatenate(arrays).astype(dtype)
@@ -26,13 +26,85 @@
 """
 
 import json
+import threading
+from collections import OrderedDict
 from tvb.core.entities import model
 from tvb.core.entities.storage import dao
-from tvb.core.entities.transient.pse import ContextPSE
+from tvb.core.entities.transient.pse import ContextPSE, PSE_RESULTS_CACHE, PSE_RESULTS_LOCK
 from tvb.core.adapters.abcdisplayer import ABCDisplayer
 from tvb.datatypes.mapped_values import DatatypeMeasure
 
 
+
+class PSEGroupResults(object):
+    """
+    Operations of a group, with their result and measure, as read from DB.
+    On refresh, only operations which were not complete at the previous refresh are read again 
+    (finished operations and their results do not change afterwards).
+    """
+    
+    def __init__(self, operation_group_id):
+        self.operation_group_id = operation_group_id
+        self.rows = OrderedDict()
+        self._incomplete_ids = None
+        self._lock = threading.Lock()
+        
+        
+    def refresh(self):
+        """
+        :return: list of tuples (operation, datatype, measure), for all operations in the group
+        """
+        self._lock.acquire()
+        try:
+            if self._incomplete_ids is None or len(self._incomplete_ids) > 0:
+                new_rows = dao.get_results_for_operation_group(self.operation_group_id, DatatypeMeasure, 
+                                                               self._incomplete_ids)
+                if new_rows is None:
+                    raise Exception("Could not read operations for group %s" % str(self.operation_group_id))
+                for row in new_rows:
+                    self.rows[row[0].id] = row
+                self._incomplete_ids = [op_id for op_id, row in self.rows.iteritems() if not self._is_complete(*row)]
+            return self.rows.values()
+        finally:
+            self._lock.release()
+            
+            
+    @staticmethod
+    def _is_complete(operation, _datatype, measure):
+        """
+        An operation needs to be read again, until it failed, or it has its result measured 
+        (metrics are computed by separate operations, after the simulation finished).
+        """
+        if operation.status == model.STATUS_FINISHED:
+            return measure is not None
+        return operation.status in (model.STATUS_ERROR, model.STATUS_CANCELED)
+
+
+
+## Number of most recently displayed groups kept in PSE_RESULTS_CACHE 
+## (e.g. for changing metrics, or refreshing a running PSE).
+PSE_RESULTS_CACHE_SIZE = 10
+
+
+
+def get_group_results(datatype_group):
+    """
+    :return: PSEGroupResults instance for the given DataTypeGroup, from cache when available.
+             Cache is indexed by GID, as IDs might get reused after a group is removed.
+    """
+    PSE_RESULTS_LOCK.acquire()
+    try:
+        group_results = PSE_RESULTS_CACHE.pop(datatype_group.gid, None)
+        if group_results is None:
+            group_results = PSEGroupResults(datatype_group.fk_operation_group)
+        PSE_RESULTS_CACHE[datatype_group.gid] = group_results
+        while len(PSE_RESULTS_CACHE) > PSE_RESULTS_CACHE_SIZE:
+            PSE_RESULTS_CACHE.popitem(last=False)
+        return group_results
+    finally:
+        PSE_RESULTS_LOCK.release()
+
+
 class ParameterExplorationAdapter(ABCDisplayer):
     """
     Visualization adapter for Parameter Space Exploration.
@@ -101,20 +173,18 @@ class ParameterExplorationAdapter(ABCDisplayer):
         pse_context = ContextPSE(datatype_group_id, range1_labels, range2_labels, color_metric, size_metric)  
           
         final_dict = dict()
-        operations = dao.get_operations_in_group(operation_group.id)
-        for operation_ in operations:
+        for operation_, datatype, measure in get_group_results(datatype_group).refresh():
             if operation_.status == model.STATUS_STARTED:
                 pse_context.has_started_ops = True
-            range_values = eval(operation_.range_values)
+            range_values = json.loads(operation_.range_values)
             key_1 = range_values[range1_name]
             key_2 = "_"
             if range2 is not None:
                 key_2 = range_values[range2_name]
-            datatype = None
-            if operation_.status == model.STATUS_FINISHED:
-                datatype = dao.get_results_for_operation(operation_.id)[0]
-                measures = dao.get_generic_entity(DatatypeMeasure, datatype.gid, '_analyzed_datatype')
-                pse_context.prepare_metrics_datatype(measures, datatype)
+            if operation_.status != model.STATUS_FINISHED:
+                datatype = None
+            elif datatype is not None:
+                pse_context.prepare_metrics_datatype([measure] if measure is not None else [], datatype)
             if key_1 not in final_dict:
                 final_dict[key_1] = {key_2 : pse_context.build_node_info(operation_, datatype)}
             else:
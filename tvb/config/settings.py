@@ -113,6 +113,39 @@ class BaseProfile():
     DATA_VERSION = 2
     DATA_VERSION_ATTRIBUTE = "Data_version"
     
+    # Maximum number of H5 files kept open (for faster consecutive reads) by one process.
+    # Files in use are never closed, so this limit can be temporarily exceeded.
+    MAX_OPEN_HDF5_FILES = 64
+    # Number of result chunks a simulation can queue for the background H5 writer, 
+    # before the simulation waits for the disk. Use 0 for synchronous writes.
+    SIMULATION_WRITE_QUEUE_SIZE = 64
+    # 4D NIFTI volumes are imported in blocks of consecutive time frames, of about this size (in MB).
+    NIFTI_IMPORT_BLOCK_SIZE = 64
+    # Processes compressing members of an export ZIP in parallel (0 means one process per CPU core).
+    EXPORT_ZIP_PROCESSES = 0
+    # H5 files are already compressed internally. Unless this is set, they are stored in ZIP exports without deflate.
+    EXPORT_ZIP_DEFLATE_H5 = False
+    # Threads extracting the members of an uploaded ZIP, and reading the metadata of imported H5 files, in parallel.
+    IMPORT_THREADS = 4
+    # DataTypes of an imported project are inserted in DB in batches of (at most) this size.
+    IMPORT_DATATYPES_BATCH_SIZE = 200
+    # Operations are launched locally in reusable worker processes. A worker is replaced 
+    # after this number of operations, or when its resident memory grows over the limit (in MB).
+    OPERATION_WORKER_MAX_OPERATIONS = 20
+    OPERATION_WORKER_MAX_MEMORY = 2048
+    # Serialized DataType arrays are kept in memory by the web process, up to this size (in MB).
+    WEB_CACHE_MAX_SIZE = 256
+    # DataType arrays read from H5 are shared between instances with the same GID, up to this size (in MB).
+    ARRAYS_CACHE_MAX_SIZE = 512
+    # Number of seconds a browser can reuse a DataType array, before asking again (with its ETag).
+    WEB_CACHE_MAX_AGE = 3600
+    # Genshi templates are parsed once. When True, templates changed on disk are parsed again.
+    TEMPLATES_AUTO_RELOAD = False
+    # Rendered HTML fragments (e.g. adapter input trees) are kept in memory, up to this size (in MB).
+    TEMPLATE_FRAGMENTS_CACHE_SIZE = 32
+    # Project structure trees (as sent to the browser) are kept in memory, up to this size (in MB).
+    PROJECT_STRUCTURE_CACHE_SIZE = 16
+    
     @ClassProperty
     @staticmethod
     @settings_loaded()
@@ -628,6 +661,8 @@ class DevelopmentProfile(BaseProfile):
     """
     #Logger specific
     LOGGER_CONFIG_FILE_NAME = "dev_logger_config.conf"
+    
+    TEMPLATES_AUTO_RELOAD = True
 
 
 
@@ -45,6 +45,7 @@ from tvb.core.entities.transient.structure_entities import DataTypeMetaData
 from tvb.core.adapters.exceptions import IntrospectionException, InvalidParameterException, LaunchException
 from tvb.core.adapters.exceptions import MethodUnimplementedException, NoMemoryAvailableException
 from tvb.core.adapters.xml_reader import ELEM_OPTIONS, ELEM_OUTPUTS, INPUTS_KEY
+from tvb.core.adapters.backend_client import request_resources_admission
 
 import tvb.basic.traits.traited_interface as interface
 import tvb.core.adapters.xml_reader as xml_reader
@@ -234,6 +235,9 @@ class ABCAdapter(object):
                 raise NoMemoryAvailableException("You only have %s kiloBytes of HDD available but the operation you "
                                                  "launched might require %d. "
                                                  "Stopping execution..."%(available_disk_space, required_disk_space))
+            if not request_resources_admission(operation.id, self.user_id, adapter_required_memory, 
+                                               required_disk_space, available_disk_space):
+                raise LaunchException("Operation was stopped while waiting for resources.")
             operation.start_now()
             operation.result_disk_size = required_disk_space
             operation = dao.store_entity(operation)
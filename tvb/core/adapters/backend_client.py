@@ -24,8 +24,14 @@
 .. moduleauthor:: Yann Gordon <yann@invalid.tvb>
 """
 
-import Queue
+import os
+import sys
+import time
+import heapq
+import psutil
+import itertools
 import threading
+from collections import deque
 from subprocess import Popen, PIPE
 from tvb.basic.profile import TvbProfile as tvb_profile
 from tvb.basic.config.settings import TVBSettings as config
@@ -37,9 +43,179 @@ import tvb.core.utils as utils
 
 LOGGER  = get_logger(__name__)
 CURRENT_ACTIVE_THREADS = []
-LOCKS_QUEUE = Queue.Queue(0)
-for i in range(config.MAX_THREADS_NUMBER):
-    LOCKS_QUEUE.put(1)
+    
+## Command line argument for starting tvb.core.cluster_launcher as a long-living worker,
+## and the line printed by such a worker on its output, after each finished operation.
+WORKER_MODE_PARAM = 'worker'
+WORKER_DONE_MARKER = 'TVB_OPERATION_DONE'
+## Line printed by a worker when an operation declared its resources, and the answer 
+## expected from the parent process, when the operation is allowed to continue.
+WORKER_RESOURCES_MARKER = 'TVB_OPERATION_RESOURCES'
+WORKER_ADMITTED_ANSWER = 'ADMITTED'
+## Set to True in the worker processes (see tvb.core.cluster_launcher).
+IS_OPERATIONS_WORKER = False
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+    
+    
+
+def request_resources_admission(operation_id, user_id, required_memory, required_disk, available_disk):
+    """
+    Called from ABCAdapter, after an operation was configured, but before it starts computing.
+    When executed in a worker process, block until the scheduler from the parent process 
+    admits the operation, based on the declared memory (bytes) and disk (kB) requirements.
+    Otherwise (synchronous operation, cluster node) return immediately.
+    
+    :return: False when the operation was not admitted (e.g. it was stopped meanwhile).
+    """
+    if not IS_OPERATIONS_WORKER:
+        return True
+    ## Start on a new line, in case the operation printed something without line end.
+    sys.stdout.write("\n%s %s %s %d %d %d\n" % (WORKER_RESOURCES_MARKER, operation_id, user_id, max(required_memory, 0),
+                                             max(required_disk, 0), available_disk))
+    sys.stdout.flush()
+    return sys.stdin.readline().strip() == WORKER_ADMITTED_ANSWER
+
+
+
+class _OperationReservation(object):
+    """
+    Resources declared by one operation which currently holds an execution slot.
+    """
+    def __init__(self, operation_id, priority):
+        self.operation_id = operation_id
+        self.priority = priority
+        self.user_id = None
+        self.memory = 0
+        self.disk = 0
+        
+        
+        
+class OperationScheduler(object):
+    """
+    Decide when operations launched on the local machine can run.
+    
+    - At most MAX_THREADS_NUMBER operations hold an execution slot at the same time;
+    - Free slots go first to interactive operations, and only then to batch (PSE) operations, 
+      in the order they were launched;
+    - Once configured, an operation is admitted only when its declared memory fits, together with 
+      the memory declared by the already admitted operations, in the physical memory of the machine,
+      and its declared disk fits in the user's quota. An operation is always admitted when nothing else 
+      is reserved, so the adapter itself reports the requirements it can never satisfy.
+    """
+    
+    ## How often (seconds) an operation waiting for memory checks again the free memory of the machine.
+    RECHECK_INTERVAL = 5
+    
+    def __init__(self, max_running=None, memory_budget=None):
+        self.max_running = max_running
+        self.memory_budget = memory_budget
+        self._condition = threading.Condition(threading.Lock())
+        self._sequence = itertools.count()
+        self._waiting = []
+        self._running = {}
+        self._wait_times = deque(maxlen=100)
+        
+        
+    def acquire_slot(self, operation_id, priority=PRIORITY_INTERACTIVE, is_cancelled=None):
+        """
+        Block until an execution slot is given to this operation.
+        :param is_cancelled: callable, checked while waiting; when it returns True, we stop waiting.
+        :return: True when a slot was acquired, False when cancelled.
+        """
+        start = time.time()
+        entry = (priority, self._sequence.next(), operation_id)
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while self._waiting[0] is not entry or len(self._running) >= self._get_max_running():
+                    if is_cancelled is not None and is_cancelled():
+                        return False
+                    self._condition.wait(self.RECHECK_INTERVAL)
+                self._running[operation_id] = _OperationReservation(operation_id, priority)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._condition.notifyAll()
+        self._wait_times.append(time.time() - start)
+        return True
+    
+    
+    def admit(self, operation_id, user_id, required_memory, required_disk, available_disk, is_cancelled=None):
+        """
+        Block until the declared resources of an operation (holding a slot) can be reserved.
+        :return: True when admitted, False when cancelled.
+        """
+        with self._condition:
+            reservation = self._running.get(operation_id)
+            if reservation is None:
+                return False
+            while not self._resources_fit(reservation, user_id, required_memory, required_disk, available_disk):
+                if is_cancelled is not None and is_cancelled():
+                    return False
+                self._condition.wait(self.RECHECK_INTERVAL)
+            reservation.user_id = user_id
+            reservation.memory = max(required_memory, 0)
+            reservation.disk = max(required_disk, 0)
+        LOGGER.debug("Operation %s admitted with %d bytes of memory and %d kB of disk. Scheduler status %s" % (
+                     operation_id, reservation.memory, reservation.disk, str(self.get_status())))
+        return True
+    
+    
+    def release(self, operation_id):
+        """ Give back the slot (and reserved resources) of a finished operation."""
+        with self._condition:
+            self._running.pop(operation_id, None)
+            self._condition.notifyAll()
+            
+            
+    def wake_up(self):
+        """ Make waiting operations check again their state (e.g. after a stop request)."""
+        with self._condition:
+            self._condition.notifyAll()
+            
+            
+    def get_status(self):
+        """
+        :return: dictionary with current queue depth, running operations, reserved memory and wait times.
+        """
+        with self._condition:
+            waiting_interactive = len([entry for entry in self._waiting if entry[0] == PRIORITY_INTERACTIVE])
+            status = {'waiting_interactive': waiting_interactive,
+                      'waiting_batch': len(self._waiting) - waiting_interactive,
+                      'running': len(self._running),
+                      'reserved_memory': sum(res.memory for res in self._running.values())}
+        wait_times = list(self._wait_times)
+        status['average_wait'] = sum(wait_times) / len(wait_times) if wait_times else 0
+        status['max_wait'] = max(wait_times) if wait_times else 0
+        return status
+    
+    
+    def _get_max_running(self):
+        if self.max_running is None:
+            return config.MAX_THREADS_NUMBER
+        return self.max_running
+    
+    
+    def _resources_fit(self, reservation, user_id, required_memory, required_disk, available_disk):
+        """ Check declared resources against what the other admitted operations reserved."""
+        others = [res for res in self._running.values() if res is not reservation]
+        reserved_memory = sum(res.memory for res in others)
+        if required_memory > 0 and reserved_memory > 0:
+            memory_budget = self.memory_budget
+            if memory_budget is None:
+                memory_budget = psutil.virtual_memory().total
+            if (reserved_memory + required_memory > memory_budget 
+                    or required_memory > psutil.virtual_memory().available):
+                return False
+        reserved_disk = sum(res.disk for res in others if res.user_id == user_id)
+        if required_disk > 0 and reserved_disk > 0 and reserved_disk + required_disk > available_disk:
+            return False
+        return True
+    
+    
+SCHEDULER = OperationScheduler()
     
     
 
@@ -70,6 +246,165 @@ class ClusterSchedulerClient(object):
         thread.start()
 
 
+class OperationWorker(object):
+    """
+    Handle for a long-living Python process (tvb.core.cluster_launcher in worker mode), 
+    which launches operations one after the other, without paying for interpreter start 
+    and TVB imports for every operation.
+    """
+    
+    def __init__(self):
+        command = [config().get_python_path(), '-m', 'tvb.core.cluster_launcher', WORKER_MODE_PARAM]
+        if tvb_profile.CURRENT_SELECTED_PROFILE is not None:
+            command.extend([tvb_profile.SUBPARAM_PROFILE, tvb_profile.CURRENT_SELECTED_PROFILE])
+        self._null_output = open(os.devnull, 'w')
+        self.process = Popen(command, stdin=PIPE, stdout=PIPE, stderr=self._null_output)
+        self.pid = self.process.pid
+        self.executed_operations = 0
+        LOGGER.debug("Started operations worker with pid=%s" % (self.pid,))
+        
+        
+    def is_alive(self):
+        """ Check that the worker process did not exit (or got killed). """
+        return self.process.poll() is None
+    
+    
+    def execute(self, operation_id, admission_callback=None):
+        """
+        Send an operation to the worker, and block until the worker finishes with it.
+        :param admission_callback: callable(user_id, memory, disk, available_disk) returning True 
+            when the operation can continue after declaring its resources
+        :return: True when the operation was finished, False when the worker died meanwhile.
+        """
+        try:
+            self.process.stdin.write("%s\n" % (operation_id,))
+            self.process.stdin.flush()
+            expected_line = "%s %s" % (WORKER_DONE_MARKER, operation_id)
+            ## Any other output written by the operation is ignored.
+            for line in iter(self.process.stdout.readline, ''):
+                line = line.strip()
+                if line == expected_line:
+                    self.executed_operations += 1
+                    return True
+                if line.startswith(WORKER_RESOURCES_MARKER):
+                    values = line.split()[2:]
+                    admitted = True
+                    if admission_callback is not None:
+                        admitted = admission_callback(int(values[0]), *[long(value) for value in values[1:]])
+                    self.process.stdin.write("%s\n" % (WORKER_ADMITTED_ANSWER if admitted else 'CANCELLED'))
+                    self.process.stdin.flush()
+            return False
+        except (IOError, OSError), excep:
+            LOGGER.warning("Operations worker pid=%s died while executing operation %s: %s" % (self.pid, 
+                                                                                          operation_id, excep))
+            return False
+    
+    
+    def memory_usage(self):
+        """
+        :return: resident memory of the worker process (in MB), or None when it could not be read.
+        """
+        try:
+            process = psutil.Process(self.pid)
+            if hasattr(process, 'memory_info'):
+                return process.memory_info().rss / 2 ** 20
+            return process.get_memory_info().rss / 2 ** 20
+        except Exception, excep:
+            LOGGER.debug("Could not read memory for worker pid=%s: %s" % (self.pid, excep))
+            return None
+        
+        
+    def kill(self):
+        """ Stop the worker immediately (e.g. to stop the operation it currently executes). """
+        utils.stop_pid(self.pid)
+        
+        
+    def shutdown(self):
+        """ Ask the worker to exit, as soon as it is idle. """
+        try:
+            self.process.stdin.close()
+        except (IOError, OSError):
+            pass
+        if self.is_alive():
+            ## Do not let zombie processes behind, but do not block the caller either.
+            threading.Thread(target=self.process.wait).start()
+        self._null_output.close()
+        LOGGER.debug("Recycled operations worker with pid=%s" % (self.pid,))
+        
+        
+        
+class OperationWorkersPool(object):
+    """
+    Keep already started OperationWorker processes, for reuse between consecutive operations.
+    At most MAX_THREADS_NUMBER workers are busy at the same time, as each one is used 
+    from an OperationExecutor, which first reserves a spot in LOCKS_QUEUE.
+    A worker gets recycled after a number of operations, or when its memory grows over a limit, 
+    to limit the effect of leaks from operations running in the same process.
+    """
+    
+    def __init__(self, max_operations=None, max_memory=None):
+        self.max_operations = max_operations
+        self.max_memory = max_memory
+        self._idle_workers = []
+        self._lock = threading.Lock()
+        
+        
+    def acquire(self):
+        """
+        :return: an idle live worker, or a newly started one when no idle worker is available.
+        """
+        with self._lock:
+            while self._idle_workers:
+                worker = self._idle_workers.pop()
+                if worker.is_alive():
+                    return worker
+                worker.shutdown()
+        return OperationWorker()
+    
+    
+    def release(self, worker):
+        """
+        Give back a worker, after it finished an operation. It is recycled when no longer healthy.
+        """
+        if not self._is_reusable(worker):
+            worker.shutdown()
+            return
+        with self._lock:
+            self._idle_workers.append(worker)
+            
+            
+    def shutdown_all(self):
+        """ Stop all idle workers (e.g. when the application is being stopped). """
+        with self._lock:
+            workers = self._idle_workers
+            self._idle_workers = []
+        for worker in workers:
+            worker.shutdown()
+            
+            
+    def _is_reusable(self, worker):
+        """ Check that a worker is still alive and under the configured limits."""
+        if not worker.is_alive():
+            return False
+        max_operations = self.max_operations
+        if max_operations is None:
+            max_operations = config.OPERATION_WORKER_MAX_OPERATIONS
+        if max_operations <= 0 or worker.executed_operations >= max_operations:
+            return False
+        max_memory = self.max_memory
+        if max_memory is None:
+            max_memory = config.OPERATION_WORKER_MAX_MEMORY
+        memory = worker.memory_usage()
+        if max_memory > 0 and memory is not None and memory > max_memory:
+            LOGGER.debug("Operations worker pid=%s uses %sMB and will be recycled." % (worker.pid, memory))
+            return False
+        return True
+    
+    
+WORKERS_POOL = OperationWorkersPool()
+
+
+
 class OperationExecutor(threading.Thread):
     """
     Thread in charge for starting an operation.
@@ -80,45 +415,67 @@ class OperationExecutor(threading.Thread):
         self.operation_id = op_id
         self.user_name_label = label  
         self._stop = threading.Event()
+        self._worker = None
+        self._worker_lock = threading.Lock()
         
     def run(self):
         """
-        Get the required data from the operation queue and launch the operation.
+        Get the required data from the operation queue and launch the operation,
+        in one of the already started worker processes.
         """
-        #Try to get a spot to launch own operation.
-        LOCKS_QUEUE.get(True)
         operation_id = self.operation_id
-        user_name_label = self.user_name_label
-        oper = [config().get_python_path(), '-m',
-                'tvb.core.cluster_launcher', str(operation_id), user_name_label]
-        if tvb_profile.CURRENT_SELECTED_PROFILE is not None:
-            oper.extend([tvb_profile.SUBPARAM_PROFILE, tvb_profile.CURRENT_SELECTED_PROFILE])
-
-        if self.stopped() is False:
-            launched_process = Popen(oper, stdout=PIPE, stderr=PIPE)
-            LOGGER.debug("Storing pid=%s for operation id=%s launched on local machine."%(operation_id, 
-                                                                                          launched_process.pid))
-            op_ident = model.OperationProcessIdentifier(operation_id, pid=launched_process.pid)
-            dao.store_entity(op_ident)
-            if self.stopped():
-                #In the exceptional case where both the thread stop and the os.kill() called from 
-                #operation service are somehow done between the self.stopped() check and the popen call
-                utils.stop_pid(launched_process.pid)
-            launched_process.communicate()
-            LOGGER.debug("====================================================")
-            LOGGER.debug("Finished with launch of operation %s"%(operation_id,))
-            del launched_process
-        else:
-            operation = dao.get_operation_by_id(self.operation_id)
-            operation.mark_cancelled()
-            dao.store_entity(operation)
-        #Give back empty spot now that you finished your operation
-        CURRENT_ACTIVE_THREADS.remove(self)
-        LOCKS_QUEUE.put(1)
+        #Try to get a spot to launch own operation.
+        SCHEDULER.acquire_slot(operation_id, self._get_priority(), self.stopped)
+        try:
+            if self.stopped() is False:
+                worker = WORKERS_POOL.acquire()
+                LOGGER.debug("Storing pid=%s for operation id=%s launched on local machine."%(worker.pid, 
+                                                                                              operation_id))
+                op_ident = model.OperationProcessIdentifier(operation_id, pid=worker.pid)
+                dao.store_entity(op_ident)
+                with self._worker_lock:
+                    self._worker = worker
+                    stopped = self.stopped()
+                #In the exceptional case where the thread stop is done while waiting for a worker,
+                #the operation is not sent at all, and the worker remains usable for other operations.
+                if not stopped:
+                    worker.execute(operation_id, self._admit)
+                with self._worker_lock:
+                    self._worker = None
+                WORKERS_POOL.release(worker)
+                LOGGER.debug("====================================================")
+                LOGGER.debug("Finished with launch of operation %s"%(operation_id,))
+            else:
+                operation = dao.get_operation_by_id(self.operation_id)
+                operation.mark_cancelled()
+                dao.store_entity(operation)
+        finally:
+            #Give back empty spot now that you finished your operation
+            CURRENT_ACTIVE_THREADS.remove(self)
+            SCHEDULER.release(operation_id)
+            
+    def _get_priority(self):
+        """ Operations from a PSE group are batch work, everything else was launched interactively."""
+        operation = dao.get_operation_by_id(self.operation_id)
+        if operation is not None and operation.fk_operation_group is not None:
+            return PRIORITY_BATCH
+        return PRIORITY_INTERACTIVE
+    
+    def _admit(self, user_id, required_memory, required_disk, available_disk):
+        """ Wait for the scheduler to admit the operation, with the resources declared by its adapter."""
+        return SCHEDULER.admit(self.operation_id, user_id, required_memory, required_disk, 
+                               available_disk, self.stopped)
 
     def stop(self):
-        """ Mark current thread for stop"""
-        self._stop.set()
+        """ 
+        Mark current thread for stop. 
+        When the operation is already running, the worker executing it is killed (and later replaced).
+        """
+        with self._worker_lock:
+            self._stop.set()
+            if self._worker is not None:
+                self._worker.kill()
+        SCHEDULER.wake_up()
         
     def stopped(self):
         """Check if current thread was marked for stop."""
@@ -138,10 +495,16 @@ class StandAloneClient(object):
      
     @staticmethod   
     def stop_operation(operation_id):
-        """ Stop a thread for a given operation id """
+        """ 
+        Stop a thread for a given operation id.
+        :return: True when a thread was found for the given operation.
+        """
+        any_stopped = False
         for thread in CURRENT_ACTIVE_THREADS:
-            if int(thread.operation_id) == operation_id:
+            if int(thread.operation_id) == int(operation_id):
                 thread.stop()
+                any_stopped = True
+        return any_stopped
     
     @staticmethod        
     def stop_operations(operation_ids):
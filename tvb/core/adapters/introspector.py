@@ -24,6 +24,7 @@
 """
 import os
 import inspect
+import hashlib
 import datetime
 import tvb.core.removers_factory as removers
 from types import ModuleType
@@ -49,6 +50,7 @@ DISPLAYER = 'display'
 RAWINPUT = 'rawinput'
 ORDER = 'order_nr'
 STATE = 'defaultdatastate'
+FINGERPRINT_EXTENSIONS = ('.py', '.xml')
 
 
 class Introspector:
@@ -91,11 +93,50 @@ class Introspector:
         return result
         
         
-    def introspect(self, do_create):
+    def compute_fingerprint(self):
+        """
+        Compute a digest of everything which can change the result of introspecting the current module:
+        size and modification time for all Python and XML files in the packages declared by the module,
+        together with TVB version, DB URL and MATLAB availability.
+        """
+        module = __import__(self.module_name, globals(), locals(), ["__init__"])
+        packages = [self.module_name, ABCAdapter.__module__.rsplit('.', 1)[0]]
+        for variable_name in ['DATATYPES_PATH', 'REMOVERS_PATH', 'PORTLETS_PATH']:
+            packages.extend(getattr(module, variable_name, []))
+        adapters = getattr(module, 'ADAPTERS', {})
+        for category_name in sorted(adapters.keys()):
+            packages.extend(adapters[category_name]['modules'])
+        
+        digest = hashlib.md5()
+        digest.update("%s|%s|%s|%s\n" % (cfg.BASE_VERSION, cfg.DB_CURRENT_VERSION, cfg.DB_URL, 
+                                         bool(self.matlab_executable)))
+        folders = set()
+        for package_name in packages:
+            try:
+                package = __import__(package_name, globals(), locals(), ["__init__"])
+                folders.add(os.path.dirname(os.path.abspath(package.__file__)))
+                for folder in getattr(package, XML_FOLDERS_VARIABLE, []):
+                    folders.add(os.path.join(cfg.CURRENT_DIR, folder))
+            except Exception, _:
+                digest.update("missing|%s\n" % package_name)
+        for folder in sorted(folders):
+            for root, dirs, files in os.walk(folder):
+                dirs.sort()
+                for file_name in sorted(files):
+                    if os.path.splitext(file_name)[1] in FINGERPRINT_EXTENSIONS:
+                        full_path = os.path.join(root, file_name)
+                        file_stat = os.stat(full_path)
+                        digest.update("%s|%d|%r\n" % (full_path, file_stat.st_size, file_stat.st_mtime))
+        return digest.hexdigest()
+    
+    
+    def introspect(self, do_create, refresh_algorithms=True):
         """
         Introspect a given module to: 
             - create tables for custom DataType;
             - populate adapter algorithms references. 
+        When refresh_algorithms is False (module found unchanged since previous start-up), 
+        the adapters and portlets are not loaded again, only their DB entries are marked as still valid.
         """
         self.logger.debug("Introspection into module:" + self.module_name)
         module = __import__(self.module_name, globals(), locals(), ["__init__"])
@@ -122,34 +163,67 @@ class Introspector:
             model.Base.metadata.create_all(bind = session.connection())
             session.commit()
             session.close()
-    
-            self.logger.debug("Found Adapters_Dict=" + str(path_adapters))      
-            for category_name in path_adapters:
-                category_details = path_adapters[category_name]
-                launchable = (LAUNCHABLE in category_details and category_details[LAUNCHABLE])
-                rawinput = (RAWINPUT in category_details and category_details[RAWINPUT])
-                display = (DISPLAYER in category_details and category_details[DISPLAYER])
-                if ORDER in category_details:
-                    order_nr = category_details[ORDER]   
-                else:
-                    order_nr = 999           
-                category_instance = dao.filter_category(category_name, rawinput, display, launchable, order_nr)
-                if category_instance is not None:
-                    category_instance.last_introspection_check = datetime.datetime.now()
-                else:
-                    category_instance = model.AlgorithmCategory(category_name, launchable, rawinput, display, 
-                                                                category_details[STATE] if STATE in category_details else '', order_nr,
-                                                                datetime.datetime.now())
-                category_instance = dao.store_entity(category_instance)
-                for actual_module in path_adapters[category_name]['modules']:
-                    self.__populate_algorithms(category_instance.id, actual_module)    
-                    
-            for path in self.path_portlets:
-                self.__get_portlets(path)
+            
+            if refresh_algorithms or not self.__mark_as_valid(path_adapters):
+                self.__refresh_algorithms(path_adapters)
         ### Register Remover instances for current introspected module
         removers.update_dictionary(self.get_removers_dict())    
     
     
+    def __mark_as_valid(self, path_adapters):
+        """
+        Mark the categories, algorithm groups and portlets previously stored for the current module 
+        as still valid, without loading them.
+        Returns False when some category is not found in DB, and a full refresh is needed.
+        """
+        adapter_modules = []
+        xml_folders = []
+        for category_name in path_adapters:
+            for module_name in path_adapters[category_name]['modules']:
+                adapter_modules.append(module_name)
+                xml_folders.extend(Introspector.__get_variable(module_name, XML_FOLDERS_VARIABLE))
+        portlet_folders = []
+        for path in self.path_portlets:
+            portlet_package = __import__(path, globals(), locals(), ["__init__"])
+            portlet_folders.append(os.path.dirname(portlet_package.__file__))
+        found_categories = dao.mark_introspection_valid(path_adapters.keys(), adapter_modules, xml_folders, 
+                                                        portlet_folders, datetime.datetime.now())
+        if found_categories < len(path_adapters):
+            self.logger.info("Categories for module %s are not in DB. Full introspection needed." % self.module_name)
+            return False
+        self.logger.debug("Module %s did not change since previous introspection." % self.module_name)
+        return True
+    
+    
+    def __refresh_algorithms(self, path_adapters):
+        """
+        Store in DB categories, algorithm groups, algorithms and portlets declared by the current module.
+        """
+        self.logger.debug("Found Adapters_Dict=" + str(path_adapters))      
+        for category_name in path_adapters:
+            category_details = path_adapters[category_name]
+            launchable = (LAUNCHABLE in category_details and category_details[LAUNCHABLE])
+            rawinput = (RAWINPUT in category_details and category_details[RAWINPUT])
+            display = (DISPLAYER in category_details and category_details[DISPLAYER])
+            if ORDER in category_details:
+                order_nr = category_details[ORDER]   
+            else:
+                order_nr = 999           
+            category_instance = dao.filter_category(category_name, rawinput, display, launchable, order_nr)
+            if category_instance is not None:
+                category_instance.last_introspection_check = datetime.datetime.now()
+            else:
+                category_instance = model.AlgorithmCategory(category_name, launchable, rawinput, display, 
+                                                            category_details[STATE] if STATE in category_details else '', order_nr,
+                                                            datetime.datetime.now())
+            category_instance = dao.store_entity(category_instance)
+            for actual_module in path_adapters[category_name]['modules']:
+                self.__populate_algorithms(category_instance.id, actual_module)    
+                
+        for path in self.path_portlets:
+            self.__get_portlets(path)
+    
+    
     def __get_portlets(self, path_portlets):
         """
         Given a path in the form of a python package e.g.: "tvb.portlets', import
@@ -213,23 +287,22 @@ class Introspector:
                 self.logger.error("Invalid Portlet description File "+ file_n + " will continue without it!!")
         
         self.logger.debug("Refreshing portlets from xml declarations.")
-        stored_portlets = dao.get_available_portlets()
-        #First update old portlets from DB
-        for stored_portlet in stored_portlets:
-            for verified_portlet in portlets_list:
-                if stored_portlet.algorithm_identifier == verified_portlet.algorithm_identifier:
-                    stored_portlet.xml_path = verified_portlet.xml_path
-                    stored_portlet.last_introspection_check = datetime.datetime.now()
-                    stored_portlet.name = verified_portlet.name
-                    dao.store_entity(stored_portlet)
-                    break
-        
-        #Now add portlets that were not in DB at previous run but are valid now
-        for portlet in portlets_list:
-            db_entity = dao.get_portlet_by_identifier(portlet.algorithm_identifier)
-            if db_entity is None:
-                self.logger.debug("Will now store portlet %s"%(str(portlet),))
-                dao.store_entity(portlet)
+        stored_portlets = dict((portlet.algorithm_identifier, portlet) for portlet in dao.get_available_portlets())
+        portlets_to_store = []
+        for verified_portlet in portlets_list:
+            stored_portlet = stored_portlets.get(verified_portlet.algorithm_identifier)
+            if stored_portlet is not None:
+                #Update old portlet from DB
+                stored_portlet.xml_path = verified_portlet.xml_path
+                stored_portlet.last_introspection_check = datetime.datetime.now()
+                stored_portlet.name = verified_portlet.name
+                portlets_to_store.append(stored_portlet)
+            else:
+                #Add portlet that was not in DB at previous run but is valid now
+                self.logger.debug("Will now store portlet %s"%(str(verified_portlet),))
+                stored_portlets[verified_portlet.algorithm_identifier] = verified_portlet
+                portlets_to_store.append(verified_portlet)
+        dao.store_entities(portlets_to_store)
                     
     
     def __get_datatypes(self, path_types):
@@ -292,11 +365,18 @@ class Introspector:
                         self.logger.error("Could not parse XML file: " + os.path.join(folder_path, file_))
                         self.logger.exception(excep)
 
-        # Set the last_introspection_check flag so they will pass the validation check done after introspection
-        self.__update_references_last_check_timestamp(groups, category_key)
-        
+        if not groups:
+            return
+        stored_groups = dao.find_groups(list(set([group.module for group in groups])))
+        stored_groups = dict(((group.module, group.classname, group.init_parameter), group) 
+                             for group in stored_groups)
+        groups_to_store = []
+        group_adapters = []
         for group in groups:
-            group_inst_from_db = dao.find_group(group.module, group.classname, group.init_parameter)
+            group_key = (group.module, group.classname, group.init_parameter)
+            group_inst_from_db = stored_groups.get(group_key)
+            if group_inst_from_db is not None and group_inst_from_db in groups_to_store:
+                continue
             adapter = ABCAdapter.build_adapter(group)
             has_sub_algorithms = False
             ui_name = group.displayname
@@ -309,6 +389,7 @@ class Introspector:
                                              group.algorithm_param_name, group.init_parameter, 
                                              datetime.datetime.now(), subsection_name=group.subsection_name,
                                              description=group.description)
+                stored_groups[group_key] = group
             else:
                 self.logger.info(str(group.module) + " will be updated")
                 group = group_inst_from_db
@@ -323,8 +404,11 @@ class Introspector:
             group.ui_display = adapter._ui_display    
             group.displayname = ui_name
             group.last_introspection_check = datetime.datetime.now()
-            group_inst_from_db = dao.store_entity(group)
-            self.__store_algorithms_for_group(group_inst_from_db, adapter, has_sub_algorithms)
+            groups_to_store.append(group)
+            group_adapters.append((adapter, has_sub_algorithms))
+        
+        stored_groups = dao.store_entities(groups_to_store)
+        self.__store_algorithms(zip(stored_groups, group_adapters))
 
 
     def __get_class_ref(self, full_class_name):
@@ -345,14 +429,29 @@ class Introspector:
         raise Exception("The location of the adapter class is incorrect. It should be placed in a module.")
 
 
-    def __store_algorithms_for_group(self, group, adapter, has_sub_algorithms):
+    def __store_algorithms(self, groups_with_adapters):
         """
-        For the group passed as parameter do the following:
+        For each (group, (adapter, has_sub_algorithms)) passed as parameter do the following:
         If it has sub-algorithms, get the list of them, add sub-algorithm 
         references into the DB with all the required fields.
         If it is not a GroupAdapter add a single algorithm into the DB with an
         empty identifier.
-        """  
+        Existing algorithms are read with a single query, and all are written back with a single commit.
+        """
+        stored_algorithms = dao.get_algorithms_by_groups([group.id for group, _ in groups_with_adapters])
+        stored_algorithms = dict(((algo.fk_algo_group, algo.identifier), algo) for algo in stored_algorithms)
+        algorithms = []
+        for group, (adapter, has_sub_algorithms) in groups_with_adapters:
+            algorithms.extend(self.__build_algorithms_for_group(group, adapter, has_sub_algorithms, 
+                                                                stored_algorithms))
+        dao.store_entities(algorithms)
+        
+        
+    def __build_algorithms_for_group(self, group, adapter, has_sub_algorithms, stored_algorithms):
+        """
+        Create or update the Algorithm entities for one group.
+        """
+        result = []
         if has_sub_algorithms:
             algos = adapter.get_algorithms_dictionary()
             for algo_ident in algos:
@@ -365,7 +464,7 @@ class Introspector:
                     file_name = adapter.get_matlab_file(algo_ident)
                     if file_name:
                         algo_description = self.extract_matlab_doc_string(os.path.join(root_folder, file_name))
-                algorithm = dao.get_algorithm_by_group(group.id, algo_ident)
+                algorithm = stored_algorithms.get((group.id, algo_ident))
                 if algorithm is None:
                     #Create new
                     algorithm = model.Algorithm(group.id, algo_ident, algos[algo_ident][ATT_NAME],
@@ -378,12 +477,12 @@ class Introspector:
                     algorithm.outputlist = str(outputs)
                     algorithm.datatype_filter = flt
                     algorithm.description = algo_description
-                dao.store_entity(algorithm)
+                result.append(algorithm)
         else:
             input_tree = adapter.get_input_tree()
             req_type, param_name, flt = self.__get_required_input(input_tree)
             outputs = str(adapter.get_output())
-            algorithm = dao.get_algorithm_by_group(group.id, None)
+            algorithm = stored_algorithms.get((group.id, None))
             if hasattr(adapter, '_ui_name'):
                 algo_name = getattr(adapter, '_ui_name')
             else:
@@ -398,7 +497,8 @@ class Introspector:
                 algorithm.parameter_name = param_name
                 algorithm.outputlist = str(outputs)
                 algorithm.datatype_filter = flt
-            dao.store_entity(algorithm)
+            result.append(algorithm)
+        return result
                 
     
     def __get_required_input(self, input_tree):
@@ -459,26 +559,7 @@ class Introspector:
         except Exception, excep:
             self.logger.debug("Could not import class:"+ str(excep))
             return None
-    
-    @staticmethod
-    def __update_references_last_check_timestamp(current_groups, category_key):
-        """
-        For all the algorithms found in the db for category given by category_key, update their
-        'last_introspection_check' timestamp if they are part of current_groups.
         
-        @param current_groups: a list of algorithm groups that recently passed our validations
-            from the introspection and are still valid
-        @param category_key: the algorithm group category for which we match the algorithms found
-            in the db with those we recently validated on introspection
-        """
-        db_groups = dao.get_groups_by_categories([category_key])
-        for group in db_groups:   
-            for curr_group in current_groups:
-                if (group.module == curr_group.module and group.classname == curr_group.classname):
-                    group.last_introspection_check = datetime.datetime.now()
-                    dao.store_entity(group)
-                    break
-   
         
     def __create_instance(self, category_key, class_ref, init_parameter=None):
         """
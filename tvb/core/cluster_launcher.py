@@ -26,6 +26,9 @@ It gets the algorithm, and the adapter with its parameters from database.
 And finally launches the computation.
 The results of the computation will be stored by the adapter itself.
 
+When called with "worker" as first argument, the process stays alive and launches
+every operation id read (one per line) from its standard input, until the input is closed.
+
 .. moduleauthor:: Bogdan Neacsa <bogdan.neacsa@codemart.ro>
 .. moduleauthor:: Lia Domide <lia.domide@codemart.ro>
 .. moduleauthor:: Yann Gordon <yann@tvb.invalid>
@@ -43,6 +46,7 @@ TVBSettings.MAX_DB_CONNECTIONS = TVBSettings.MAX_DB_ASYNC_CONNECTIONS
 TVBSettings.OPERATION_EXECUTION_PROCESS = True
 
 
+import gc
 import matplotlib
 from tvb.basic.logger.builder import get_logger
 from tvb.core.adapters.abcadapter import ABCAdapter
@@ -51,6 +55,9 @@ from tvb.core.utils import parse_json_parameters
 from tvb.core.traits import db_events
 from tvb.core.services.operationservice import OperationService
 from tvb.core.services.workflowservice import WorkflowService
+from tvb.core.entities.file.hdf5pool import FILES_POOL
+from tvb.core.adapters import backend_client
+from tvb.core.adapters.backend_client import WORKER_MODE_PARAM, WORKER_DONE_MARKER
 
 
 LOGGER = get_logger('tvb.core.cluster_launcher')
@@ -80,18 +87,44 @@ def do_operation_launch(operation_id):
         LOGGER.debug("Successfully finished operation "+ str(operation_id))
         
     except Exception, excep:
-        LOGGER.error("Could not execute operation " + str(sys.argv[1]))
+        LOGGER.error("Could not execute operation " + str(operation_id))
         LOGGER.exception(excep)
         parent_burst = dao.get_burst_for_operation_id(operation_id)
         if parent_burst is not None:
             WorkflowService().mark_burst_finished(parent_burst, error=True, error_message=str(excep))
     
+
+
+def run_operations_worker():
+    """
+    Launch operations one after the other, as their ids are received on the standard input.
+    After each operation, a line is printed, for the parent process to know the worker is free again.
+    """
+    backend_client.IS_OPERATIONS_WORKER = True
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            ## Input closed: the parent process wants us to stop.
+            break
+        operation_id = line.strip()
+        if not operation_id:
+            continue
+        do_operation_launch(operation_id)
+        ## Do not keep H5 files open between operations, as other processes might need them.
+        FILES_POOL.close_all()
+        gc.collect()
+        sys.stdout.write("\n%s %s\n" % (WORKER_DONE_MARKER, operation_id))
+        sys.stdout.flush()
+    
     
 if __name__ == '__main__':
-    OPERATION_ID = sys.argv[1]
     # Make sure DB events are linked.
     db_events.attach_db_events()
-    do_operation_launch(OPERATION_ID)
+    if sys.argv[1] == WORKER_MODE_PARAM:
+        run_operations_worker()
+    else:
+        OPERATION_ID = sys.argv[1]
+        do_operation_launch(OPERATION_ID)
     sys.exit(0)
     
 
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#
+"""
+Exact statistics (count, minimum, maximum, mean, variance) of an array written in chunks.
+
+The statistics of each new chunk are computed with NumPy, then merged into the accumulated 
+ones with the pairwise form of Welford's update (Chan et al.), so the variance stays exact 
+without keeping (or reading back) previous chunks. NaN values are counted separately and 
+otherwise ignored. Optionally, the same statistics are kept for each index along some axes 
+(e.g. for each state-variable and mode of a TimeSeries).
+"""
+
+import numpy
+
+## Meta-data keys, next to the Minimum/Maximum/Mean/Variance ones declared on MappedTypeLight.
+METADATA_ARRAY_NAN_COUNT = "NaN_count"
+METADATA_STATISTICS_AXES = "Statistics_axes"
+## Suffix of the meta-data keys holding statistics computed for each index along the statistics axes.
+METADATA_PER_AXES_SUFFIX = "_per_axes"
+
+
+
+class _Moments(object):
+    """
+    Count, NaN count, minimum, maximum, mean and sum of squared deviations (M2).
+    Each field is a numpy array with the shape of the kept axes (a 0-d array when no axis is kept).
+    """
+    
+    def __init__(self, count, nan_count, minimum, maximum, mean, m2):
+        self.count = count
+        self.nan_count = nan_count
+        self.minimum = minimum
+        self.maximum = maximum
+        self.mean = mean
+        self.m2 = m2
+    
+    
+    @staticmethod
+    def from_data(data):
+        """
+        Compute moments along the last dimension of data (which should not be empty).
+        """
+        if data.dtype.kind == 'f':
+            invalid = numpy.isnan(data)
+            if invalid.any():
+                valid = ~invalid
+                count = valid.sum(axis=-1)
+                mean = numpy.where(valid, data, 0).sum(axis=-1) / numpy.maximum(count, 1)
+                deviations = numpy.where(valid, data - mean[..., numpy.newaxis], 0)
+                return _Moments(count, invalid.sum(axis=-1), 
+                                numpy.where(valid, data, numpy.inf).min(axis=-1),
+                                numpy.where(valid, data, -numpy.inf).max(axis=-1),
+                                mean, (deviations ** 2).sum(axis=-1))
+        
+        count = numpy.empty(data.shape[:-1], dtype=numpy.int64)
+        count.fill(data.shape[-1])
+        mean = data.mean(axis=-1)
+        return _Moments(count, numpy.zeros_like(count), data.min(axis=-1), data.max(axis=-1), 
+                        mean, ((data - mean[..., numpy.newaxis]) ** 2).sum(axis=-1))
+    
+    
+    def merge(self, other):
+        """
+        Combine with the moments of another part of the same array.
+        """
+        count = self.count + other.count
+        safe_count = numpy.maximum(count, 1)
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / safe_count
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / safe_count
+        self.count = count
+        self.nan_count = self.nan_count + other.nan_count
+        self.minimum = numpy.minimum(self.minimum, other.minimum)
+        self.maximum = numpy.maximum(self.maximum, other.maximum)
+    
+    
+    def to_dict(self, key_minimum, key_maximum, key_mean, key_variance):
+        """
+        :return: dictionary with the current statistics (NaN when no valid value was seen), 
+                 Python scalars for 0-d moments.
+        """
+        has_values = self.count > 0
+        result = {key_minimum: numpy.where(has_values, self.minimum, numpy.nan),
+                  key_maximum: numpy.where(has_values, self.maximum, numpy.nan),
+                  key_mean: numpy.where(has_values, self.mean, numpy.nan),
+                  key_variance: numpy.where(has_values, self.m2 / numpy.maximum(self.count, 1), numpy.nan),
+                  METADATA_ARRAY_NAN_COUNT: self.nan_count}
+        for key, value in result.iteritems():
+            if numpy.ndim(value) == 0:
+                result[key] = value[()] if isinstance(value, numpy.ndarray) else value
+        return result
+
+
+
+class ArrayStatistics(object):
+    """
+    Accumulate statistics for an array received in chunks (concatenated along any dimension).
+    """
+    
+    def __init__(self, axes=None):
+        """
+        :param axes: optional list of dimensions for which statistics are also kept per index 
+                     (e.g. (1, 3) for the state-variables and modes of a 4D TimeSeries).
+        """
+        self.axes = tuple(sorted(axes)) if axes else ()
+        self.global_moments = None
+        self.axes_moments = None
+    
+    
+    def update(self, data, grow_dimension=None):
+        """
+        Merge the statistics of a new chunk.
+        :param grow_dimension: the dimension along which chunks are concatenated, when known
+        """
+        data = numpy.asarray(data)
+        if data.dtype.kind not in 'biuf' or data.size == 0:
+            return
+        chunk_moments = _Moments.from_data(data.reshape(1, -1))
+        ## The first (and only) row is kept as 0-d arrays
+        for name in ('count', 'nan_count', 'minimum', 'maximum', 'mean', 'm2'):
+            setattr(chunk_moments, name, getattr(chunk_moments, name)[0])
+        if self.global_moments is None:
+            self.global_moments = chunk_moments
+        else:
+            self.global_moments.merge(chunk_moments)
+        
+        if not self.axes:
+            return
+        kept_shape = tuple(data.shape[axis] for axis in self.axes if axis < data.ndim)
+        if grow_dimension is not None and grow_dimension < 0:
+            grow_dimension += data.ndim
+        if (len(kept_shape) != len(self.axes) or grow_dimension in self.axes or 
+                (self.axes_moments is not None and self.axes_moments.count.shape != kept_shape)):
+            ## Chunks grow along one of the statistics axes, or do not have them: per-axes statistics are dropped.
+            self.axes = ()
+            self.axes_moments = None
+            return
+        reduced_axes = tuple(axis for axis in xrange(data.ndim) if axis not in self.axes)
+        per_axes = numpy.transpose(data, self.axes + reduced_axes).reshape(kept_shape + (-1,))
+        chunk_moments = _Moments.from_data(per_axes)
+        if self.axes_moments is None:
+            self.axes_moments = chunk_moments
+        else:
+            self.axes_moments.merge(chunk_moments)
+    
+    
+    def to_metadata(self, key_minimum, key_maximum, key_mean, key_variance, included_keys=None):
+        """
+        :param included_keys: the statistics to be returned (NaN count is always returned). None means all.
+        :return: dictionary of meta-data to be written on the H5 data-set, or None when no chunk was seen.
+        """
+        if self.global_moments is None:
+            return None
+        keys = (key_minimum, key_maximum, key_mean, key_variance)
+        
+        def _select(statistics, suffix=''):
+            """ Filter by included_keys and add suffix to keys."""
+            return dict((key + suffix, value) for key, value in statistics.iteritems()
+                        if included_keys is None or key in included_keys or key == METADATA_ARRAY_NAN_COUNT)
+        
+        result = _select(self.global_moments.to_dict(*keys))
+        if self.axes_moments is not None:
+            result.update(_select(self.axes_moments.to_dict(*keys), METADATA_PER_AXES_SUFFIX))
+            result[METADATA_STATISTICS_AXES] = numpy.array(self.axes)
+        return result
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Multi-resolution (min / max) envelopes for long arrays, with time on the first dimension.
+
+Level k of the pyramid holds, for every window of 2**k consecutive time points, 
+the minimum and the maximum value of each channel. Levels are computed while the 
+full resolution data is written in chunks, and stored as extra data-sets in the 
+H5 file of the DataType, so that an overview of a long TimeSeries can be drawn 
+without reading all samples.
+"""
+
+import numpy
+
+## Levels below this one are not stored (they would be almost as big as the full resolution data).
+ENVELOPE_FIRST_LEVEL = 2
+## The coarsest level stored still has at least this number of points.
+ENVELOPE_MIN_LENGTH = 512
+
+METADATA_ENVELOPE_LEVEL = "Envelope_max_level"
+METADATA_ENVELOPE_LENGTH = "Envelope_data_length"
+
+
+
+def envelope_dataset_names(data_name, level):
+    """
+    :return: tuple with the names of the data-sets holding the minimum and maximum values, for a level.
+    """
+    return "%s_envelope_min_%d" % (data_name, level), "%s_envelope_max_%d" % (data_name, level)
+
+
+
+def select_level(window_length, pixel_width, max_level):
+    """
+    Choose the level to be used for drawing a time window on a given number of pixels:
+    the coarsest one still giving at least one point per pixel. 
+    Level 0 (full resolution) is used for short windows, or when no pyramid exists.
+    The same rule is implemented in JS (selectEnvelopeLevel).
+    """
+    if max_level < ENVELOPE_FIRST_LEVEL or window_length <= 2 * pixel_width:
+        return 0
+    level = ENVELOPE_FIRST_LEVEL
+    while level < max_level and _count_points(window_length, level + 1) >= pixel_width:
+        level += 1
+    return level
+
+
+
+def _count_points(length, level):
+    """ Number of points on a level, for a given number of full resolution time points."""
+    factor = 2 ** level
+    return (length + factor - 1) // factor
+
+
+
+class EnvelopeBuilder(object):
+    """
+    Compute all the levels of the pyramid in a single pass over the full resolution data, 
+    while it is being written.
+    
+    Data is given in consecutive chunks (of any length) along the time dimension. Every level is 
+    computed from the previous one, keeping at most one unpaired point per level between chunks. 
+    NaN values are ignored, unless all values in a window are NaN.
+    
+    As the final length is not known in advance, the points of a level are kept in memory until 
+    the level has ENVELOPE_MIN_LENGTH points (and is thus sure to be stored). Levels which never 
+    get there are dropped by finish().
+    """
+
+    def __init__(self, write_function):
+        """
+        :param write_function: callable(level, minimums, maximums), invoked with consecutive 
+            blocks of points for every stored level (ENVELOPE_FIRST_LEVEL up to max_level)
+        """
+        self.write_function = write_function
+        ## Coarsest level written so far (0 while no level was written).
+        self.max_level = 0
+        ## Number of full resolution time points received.
+        self.length = 0
+        self._unpaired = [None]
+        self._pending = {}
+
+
+    def add_chunk(self, data):
+        """
+        :param data: next block of full resolution data (time on the first dimension)
+        """
+        data = numpy.asarray(data)
+        self.length += len(data)
+        self._propagate(data, data, False)
+
+
+    def finish(self):
+        """
+        Write the last (incomplete) window of every level.
+        :return: the coarsest level stored, or 0 when the data was too short for a pyramid
+        """
+        self._propagate(None, None, True)
+        self._pending = {}
+        return self.max_level
+
+
+    def _propagate(self, minimums, maximums, is_last):
+        """
+        Reduce points two by two, from level 1 up, for as long as there are points to reduce.
+        """
+        level = 1
+        while True:
+            if level == len(self._unpaired):
+                self._unpaired.append(None)
+            unpaired = self._unpaired[level]
+            self._unpaired[level] = None
+            if unpaired is not None:
+                if minimums is None:
+                    minimums, maximums = unpaired
+                else:
+                    minimums = numpy.concatenate((unpaired[0], minimums))
+                    maximums = numpy.concatenate((unpaired[1], maximums))
+            has_higher_unpaired = any(item is not None for item in self._unpaired[level + 1:])
+            if minimums is None or len(minimums) == 0:
+                if not (is_last and has_higher_unpaired):
+                    return
+                minimums, maximums = None, None
+            elif is_last:
+                indices = numpy.arange(0, len(minimums), 2)
+                minimums = numpy.fmin.reduceat(minimums, indices, axis=0)
+                maximums = numpy.fmax.reduceat(maximums, indices, axis=0)
+                self._add_points(level, minimums, maximums)
+                if len(minimums) == 1 and not has_higher_unpaired:
+                    ## All coarser levels would hold this single point.
+                    return
+            else:
+                paired = len(minimums) - len(minimums) % 2
+                if paired < len(minimums):
+                    ## Copy, as the chunk received might be a buffer reused by the caller.
+                    self._unpaired[level] = (numpy.array(minimums[paired:]), numpy.array(maximums[paired:]))
+                if paired == 0:
+                    return
+                minimums = numpy.fmin(minimums[0:paired:2], minimums[1:paired:2])
+                maximums = numpy.fmax(maximums[0:paired:2], maximums[1:paired:2])
+                self._add_points(level, minimums, maximums)
+            level += 1
+
+
+    def _add_points(self, level, minimums, maximums):
+        """
+        Write a block of points, or keep it in memory until the level is known to be stored.
+        A level reaches ENVELOPE_MIN_LENGTH points only after all finer levels did.
+        """
+        if level < ENVELOPE_FIRST_LEVEL:
+            return
+        if level <= self.max_level:
+            self.write_function(level, minimums, maximums)
+            return
+        pending_minimums, pending_maximums = self._pending.setdefault(level, ([], []))
+        pending_minimums.append(minimums)
+        pending_maximums.append(maximums)
+        if sum(len(block) for block in pending_minimums) >= ENVELOPE_MIN_LENGTH:
+            del self._pending[level]
+            self.max_level = level
+            self.write_function(level, numpy.concatenate(pending_minimums), numpy.concatenate(pending_maximums))
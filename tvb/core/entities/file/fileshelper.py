@@ -28,6 +28,7 @@ import shutil
 import json
 import zipfile
 from contextlib import closing
+from multiprocessing.pool import ThreadPool
 from zipfile import ZipFile, ZIP_DEFLATED, BadZipfile
 from tvb.basic.config.settings import TVBSettings
 from tvb.basic.logger.builder import get_logger
@@ -35,6 +36,8 @@ from tvb.core.utils import synchronized
 from tvb.core.entities.transient.structure_entities import DataTypeMetaData, GenericMetaData
 from tvb.core.entities.file.metadatahandler import XMLReader, XMLWriter
 from tvb.core.entities.file.exceptions import FileStructureException
+from tvb.core.entities.file.hdf5pool import FILES_POOL
+from tvb.core.entities.file.zipstream import ZipStreamer
 
 
 from threading import Lock
@@ -106,6 +109,7 @@ class FilesHelper():
         if os.path.exists(new_full_name):
             raise FileStructureException("File already used "+ str(new_name) + " Can not add a duplicate!")
         try:
+            FILES_POOL.invalidate_folder(path)
             os.rename(path, new_full_name)
             return path , new_full_name
         except Exception, excep:
@@ -118,6 +122,7 @@ class FilesHelper():
         """ Remove all folders for project or THROW FileStructureException. """
         try:
             complete_path = self.get_project_folder(project_name)
+            FILES_POOL.invalidate_folder(complete_path)
             if os.path.exists(complete_path):
                 if os.path.isdir(complete_path):
                     shutil.rmtree(complete_path)
@@ -220,6 +225,7 @@ class FilesHelper():
         """
         try:
             complete_path = self.get_operation_folder(project_name, operation_id)
+            FILES_POOL.invalidate_folder(complete_path)
             if os.path.isdir(complete_path):
                 shutil.rmtree(complete_path)
             else:
@@ -235,6 +241,7 @@ class FilesHelper():
         Remove H5 storage fully.
         """
         try:
+            FILES_POOL.invalidate(datatype.get_storage_file_path())
             os.remove(datatype.get_storage_file_path())
         except Exception, excep:
             self.logger.error(excep)
@@ -249,6 +256,7 @@ class FilesHelper():
             full_path = datatype.get_storage_file_path()
             folder = self.get_project_folder(new_project_name, str(new_op_id))
             full_new_file = os.path.join(folder, os.path.split(full_path)[1])
+            FILES_POOL.invalidate(full_path)
             os.rename(full_path, full_new_file)
         except Exception, excep:
             self.logger.error(excep)
@@ -359,38 +367,117 @@ class FilesHelper():
     def zip_folder(result_name, folder_root):
         """
         Given a folder and a ZIP result name, create the corresponding archive.
+        Files are compressed in parallel processes (H5 files are only stored, see ZipStreamer).
         """
-        with closing(ZipFile(result_name, "w", ZIP_DEFLATED, True)) as zip_res:
-            for root, _, files in os.walk(folder_root):
-                #NOTE: ignore empty directories
-                for file_n in files:
-                    abs_file_n = os.path.join(root, file_n)
-                    zip_file_n = abs_file_n[len(folder_root) + len(os.sep):]
-                    zip_res.write(abs_file_n, zip_file_n)
-                    
-        return result_name
+        streamer = ZipStreamer()
+        #NOTE: ignore empty directories
+        return streamer.write_to_file(result_name, streamer.folder_members(folder_root))
      
      
-    def unpack_zip(self, uploaded_zip, folder_path):
-        """ Simple method to unpack ZIP archive in a given folder. """
+    def unpack_zip(self, uploaded_zip, folder_path, checkpoint_file=None):
+        """
+        Unpack ZIP archive in a given folder. Members are extracted in parallel threads.
+        
+        :param checkpoint_file: optional path of a file where every extracted member is recorded.
+                                Members recorded there by a previous (interrupted) call are not extracted again.
+        :return: list with the paths of all the archive members, after extraction
+        """
         try:
             zip_arch = zipfile.ZipFile(uploaded_zip)
+            members = zip_arch.infolist()
+            zip_arch.close()
+            
+            extracted = self._read_unpack_checkpoint(checkpoint_file)
             result = []
-            for filename in zip_arch.namelist():
-                new_file_name = os.path.join(folder_path, filename)
-                src = zip_arch.open(filename, 'rU')
-                if new_file_name.endswith('/'):
-                    os.makedirs(new_file_name)
-                else:
-                    FilesHelper.copy_file(src, new_file_name)
+            pending = []
+            for member in members:
+                new_file_name = os.path.join(folder_path, member.filename)
                 result.append(new_file_name)
+                if new_file_name.endswith('/'):
+                    if not os.path.isdir(new_file_name):
+                        os.makedirs(new_file_name)
+                elif (member.filename not in extracted or not os.path.isfile(new_file_name)
+                      or os.path.getsize(new_file_name) != member.file_size):
+                    pending.append((member, new_file_name))
+            if len(extracted) > 0:
+                self.logger.debug("Resuming unpack of %s: %d members left out of %d." % (uploaded_zip, len(pending),
+                                                                                         len(members)))
+            self._extract_members(uploaded_zip, pending, checkpoint_file)
             return result
         except BadZipfile, excep:
             self.logger.error(excep)
+            ## Nothing worth resuming from an invalid archive.
+            if checkpoint_file is not None and os.path.exists(checkpoint_file):
+                os.remove(checkpoint_file)
             raise FileStructureException("Invalid ZIP file...")
         except Exception, excep:
             self.logger.error(excep)
             raise FileStructureException("Could not unpack the given ZIP file...")
+    
+    
+    def _extract_members(self, uploaded_zip, pending, checkpoint_file):
+        """
+        Extract the given (ZipInfo, destination) pairs. Members are split between threads
+        in groups of similar size, each thread reading through its own handle of the archive.
+        """
+        if not pending:
+            return
+        ## Parent folders are created before-hand, as threads would race on creating them.
+        for parent_folder in set(os.path.dirname(new_file_name) for _, new_file_name in pending):
+            if not os.path.isdir(parent_folder):
+                os.makedirs(parent_folder)
+        
+        nr_threads = max(1, min(TVBSettings.IMPORT_THREADS, len(pending)))
+        groups = [[] for _ in xrange(nr_threads)]
+        groups_size = [0] * nr_threads
+        for member, new_file_name in sorted(pending, key=lambda job: job[0].file_size, reverse=True):
+            lightest = groups_size.index(min(groups_size))
+            groups[lightest].append((member, new_file_name))
+            groups_size[lightest] += member.file_size
+        
+        checkpoint = None
+        if checkpoint_file is not None:
+            checkpoint = open(checkpoint_file, 'a')
+            ## Terminate the last line, in case a previous unpack was killed while writing it.
+            checkpoint.write('\n')
+        checkpoint_lock = Lock()
+        
+        def _extract_group(group):
+            """ Extract one group of members and record them in the checkpoint file."""
+            with closing(zipfile.ZipFile(uploaded_zip)) as zip_arch:
+                for member, new_file_name in group:
+                    FilesHelper.copy_file(zip_arch.open(member), new_file_name)
+                    if checkpoint is not None:
+                        with checkpoint_lock:
+                            checkpoint.write(json.dumps(member.filename) + '\n')
+                            checkpoint.flush()
+        
+        pool = ThreadPool(nr_threads)
+        try:
+            pool.map(_extract_group, groups)
+        finally:
+            pool.close()
+            pool.join()
+            if checkpoint is not None:
+                checkpoint.close()
+    
+    
+    @staticmethod
+    def _read_unpack_checkpoint(checkpoint_file):
+        """
+        :return: set with the names of the archive members already recorded as extracted in the checkpoint file.
+        """
+        extracted = set()
+        if checkpoint_file is None or not os.path.exists(checkpoint_file):
+            return extracted
+        with open(checkpoint_file, 'r') as checkpoint:
+            for line in checkpoint:
+                try:
+                    extracted.add(json.loads(line))
+                except ValueError:
+                    ## Empty or incomplete line (previous unpack killed while writing it).
+                    continue
+        return extracted
             
 
     @staticmethod
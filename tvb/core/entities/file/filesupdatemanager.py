@@ -178,6 +178,55 @@ class FilesUpdateManager(UpdateManager):
             return return_status, return_message
      
 
+    def relayout_datatype_file(self, datatype):
+        """
+        Re-write the H5 file of a DataType, so that its data-sets get the chunking / compression 
+        currently declared by the DataType class (see MappedType.get_storage_layout).
+        
+        @return: True if the file was re-written, False when no layout is declared for this DataType.
+        """
+        layouts = {}
+        for attr_name in datatype.trait:
+            layout = datatype.get_storage_layout(attr_name)
+            if layout is not None:
+                layouts[datatype.ROOT_NODE_PATH + attr_name] = layout
+        if not layouts:
+            return False
+        file_path = datatype.get_storage_file_path()
+        self.log.debug("Changing storage layout for %s in file %s" % (layouts.keys(), file_path))
+        self._get_manager(file_path).apply_layouts(layouts)
+        self._update_datatype_disk_size(file_path)
+        return True
+    
+    
+    def relayout_all_files_from_storage(self, datatype_class=None):
+        """
+        Re-chunk the H5 files of all stored DataTypes (optionally only instances of datatype_class), 
+        to match the storage layouts declared now in code.
+        
+        @return: (nr_of_files_rewritten, nr_of_faults)
+        """
+        nr_of_files_rewritten = 0
+        nr_of_faults = 0
+        datatype_total_count = dao.count_all_datatypes()
+        for page_start in xrange(0, datatype_total_count, self.DATA_TYPES_PAGE_SIZE):
+            for datatype in dao.get_all_datatypes(page_start, self.DATA_TYPES_PAGE_SIZE):
+                specific_datatype = dao.get_datatype_by_gid(datatype.gid)
+                if not isinstance(specific_datatype, MappedType):
+                    continue
+                if datatype_class is not None and not isinstance(specific_datatype, datatype_class):
+                    continue
+                try:
+                    if self.relayout_datatype_file(specific_datatype):
+                        nr_of_files_rewritten += 1
+                except Exception, excep:
+                    ## The original file is left untouched, in case of failure.
+                    nr_of_faults += 1
+                    self.log.exception(excep)
+        self.log.info("Storage layout changed for %d files, with %d faults." % (nr_of_files_rewritten, nr_of_faults))
+        return nr_of_files_rewritten, nr_of_faults
+    
+
     @staticmethod
     def _get_manager(file_path):
         """
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Process-wide pool of open H5 file handles.
+
+Opening an H5 file (and parsing its header) is expensive compared with reading
+a small page of data from it. The pool keeps handles open between consecutive
+HDF5StorageManager operations, keyed by the file's absolute path.
+
+Only read-only handles are kept open after being released. HDF5 does not keep 
+an open handle coherent with writes done by other processes (e.g. operation workers), 
+thus a handle opened for append is closed as soon as nobody uses it.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+import h5py as hdf5
+from tvb.basic.logger.builder import get_logger
+from tvb.basic.config.settings import TVBSettings as cfg
+
+LOG = get_logger(__name__)
+
+MODE_READ = 'r'
+MODE_APPEND = 'a'
+
+
+
+class _PooledFile(object):
+    """
+    Book-keeping for one open h5py.File handle.
+    """
+    def __init__(self, h5_file, mode, signature):
+        self.h5_file = h5_file
+        self.mode = mode
+        self.signature = signature
+        self.ref_count = 0
+        ## Number of references held, by thread identifier.
+        self.owners = {}
+        self.invalidated = False
+
+
+    def is_valid(self):
+        """ Check that the h5py handle was not closed behind our back."""
+        return self.h5_file is not None and self.h5_file.fid.valid
+
+
+
+class HDF5FilePool(object):
+    """
+    LRU pool of h5py.File handles, shared by all HDF5StorageManager instances of the current process.
+
+    - A handle opened for append ('a') also serves read requests, and is closed when released by all users;
+    - A read-only handle is upgraded (closed and re-opened in append mode) when a write is requested,
+      after the readers from other threads have released it;
+    - Only idle handles (not acquired by anybody) are closed when the pool exceeds its capacity;
+    - A handle is re-opened when the file was changed on disk by somebody else (e.g. another process).
+    """
+
+    def __init__(self, max_open_files=None):
+        if max_open_files is None:
+            max_open_files = cfg.MAX_OPEN_HDF5_FILES
+        self.max_open_files = max_open_files
+        self._entries = OrderedDict()
+        self._condition = threading.Condition(threading.RLock())
+
+
+    def acquire(self, file_path, mode=MODE_APPEND):
+        """
+        Get an open handle for the given file. Every call should be paired with a call to release().
+
+        :param file_path: full path towards the H5 file
+        :param mode: 'r' for read-only access, 'a' for read/write access
+        :return: an open h5py.File instance
+        """
+        file_path = os.path.abspath(file_path)
+        thread_id = threading.current_thread().ident
+        self._condition.acquire()
+        try:
+            entry = self._entries.get(file_path)
+            while (entry is not None and mode != MODE_READ and entry.mode == MODE_READ 
+                   and entry.ref_count > entry.owners.get(thread_id, 0)):
+                ## Wait for readers in other threads to finish, before upgrading the handle to append mode.
+                self._condition.wait()
+                entry = self._entries.get(file_path)
+
+            if entry is not None and mode != MODE_READ and entry.mode == MODE_READ and entry.ref_count > 0:
+                ## Still read by the current thread only (waiting would never end): upgrade in place.
+                self._upgrade_entry(file_path, entry)
+            elif entry is not None and not self._is_reusable(entry, file_path, mode):
+                self._close_entry(file_path, entry)
+                entry = None
+
+            if entry is None:
+                self._evict_idle_files()
+                LOG.debug("Opening file: %s in mode: %s" % (file_path, mode))
+                h5_file = hdf5.File(file_path, mode, libver='latest')
+                entry = _PooledFile(h5_file, mode, None)
+                self._entries[file_path] = entry
+            else:
+                ## Mark as most recently used.
+                del self._entries[file_path]
+                self._entries[file_path] = entry
+            entry.ref_count += 1
+            entry.owners[thread_id] = entry.owners.get(thread_id, 0) + 1
+            return entry.h5_file
+        finally:
+            self._condition.release()
+
+
+    def release(self, file_path):
+        """
+        Give back a handle previously obtained through acquire().
+        A read-only handle is kept open for later usage, a handle opened for append gets closed 
+        when nobody uses it any more.
+        """
+        file_path = os.path.abspath(file_path)
+        self._condition.acquire()
+        try:
+            entry = self._entries.get(file_path)
+            if entry is None:
+                return
+            entry.ref_count = max(entry.ref_count - 1, 0)
+            self._remove_owner(entry)
+            if entry.ref_count == 0:
+                if entry.invalidated or not entry.is_valid() or entry.mode != MODE_READ:
+                    self._close_entry(file_path, entry)
+                else:
+                    entry.signature = self._file_signature(file_path)
+                    self._evict_idle_files()
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
+
+
+    def invalidate(self, file_path):
+        """
+        Drop the handle for a file which is about to be removed or moved.
+        A handle still in use is closed as soon as it gets released.
+        """
+        file_path = os.path.abspath(file_path)
+        self._condition.acquire()
+        try:
+            entry = self._entries.get(file_path)
+            if entry is not None:
+                if entry.ref_count > 0:
+                    LOG.warning("Invalidating file %s while still in use." % file_path)
+                    entry.invalidated = True
+                else:
+                    self._close_entry(file_path, entry)
+        finally:
+            self._condition.release()
+
+
+    def invalidate_folder(self, folder_path):
+        """
+        Drop all handles for files under the given folder (e.g. when removing an Operation or Project).
+        """
+        folder_path = os.path.join(os.path.abspath(folder_path), '')
+        self._condition.acquire()
+        try:
+            for file_path in self._entries.keys():
+                if file_path.startswith(folder_path):
+                    self.invalidate(file_path)
+        finally:
+            self._condition.release()
+
+
+    def close_all(self):
+        """
+        Close every idle handle in the pool (e.g. at application shutdown).
+        """
+        self._condition.acquire()
+        try:
+            for file_path, entry in self._entries.items():
+                if entry.ref_count == 0:
+                    self._close_entry(file_path, entry)
+        finally:
+            self._condition.release()
+
+
+    def open_files_count(self):
+        """ Number of handles currently held open by the pool. """
+        return len(self._entries)
+
+
+    def _is_reusable(self, entry, file_path, mode):
+        """
+        Check if a pooled handle can serve a new request in the given mode.
+        """
+        if not entry.is_valid():
+            return False
+        if mode != MODE_READ and entry.mode == MODE_READ:
+            return False
+        if entry.ref_count == 0 and entry.signature is not None:
+            ## Somebody else wrote (or replaced) the file since we have released it.
+            return entry.signature == self._file_signature(file_path)
+        return True
+
+
+    def _upgrade_entry(self, file_path, entry):
+        """
+        Re-open in append mode a read-only handle, keeping its references. 
+        Handles given before become invalid, and are acquired again by their users on next access.
+        """
+        LOG.debug("Re-opening file: %s in mode: %s" % (file_path, MODE_APPEND))
+        if entry.is_valid():
+            entry.h5_file.close()
+        entry.h5_file = hdf5.File(file_path, MODE_APPEND, libver='latest')
+        entry.mode = MODE_APPEND
+        entry.signature = None
+    
+    
+    @staticmethod
+    def _remove_owner(entry):
+        """
+        Drop one reference of the current thread. A handle can be released from another thread 
+        than the one which acquired it (e.g. asynchronous writers), then any owner is decremented.
+        """
+        thread_id = threading.current_thread().ident
+        if thread_id not in entry.owners:
+            if not entry.owners:
+                return
+            thread_id = iter(entry.owners).next()
+        if entry.owners[thread_id] > 1:
+            entry.owners[thread_id] -= 1
+        else:
+            del entry.owners[thread_id]
+
+
+    def _evict_idle_files(self):
+        """
+        Close least recently used idle handles, until we are under the allowed maximum.
+        Handles in use are never closed, so the limit can temporarily be exceeded.
+        """
+        if len(self._entries) < self.max_open_files:
+            return
+        for file_path, entry in self._entries.items():
+            if len(self._entries) < self.max_open_files:
+                break
+            if entry.ref_count == 0:
+                self._close_entry(file_path, entry)
+
+
+    def _close_entry(self, file_path, entry):
+        """
+        Close one handle and remove it from the pool.
+        """
+        del self._entries[file_path]
+        if entry.is_valid():
+            LOG.debug("Closing file: %s" % file_path)
+            try:
+                entry.h5_file.close()
+            except Exception, excep:
+                ### The file is correctly closed, but the list of open files on HDF5 is not updated in a synch manner.
+                LOG.exception(excep)
+        self._condition.notifyAll()
+
+
+    @staticmethod
+    def _file_signature(file_path):
+        """
+        :return: a tuple identifying the current on-disk version of the file, or None when file is missing.
+        """
+        try:
+            stat = os.stat(file_path)
+            return stat.st_ino, stat.st_size, stat.st_mtime
+        except OSError:
+            return None
+
+
+
+## Process-wide instance, to be used by all storage managers.
+FILES_POOL = HDF5FilePool()
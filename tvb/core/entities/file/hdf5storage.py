@@ -26,7 +26,7 @@ Persistence of data in HDF5 format.
 '''
 
 import os
-import copy
+import Queue
 import numpy as numpy
 from datetime import datetime
 import tvb.core.utils as utils
@@ -35,6 +35,7 @@ from tvb.basic.logger.builder import get_logger
 from tvb.basic.config.settings import TVBSettings as cfg
 from tvb.core.entities.file.exceptions import FileStructureException, MissingDataSetException
 from tvb.core.entities.file.exceptions import IncompatibleFileManagerException, MissingDataFileException
+from tvb.core.entities.file.hdf5pool import FILES_POOL
 from tvb.core.entities.transient.structure_entities import GenericMetaData
 
 # Create logger for this module
@@ -47,6 +48,105 @@ LOCK_OPEN_FILE = threading.Lock()
 ## big files. Since performance will mostly be important for the simulator we'll just use the top range for now.
 CHUNK_BLOCK_SIZE = 300000
 
+
+
+class DataSetLayout(object):
+    """
+    Describes how a data set is laid out on disk: chunk shape and compression filters.
+    The chunk shape is computed from the dominant access pattern of the data set, 
+    so that the typical read touches as few chunks as possible:
+    
+        - ACCESS_TIME_MAJOR: pages of consecutive time points, with all the other dimensions (e.g. visualizers);
+        - ACCESS_SPACE_MAJOR: long time series for a few nodes / channels (e.g. analyzers);
+        - ACCESS_CONTIGUOUS: no chunking, when possible (data set not growable and not compressed).
+    """
+    ACCESS_CONTIGUOUS = "contiguous"
+    ACCESS_TIME_MAJOR = "time_major"
+    ACCESS_SPACE_MAJOR = "space_major"
+    
+    COMPRESSION_GZIP = "gzip"
+    COMPRESSION_LZF = "lzf"
+    
+    
+    def __init__(self, access_pattern=ACCESS_TIME_MAJOR, time_axis=0, compression=None, 
+                 compression_level=None, shuffle=False, block_size=CHUNK_BLOCK_SIZE):
+        """
+        :param access_pattern: one of the ACCESS_* constants
+        :param time_axis: the dimension of the data set representing time
+        :param compression: None, COMPRESSION_GZIP or COMPRESSION_LZF
+        :param compression_level: 0-9, only used for gzip compression
+        :param shuffle: apply the shuffle filter before compression (improves compression of numeric data)
+        :param block_size: the desired size in Bytes of one chunk
+        """
+        if access_pattern not in (self.ACCESS_CONTIGUOUS, self.ACCESS_TIME_MAJOR, self.ACCESS_SPACE_MAJOR):
+            raise FileStructureException("Invalid access pattern: %s" % str(access_pattern))
+        if compression not in (None, self.COMPRESSION_GZIP, self.COMPRESSION_LZF):
+            raise FileStructureException("Unsupported compression filter: %s" % str(compression))
+        self.access_pattern = access_pattern
+        self.time_axis = time_axis
+        self.compression = compression
+        self.compression_level = compression_level
+        self.shuffle = shuffle
+        self.block_size = block_size
+        
+        
+    def compute_chunk_shape(self, data_shape, item_size=8, grow_dimension=None, expected_rows=None):
+        """
+        :param data_shape: shape of the data set (or of the first chunk written, for growable data sets)
+        :param item_size: size in Bytes of one element
+        :param grow_dimension: the dimension on which the data set will grow, None if not growable
+        :param expected_rows: expected final length on the growable dimension, when known
+        :return: a tuple with the chunk shape, or None for a contiguous data set
+        """
+        data_shape = list(data_shape)
+        if not data_shape:
+            return None
+        nr_dims = len(data_shape)
+        if grow_dimension is not None:
+            grow_dimension = grow_dimension % nr_dims
+        if (self.access_pattern == self.ACCESS_CONTIGUOUS and grow_dimension is None 
+                and self.compression is None and not self.shuffle):
+            return None
+        
+        elements_per_block = max(int(self.block_size // max(item_size, 1)), 1)
+        extents = [max(dim, 1) for dim in data_shape]
+        if grow_dimension is not None:
+            extents[grow_dimension] = expected_rows if expected_rows else elements_per_block
+        
+        time_axis = self.time_axis % nr_dims
+        other_axes = [idx for idx in reversed(range(nr_dims)) if idx != time_axis]
+        if self.access_pattern == self.ACCESS_SPACE_MAJOR:
+            axes_order = [time_axis] + other_axes
+        else:
+            axes_order = other_axes + [time_axis]
+        
+        ## Greedily cover full dimensions, in the order of preference, until the block is filled.
+        chunk_shape = [1] * nr_dims
+        remaining = elements_per_block
+        for axis in axes_order:
+            chunk_shape[axis] = max(min(extents[axis], remaining), 1)
+            remaining = max(remaining // chunk_shape[axis], 1)
+        return tuple(chunk_shape)
+    
+    
+    def get_dataset_options(self, data_shape, dtype, grow_dimension=None, expected_rows=None):
+        """
+        :return: dictionary with the keyword arguments to be passed to h5py create_dataset.
+        """
+        options = dict()
+        chunk_shape = self.compute_chunk_shape(data_shape, numpy.dtype(dtype).itemsize, grow_dimension, expected_rows)
+        if chunk_shape is not None:
+            options['chunks'] = chunk_shape
+        if self.compression is not None:
+            options['compression'] = self.compression
+            if self.compression == self.COMPRESSION_GZIP and self.compression_level is not None:
+                options['compression_opts'] = self.compression_level
+        if self.shuffle:
+            options['shuffle'] = True
+        return options
+
+
+
 class HDF5StorageManager(object):
     """
     This class is responsible for saving / loading data in HDF5 file / format.
@@ -64,10 +164,12 @@ class HDF5StorageManager(object):
     LOCKS = {}
     
         
-    def __init__(self, storage_folder, file_name, buffer_size=600000):
+    def __init__(self, storage_folder, file_name, buffer_size=600000, files_pool=None):
         """
         Creates a new storage manager instance.
         @param buffer_size: the size in Bytes of the amount of data that will be buffered before writing to file. 
+        @param files_pool: HDF5FilePool from where to get open file handles. 
+                           When not specified, the process-wide pool is used.
         """
         if storage_folder is None:
             raise FileStructureException("Please provide the folder where to store data")
@@ -76,6 +178,10 @@ class HDF5StorageManager(object):
         self.__storage_full_name = os.path.join(storage_folder, file_name)
         self.__buffer_size = buffer_size
         self.__buffer_array = None
+        self.__hfd5_mode = None
+        self.__files_pool = files_pool if files_pool is not None else FILES_POOL
+        self.__async_queue_size = None
+        self.__async_writer = None
         self.data_buffers = {}
     
     
@@ -90,13 +196,15 @@ class HDF5StorageManager(object):
             return False
         
             
-    def store_data(self, dataset_name, data_list, where=ROOT_NODE_PATH):
+    def store_data(self, dataset_name, data_list, where=ROOT_NODE_PATH, layout=None):
         """
         This method stores provided data list into a data set in the H5 file.
         
         :param dataset_name: Name of the data set where to store data
         :param data_list: Data to be stored
         :param where: represents the path where to store our dataset (e.g. /data/info)
+        :param layout: DataSetLayout with chunking / compression to be used. 
+            When None, data is stored in a contiguous data set.
         """
         if dataset_name is None:
             dataset_name = ''
@@ -106,16 +214,44 @@ class HDF5StorageManager(object):
         try:
             LOG.debug("Saving data into data set: %s" % dataset_name)
             # Open file in append mode ('a') to allow adding multiple data sets in the same file
-            chunk_shape = self.__compute_chunk_shape(data_to_store.shape)
-            hdf5File = self._open_h5_file(chunk_shape=chunk_shape)
-            hdf5File[where + dataset_name] = data_to_store
+            hdf5File = self._open_h5_file()
+            if layout is None:
+                hdf5File[where + dataset_name] = data_to_store
+            else:
+                options = layout.get_dataset_options(data_to_store.shape, data_to_store.dtype)
+                hdf5File.create_dataset(where + dataset_name, data=data_to_store, **options)
         finally:
             # Now close file
             self.close_file() 
             
             
+    def store_data_group(self, data_sets, meta_dictionary=None, where=ROOT_NODE_PATH, tvb_specific_metadata=True):
+        """
+        Store several related data sets, and meta-data on their common node, with a single open of the file.
+        
+        :param data_sets: dictionary {data set name: data to be stored}
+        :param meta_dictionary: meta-data to be set on node 'where'
+        :param where: path prefix for all the data sets (e.g. /data/info)
+        """
+        if where is None:
+            where = self.ROOT_NODE_PATH
+        try:
+            LOG.debug("Saving data sets: %s under %s" % (str(data_sets.keys()), where))
+            hdf5File = self._open_h5_file()
+            for dataset_name, data_list in data_sets.iteritems():
+                hdf5File[where + dataset_name] = self._check_data(data_list)
+            if meta_dictionary is not None:
+                try:
+                    node = hdf5File[where]
+                except KeyError:
+                    node = hdf5File.create_dataset(where, (1,))
+                self.__write_node_metadata(node, meta_dictionary, tvb_specific_metadata)
+        finally:
+            self.close_file()
+            
+            
     def append_data(self, dataset_name, data_list, grow_dimension=-1, expected_rows=None, 
-                    buffer_shape=None, close_file=True, where=ROOT_NODE_PATH):
+                    buffer_shape=None, close_file=True, where=ROOT_NODE_PATH, layout=None):
         """
         This method appends data to an existing data set. If the data set does not exists, create it first.
         
@@ -128,6 +264,12 @@ class HDF5StorageManager(object):
         :param close_file: Specify if the file should be closed automatically after write operation. If not, 
             you have to close file by calling method close_file()
         :param where: represents the path where to store our dataset (e.g. /data/info)
+        :param layout: DataSetLayout with chunking / compression, used when the data set gets created.
+            When None, the chunk shape is chosen by h5py.
+            
+        When asynchronous writes are enabled, a copy of the data is queued for the background writer 
+        thread. With close_file=True, this call then waits for all queued chunks to be written and 
+        closes the file; pass close_file=False (and call close_file() at the end) to keep writing in background.
         
         """
         if dataset_name is None:
@@ -135,32 +277,82 @@ class HDF5StorageManager(object):
         if where is None:
             where = self.ROOT_NODE_PATH
         data_to_store = self._check_data(data_list)
+        if self.__async_queue_size and not self.__is_async_writer_thread():
+            if self.__async_writer is None:
+                self.__async_writer = HDF5StorageManager.AsyncChunkWriter(self.__append_data, self.__async_queue_size)
+            self.__async_writer.submit(dataset_name, numpy.array(data_to_store, copy=True), 
+                                       grow_dimension, expected_rows, where, layout)
+            if close_file:
+                self.close_file()
+            return
+        self.__append_data(dataset_name, data_to_store, grow_dimension, expected_rows, where, layout)
+        if close_file:
+            self.close_file()
+            
+            
+    def __append_data(self, dataset_name, data_to_store, grow_dimension, expected_rows, where, layout):
+        """
+        Buffer data for append, creating the data set if needed. The file is left open.
+        """
         data_buffer = self.data_buffers.get(where + dataset_name, None)
         
         if data_buffer is None:
-            chunk_shape = self.__compute_chunk_shape(data_to_store.shape, grow_dimension)
-            hdf5File = self._open_h5_file(chunk_shape=chunk_shape)
+            hdf5File = self._open_h5_file()
             try:
                 dataset = hdf5File[where + dataset_name]
                 self.data_buffers[where + dataset_name] = HDF5StorageManager.H5pyStorageBuffer(dataset, 
                                                                                            buffer_size=self.__buffer_size, 
                                                                                            buffered_data=data_to_store, 
-                                                                                           grow_dimension=grow_dimension)
+                                                                                           grow_dimension=grow_dimension,
+                                                                                           expected_rows=expected_rows)
             except KeyError:
                 data_shape_list = list(data_to_store.shape)
                 data_shape_list[grow_dimension] = None
                 data_shape = tuple(data_shape_list)
+                options = dict()
+                if layout is not None:
+                    options = layout.get_dataset_options(data_to_store.shape, data_to_store.dtype, 
+                                                         grow_dimension, expected_rows)
                 dataset = hdf5File.create_dataset(where + dataset_name, data=data_to_store, shape=data_to_store.shape, 
-                                                  dtype=data_to_store.dtype, maxshape=data_shape)
+                                                  dtype=data_to_store.dtype, maxshape=data_shape, **options)
                 self.data_buffers[where + dataset_name] = HDF5StorageManager.H5pyStorageBuffer(dataset, 
                                                                                                buffer_size=self.__buffer_size, 
                                                                                                buffered_data=None, 
-                                                                                               grow_dimension=grow_dimension)
+                                                                                               grow_dimension=grow_dimension,
+                                                                                               expected_rows=expected_rows)
         else:
             if not data_buffer.buffer_data(data_to_store):
                 data_buffer.flush_buffered_data()
-        if close_file:
-            self.close_file()
+                
+                
+    def enable_async_writes(self, queue_size):
+        """
+        Have append_data executed by one background thread for this file, so that the caller
+        (e.g. the simulator) can continue computing while previous chunks are written to disk.
+        
+        :param queue_size: maximum number of chunks waiting to be written. When the queue is full, 
+            append_data blocks until the writer catches up. None or 0 means synchronous writes.
+        """
+        self.__async_queue_size = queue_size
+        
+        
+    def __is_async_writer_thread(self):
+        """ True when called from the background writer thread of this manager. """
+        return self.__async_writer is not None and self.__async_writer.is_writer_thread()
+    
+    
+    def __wait_async_writes(self, stop_writer=False):
+        """
+        Barrier: wait until every queued chunk was written, before touching the file from the calling thread.
+        """
+        writer = self.__async_writer
+        if writer is None or writer.is_writer_thread():
+            return
+        if stop_writer:
+            self.__async_writer = None
+            writer.stop()
+        else:
+            writer.wait()
 
                  
     def remove_data(self, dataset_name, where=ROOT_NODE_PATH):
@@ -187,13 +379,83 @@ class HDF5StorageManager(object):
         finally:        
             self.close_file()  
     
-    def get_data(self, dataset_name, data_slice=None, where=ROOT_NODE_PATH, ignore_errors=False):
+    def apply_layouts(self, layouts):
+        """
+        Re-write the whole H5 file, so that the given data sets get a new chunk shape / compression.
+        All other nodes and all meta-data are copied unchanged. Data is copied in blocks, 
+        to keep memory usage bounded, into a temporary file which then replaces the original one.
+        
+        :param layouts: dictionary {full data set path (e.g. /data): DataSetLayout}
+        """
+        self.close_file()
+        self.__files_pool.invalidate(self.__storage_full_name)
+        temp_file_name = self.__storage_full_name + ".relayout"
+        source_file = hdf5.File(self.__storage_full_name, 'r', libver='latest')
+        try:
+            target_file = hdf5.File(temp_file_name, 'w', libver='latest')
+            try:
+                self.__copy_attributes(source_file['/'], target_file['/'])
+                for node_name in source_file:
+                    self.__copy_node(source_file[node_name], target_file, layouts)
+            finally:
+                target_file.close()
+        except Exception, excep:
+            LOG.exception(excep)
+            if os.path.exists(temp_file_name):
+                os.remove(temp_file_name)
+            raise FileStructureException("Could not change layout for file %s" % self.__storage_full_name)
+        finally:
+            source_file.close()
+        os.rename(temp_file_name, self.__storage_full_name)
+        os.chmod(self.__storage_full_name, cfg.ACCESS_MODE_TVB_FILES)
+    
+    def __copy_node(self, source_node, target_group, layouts):
+        """
+        Copy one H5 node (group or data set) into target_group, applying the new layout if one is given.
+        """
+        node_name = source_node.name.split('/')[-1]
+        if isinstance(source_node, hdf5.Group):
+            new_group = target_group.create_group(node_name)
+            self.__copy_attributes(source_node, new_group)
+            for child_name in source_node:
+                self.__copy_node(source_node[child_name], new_group, layouts)
+            return
+        layout = layouts.get(source_node.name)
+        if layout is None or source_node.dtype.kind == 'O' or not source_node.shape:
+            source_node.file.copy(source_node, target_group, name=node_name)
+            return
+        grow_dimension = None
+        if source_node.maxshape is not None and None in source_node.maxshape:
+            grow_dimension = list(source_node.maxshape).index(None)
+        options = layout.get_dataset_options(source_node.shape, source_node.dtype, grow_dimension)
+        new_dataset = target_group.create_dataset(node_name, shape=source_node.shape, dtype=source_node.dtype,
+                                                  maxshape=source_node.maxshape, **options)
+        ## Copy in blocks along the first dimension.
+        row_size = max(source_node.size // max(source_node.shape[0], 1), 1) * source_node.dtype.itemsize
+        rows_per_block = max(self.__buffer_size // row_size, 1)
+        for start in xrange(0, source_node.shape[0], rows_per_block):
+            block_slice = slice(start, min(start + rows_per_block, source_node.shape[0]))
+            new_dataset[block_slice] = source_node[block_slice]
+        self.__copy_attributes(source_node, new_dataset)
+    
+    @staticmethod
+    def __copy_attributes(source_node, target_node):
+        """
+        Copy all H5 attributes (meta-data) between two nodes.
+        """
+        for meta_key, meta_value in source_node.attrs.iteritems():
+            target_node.attrs[meta_key] = meta_value
+    
+    def get_data(self, dataset_name, data_slice=None, where=ROOT_NODE_PATH, ignore_errors=False, use_memmap=False):
         """
         This method reads data from the given data set based on the slice specification
         
         :param dataset_name: Name of the data set from where to read data
         :param data_slice: Specify how to retrieve data from array {e.g (slice(1,10,1),slice(1,6,2)) }
         :param where: represents the path where dataset is stored (e.g. /data/info)  
+        :param use_memmap: when True and the data set is contiguous and not compressed, return a read-only
+            numpy.memmap view over the file, instead of copying data in memory. 
+            For chunked data sets, a normal in-memory copy is returned.
         :return: a numpy.ndarray containing filtered data
         
         """
@@ -206,7 +468,16 @@ class HDF5StorageManager(object):
         try:
             # Open file to read data
             hdf5File = self._open_h5_file('r')
+            self.__close_buffer(where + dataset_name)
             data_array = hdf5File[where + dataset_name]
+            if use_memmap:
+                mapped_array = self.__get_memmap_view(hdf5File, data_array)
+                if mapped_array is not None:
+                    if data_slice is None:
+                        return mapped_array
+                    if isinstance(data_slice, list) and all(isinstance(one_slice, slice) for one_slice in data_slice):
+                        data_slice = tuple(data_slice)
+                    return mapped_array[data_slice]
             # Now read data
             if data_slice is None:
                 return data_array[()]
@@ -221,6 +492,61 @@ class HDF5StorageManager(object):
         finally:        
             self.close_file()  
             
+    def get_data_group(self, data_slices, where=ROOT_NODE_PATH, with_metadata=False):
+        """
+        Read (parts of) several related data sets, with a single open of the file.
+        
+        :param data_slices: list of tuples (data set name, slice or None for the full data set)
+        :param where: path prefix for all the data sets (e.g. /data/info)
+        :param with_metadata: when True, meta-data of node 'where' is also read
+        :return: list of numpy arrays, in the order of data_slices (preceded by the meta-data dictionary, 
+                 when requested)
+        """
+        if where is None:
+            where = self.ROOT_NODE_PATH
+        try:
+            hdf5File = self._open_h5_file('r')
+            result = []
+            if with_metadata:
+                result.append(self.__read_node_metadata(hdf5File[where]))
+            for dataset_name, data_slice in data_slices:
+                self.__close_buffer(where + dataset_name)
+                data_array = hdf5File[where + dataset_name]
+                result.append(data_array[()] if data_slice is None else data_array[data_slice])
+            return result
+        except KeyError:
+            LOG.error("Trying to read data from a missing data set under: %s" % where)
+            raise MissingDataSetException("Could not locate data sets under: %s" % where)
+        finally:
+            self.close_file()
+            
+            
+    def __close_buffer(self, dataset_path):
+        """
+        Write to file (and trim) the append buffer of a data set, before reading from it.
+        """
+        data_buffer = self.data_buffers.pop(dataset_path, None)
+        if data_buffer is not None:
+            data_buffer.close()
+    
+    def __get_memmap_view(self, hdf5_file, data_array):
+        """
+        Build a read-only memory-mapped view over the raw bytes of a data set.
+        
+        :return: numpy.memmap instance, or None when the data set layout does not allow it 
+            (chunked, compressed, not yet allocated on disk or with variable length elements).
+        """
+        if data_array.chunks is not None or data_array.dtype.kind == 'O' or data_array.size == 0:
+            return None
+        offset = data_array.id.get_offset()
+        if offset is None:
+            return None
+        if hdf5_file.mode != 'r':
+            ## Make sure everything written through HDF5 cache is visible on disk.
+            hdf5_file.flush()
+        return numpy.memmap(self.__storage_full_name, mode='r', dtype=data_array.dtype, 
+                            shape=data_array.shape, offset=offset, order='C')
+            
     def get_data_shape(self, dataset_name, where=ROOT_NODE_PATH, ignore_errors=False):
         """
         This method reads data-size from the given data set 
@@ -239,6 +565,7 @@ class HDF5StorageManager(object):
         try:
             # Open file to read data
             hdf5File = self._open_h5_file('r')
+            self.__close_buffer(where + dataset_name)
             data_array = hdf5File[where + dataset_name]
             return data_array.shape
         except KeyError:
@@ -276,16 +603,24 @@ class HDF5StorageManager(object):
             node = hdf5File.create_dataset(where + dataset_name, (1,))
         try:
             # Now set meta-data
-            for meta_key in meta_dictionary:
-                key_to_store = meta_key
-                if tvb_specific_metadata:
-                    key_to_store = self.TVB_ATTRIBUTE_PREFIX + meta_key
-                
-                processed_value = self._serialize_value(meta_dictionary[meta_key])
-                node.attrs[key_to_store] = processed_value
+            self.__write_node_metadata(node, meta_dictionary, tvb_specific_metadata)
         finally:        
             self.close_file()    
     
+    
+    def __write_node_metadata(self, node, meta_dictionary, tvb_specific_metadata):
+        """
+        Set meta-data as attributes of an open H5 node.
+        """
+        for meta_key in meta_dictionary:
+            key_to_store = meta_key
+            if tvb_specific_metadata:
+                key_to_store = self.TVB_ATTRIBUTE_PREFIX + meta_key
+            
+            processed_value = self._serialize_value(meta_dictionary[meta_key])
+            node.attrs[key_to_store] = processed_value
+    
+    
     def _serialize_value(self, value):
         """
         This method takes a value which will be stored as metadata and 
@@ -366,18 +701,8 @@ class HDF5StorageManager(object):
             hdf5File = self._open_h5_file('r')
             
             node = hdf5File[where + dataset_name]
-
             # Now retrieve metadata values
-            all_meta_data = {}
-            
-            for meta_key in node.attrs:
-                new_key = meta_key
-                if meta_key.startswith(self.TVB_ATTRIBUTE_PREFIX):
-                    new_key = meta_key[len(self.TVB_ATTRIBUTE_PREFIX):]
-                value = node.attrs[meta_key]
-                all_meta_data[new_key] = self._deserialize_value(value)
-            
-            return all_meta_data
+            return self.__read_node_metadata(node)
         except KeyError:
             if not ignore_errors:
                 LOG.debug("Trying to read data from a missing data set: %s" % dataset_name)
@@ -385,12 +710,26 @@ class HDF5StorageManager(object):
             else:
                 return numpy.ndarray(0)
         except AttributeError:
-            LOG.error("Trying to get value for missing metadata %s" % meta_key)
-            raise FileStructureException("There is no metadata named %s on this node" % meta_key)
+            LOG.error("Trying to get value for missing metadata on %s" % dataset_name)
+            raise FileStructureException("Could not read metadata of node %s" % dataset_name)
         finally:        
             self.close_file()
 
 
+    def __read_node_metadata(self, node):
+        """
+        :return: dictionary with all the attributes of an open H5 node (TVB prefix removed from keys).
+        """
+        all_meta_data = {}
+        for meta_key in node.attrs:
+            new_key = meta_key
+            if meta_key.startswith(self.TVB_ATTRIBUTE_PREFIX):
+                new_key = meta_key[len(self.TVB_ATTRIBUTE_PREFIX):]
+            value = node.attrs[meta_key]
+            all_meta_data[new_key] = self._deserialize_value(value)
+        return all_meta_data
+
+
     def get_file_data_version(self):
         """
         Checks the data version for the current file.
@@ -468,95 +807,72 @@ class HDF5StorageManager(object):
         
     def close_file(self):
         """
-        The syncronization of open/close doesn't seem to be needed anymore for h5py in
-        contrast to pytables for concurrent reads. However since it shouldn't add that 
-        much overhead in most situation we'll leave it like this for now since in case
-        of concurrent writes(metadata) this provides extra safety.
+        Flush any buffered data and give the file handle back to the pool of open files.
+        A file opened only for reading is kept open by the pool, for later operations.
+        In case of concurrent writes (metadata) the per-file lock provides extra safety.
+        When asynchronous writes are enabled, wait for all queued chunks to be written first.
         """
-        self.__aquire_lock()
-        self.__close_file()
-        self.__release_lock()
+        try:
+            self.__wait_async_writes(stop_writer=True)
+        finally:
+            self.__aquire_lock()
+            try:
+                self.__close_file()
+            finally:
+                self.__release_lock()
         
-    def _open_h5_file(self, mode='a', chunk_shape=None):
+    def _open_h5_file(self, mode='a'):
         """
-        The syncronization of open/close doesn't seem to be needed anymore for h5py in
-        contrast to pytables for concurrent reads. However since it shouldn't add that 
-        much overhead in most situation we'll leave it like this for now since in case
-        of concurrent writes(metadata) this provides extra safety.
+        Get an open handle from the pool of files. No per-file lock is needed here,
+        as the pool is already synchronized (and might wait for readers before upgrading to append mode).
         """
-        self.__aquire_lock()
-        file_obj = self.__open_h5_file(mode, chunk_shape)
-        self.__release_lock()
-        return file_obj
-    
-    def __compute_chunk_shape(self, data_shape, grow_dim=None):
-        data_shape = list(data_shape)
-        if not data_shape:
-            return 1
-        nr_elems_per_block = CHUNK_BLOCK_SIZE / 8.0
-        if grow_dim is None:
-            # We don't know what dimension is growing or we are not in
-            # append mode and just want to write the whole data.
-            max_leng_dim = data_shape.index(max(data_shape))
-            for dim in data_shape:
-                nr_elems_per_block = nr_elems_per_block / dim
-            nr_elems_per_block = nr_elems_per_block * data_shape[max_leng_dim]
-            if nr_elems_per_block < 1:
-                nr_elems_per_block = 1
-            data_shape[max_leng_dim] = int(nr_elems_per_block)
-            return tuple(data_shape)
-        else:
-            for idx, dim in enumerate(data_shape):
-                if idx != grow_dim:
-                    nr_elems_per_block = nr_elems_per_block / dim
-            if nr_elems_per_block < 1:
-                nr_elems_per_block = 1
-            data_shape[grow_dim] = int(nr_elems_per_block)
-            return tuple(data_shape)
+        self.__wait_async_writes()
+        return self.__open_h5_file(mode)
     
     def __close_file(self):
         """
-        Close file used to store data.
+        Flush buffers and release the file used to store data.
         """
         hdf5_file = self.__hfd5_file
         
-        # Try to close file only if it was opened before
-        if hdf5_file is not None and hdf5_file.fid.valid:
-            LOG.debug("Closing file: %s" % self.__storage_full_name)
+        # Try to release file only if it was opened before
+        if hdf5_file is not None:
+            LOG.debug("Releasing file: %s" % self.__storage_full_name)
             try:
-                for h5py_buffer in self.data_buffers.values():
-                    h5py_buffer.flush_buffered_data()
-                self.data_buffers = {}
-                hdf5_file.close()
+                if hdf5_file.fid.valid:
+                    for h5py_buffer in self.data_buffers.values():
+                        h5py_buffer.close()
             except Exception, excep:
-                ### Do nothing is this situation.
-                ### The file is correctly closed, but the list of open files on HDF5 is not updated in a synch manner.
-                ### del _open_files[filename] might throw KeyError
                 LOG.exception(excep)
-            if not hdf5_file.fid.valid:
-                self.__hfd5_file = None
+            self.data_buffers = {}
+            self.__hfd5_file = None
+            self.__hfd5_mode = None
+            self.__files_pool.release(self.__storage_full_name)
        
     # -------------- Private methods  --------------
-    def __open_h5_file(self, mode = 'a', chunk_shape=None):
+    def __open_h5_file(self, mode = 'a'):
         """
         Open file for reading, writing or append. 
         
-        :param mode: Mode to open file (possible values: w / r / a). Default value = 'a' to 
+        :param mode: Mode to open file (possible values: r / a). Default value = 'a' to 
             allow adding multiple data to the same file
         :return: returns the file which stores data in HDF5 format opened for read / write according to mode param
         
         """
         if self.__storage_full_name is not None:
-            # Check if file is still open from previous writes.
-            if self.__hfd5_file is None or not self.__hfd5_file.fid.valid:
-                file_exists = os.path.exists(self.__storage_full_name)
-                LOG.debug("Opening file: %s in mode: %s" % (self.__storage_full_name, mode))
-                self.__hfd5_file = hdf5.File(self.__storage_full_name, mode, libver='latest', chunks=chunk_shape)
+            # Check if file is still open from previous writes, and the mode is enough for current operation.
+            if self.__hfd5_file is not None:
+                if self.__hfd5_file.fid.valid and (mode == 'r' or self.__hfd5_mode != 'r'):
+                    return self.__hfd5_file
+                self.close_file()
+            file_exists = os.path.exists(self.__storage_full_name)
+            self.__hfd5_file = self.__files_pool.acquire(self.__storage_full_name, mode)
+            self.__hfd5_mode = mode
             
-                # If this is the first time we access file, write data version
-                if not file_exists:
-                    os.chmod(self.__storage_full_name, cfg.ACCESS_MODE_TVB_FILES)
-                    self.__hfd5_file['/'].attrs[self.TVB_ATTRIBUTE_PREFIX + cfg.DATA_VERSION_ATTRIBUTE] = cfg.DATA_VERSION
+            # If this is the first time we access file, write data version
+            if not file_exists:
+                os.chmod(self.__storage_full_name, cfg.ACCESS_MODE_TVB_FILES)
+                self.__hfd5_file['/'].attrs[self.TVB_ATTRIBUTE_PREFIX + cfg.DATA_VERSION_ATTRIBUTE] = cfg.DATA_VERSION
             return self.__hfd5_file    
         else:
             raise FileStructureException("Invalid storage file. Please provide a valid path.")
@@ -577,19 +893,81 @@ class HDF5StorageManager(object):
           
         return data_to_store 
     
+    class AsyncChunkWriter():
+        """
+        Helper class, writing chunks of data from one background thread, in FIFO order.
+        The queue is bounded, so that a fast producer blocks instead of filling the memory.
+        An exception raised while writing is re-raised in the producer thread on the next submit / wait / stop.
+        """
+        def __init__(self, write_function, queue_size):
+            self.write_function = write_function
+            self.jobs_queue = Queue.Queue(maxsize=queue_size)
+            self.error = None
+            self.thread = threading.Thread(target=self.__run, name="H5AsyncWriter")
+            self.thread.daemon = True
+            self.thread.start()
+            
+        def is_writer_thread(self):
+            """ True when called from the background thread. """
+            return threading.current_thread() is self.thread
+            
+        def submit(self, *args):
+            """ Queue one write. Blocks while the queue is full. """
+            self.__check_error()
+            self.jobs_queue.put(args)
+            
+        def wait(self):
+            """ Block until all queued writes were executed. """
+            self.jobs_queue.join()
+            self.__check_error()
+            
+        def stop(self):
+            """ Execute all queued writes, then end the background thread. """
+            self.jobs_queue.put(None)
+            self.thread.join()
+            self.__check_error()
+            
+        def __check_error(self):
+            if self.error is not None:
+                raise FileStructureException("Asynchronous write failed: %s" % str(self.error))
+            
+        def __run(self):
+            while True:
+                job = self.jobs_queue.get()
+                try:
+                    if job is None:
+                        return
+                    if self.error is None:
+                        self.write_function(*job)
+                except Exception, excep:
+                    LOG.exception(excep)
+                    self.error = excep
+                finally:
+                    self.jobs_queue.task_done()
+    
+    
     class H5pyStorageBuffer():
         """
         Helper class in order to buffer data for append operations, to limit the number of actual
         HDD I/O operations.
+        Data is copied in place into a pre-allocated array, which is written to the data set when 
+        full (buffer_size Bytes). The data set itself is resized geometrically (or directly to the 
+        expected number of rows, when known) and trimmed to the real length on close().
         """
-        def __init__(self, h5py_dataset, buffer_size=300, buffered_data=None, grow_dimension=-1):
-            self.buffered_data = buffered_data
-            self.buffer_size = buffer_size
+        def __init__(self, h5py_dataset, buffer_size=300, buffered_data=None, grow_dimension=-1, expected_rows=None):
             if h5py_dataset is None:
                 raise MissingDataSetException("A H5pyStorageBuffer instance must have a h5py dataset for which"
                                               "the buffering is done. Please supply one to the 'h5py_dataset' parameter.")
+            self.buffer_size = buffer_size
             self.h5py_dataset = h5py_dataset
-            self.grow_dimension = grow_dimension
+            self.grow_dimension = grow_dimension % len(h5py_dataset.shape)
+            self.expected_rows = expected_rows
+            ## Number of rows (on the grow dimension) holding real data in the data set.
+            self.written_rows = h5py_dataset.shape[self.grow_dimension]
+            self.buffer_array = None
+            self.buffered_rows = 0
+            if buffered_data is not None:
+                self.buffer_data(buffered_data)
             
         def buffer_data(self, data_list):
             """
@@ -597,49 +975,71 @@ class HDF5StorageManager(object):
             @return: True if buffer is still fine, 
                      False if a flush is necessary since the buffer is full
             """
-            if self.buffered_data is None:
-                self.buffered_data = data_list
-            else:
-#                self.buffered_data = numpy.concatenate((self.buffered_data, data_list), axis=self.grow_dimension)
-                self.buffered_data = self.__custom_numpy_append(self.buffered_data, data_list)
-            if self.buffered_data.nbytes > self.buffer_size:
-                return False
-            else:
-                return True
-            
-        def __custom_numpy_append(self, array1, array2):
-            array_1_shape = numpy.array(array1.shape)
-            array_2_shape = numpy.array(array2.shape)
-            result_shape = copy.deepcopy(array_1_shape)
-            result_shape[self.grow_dimension] += array_2_shape[self.grow_dimension]
-            result_array = numpy.empty(shape=tuple(result_shape), dtype=array1.dtype)
-            full_slice = slice(None, None, None)
-            full_index = [full_slice for _ in array_1_shape]
-            full_index[self.grow_dimension] = slice(0, array_1_shape[self.grow_dimension], None)
-            result_array[tuple(full_index)] = array1
-            full_index[self.grow_dimension] = slice(array_1_shape[self.grow_dimension], result_shape[self.grow_dimension], None)
-            result_array[tuple(full_index)] = array2
-            return result_array
+            new_rows = data_list.shape[self.grow_dimension]
+            if self.buffer_array is None:
+                self.__allocate_buffer(data_list, new_rows)
+            capacity = self.buffer_array.shape[self.grow_dimension]
+            if self.buffered_rows + new_rows > capacity:
+                self.flush_buffered_data()
+                if new_rows > capacity:
+                    self.__write_to_dataset(data_list)
+                    return True
+            self.buffer_array[self.__grow_slice(self.buffered_rows, self.buffered_rows + new_rows)] = data_list
+            self.buffered_rows += new_rows
+            return self.buffered_rows < capacity
+        
+        def __allocate_buffer(self, data_list, new_rows):
+            """
+            Pre-allocate a buffer of (about) buffer_size Bytes, with the shape of data_list on all 
+            dimensions except the growing one.
+            """
+            row_bytes = max(data_list.nbytes // max(new_rows, 1), 1)
+            capacity = max(self.buffer_size // row_bytes, new_rows, 1)
+            buffer_shape = list(data_list.shape)
+            buffer_shape[self.grow_dimension] = capacity
+            self.buffer_array = numpy.empty(tuple(buffer_shape), dtype=data_list.dtype)
             
+        def __grow_slice(self, start, end):
+            """
+            Build the index for rows [start:end) on the grow dimension, and full on all the others.
+            For example, on the 3rd dimension of a 4D data shape we get the slice (:, :, start:end, :)
+            """
+            full_index = [slice(None, None, None)] * len(self.h5py_dataset.shape)
+            full_index[self.grow_dimension] = slice(start, end, None)
+            return tuple(full_index)
+        
+        def __write_to_dataset(self, data):
+            """
+            Write data after the last written row, resizing the data set if needed.
+            """
+            new_rows = data.shape[self.grow_dimension]
+            needed_rows = self.written_rows + new_rows
+            current_shape = list(self.h5py_dataset.shape)
+            if needed_rows > current_shape[self.grow_dimension]:
+                new_length = max(needed_rows, 2 * current_shape[self.grow_dimension])
+                if self.expected_rows is not None and needed_rows <= self.expected_rows:
+                    new_length = self.expected_rows
+                current_shape[self.grow_dimension] = new_length
+                self.h5py_dataset.resize(tuple(current_shape))
+            self.h5py_dataset[self.__grow_slice(self.written_rows, needed_rows)] = data
+            self.written_rows = needed_rows
         
         def flush_buffered_data(self):
             """
             Append the data buffered so far to the input dataset using @param grow_dimension: as the dimension that
             will be expanded. 
             """
-            if self.buffered_data is not None:
-                current_shape = self.h5py_dataset.shape
-                new_shape = list(current_shape)
-                new_shape[self.grow_dimension] += self.buffered_data.shape[self.grow_dimension]
-                ## Create the required slice to which the new data will be added.
-                ## For example if the 3nd dimension of a 4D datashape (74, 1, 100, 1)
-                ## we want to get the slice (:, :, 100:200, :) in order to add 100 new entries
-                full_slice = slice(None, None, None)
-                slice_to_add = slice(current_shape[self.grow_dimension], new_shape[self.grow_dimension], None)
-                appendTo_address = [full_slice for _ in new_shape]
-                appendTo_address[self.grow_dimension] = slice_to_add
-                ## Do the data reshape and copy the new data
-                self.h5py_dataset.resize(tuple(new_shape))
-                self.h5py_dataset[tuple(appendTo_address)] = self.buffered_data
-                self.buffered_data = None
-         
+            if self.buffered_rows > 0:
+                self.__write_to_dataset(self.buffer_array[self.__grow_slice(0, self.buffered_rows)])
+                self.buffered_rows = 0
+                
+        def close(self):
+            """
+            Flush buffered data, then trim the data set to the number of rows actually written.
+            """
+            self.flush_buffered_data()
+            current_shape = list(self.h5py_dataset.shape)
+            if current_shape[self.grow_dimension] != self.written_rows:
+                current_shape[self.grow_dimension] = self.written_rows
+                self.h5py_dataset.resize(tuple(current_shape))
+            self.buffer_array = None
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Process-wide cache of serialized DataType payloads (e.g. JSON or binary arrays sent to the browser).
+
+Once written, DataType arrays do not change, thus a payload computed for a GID can be served 
+again until that DataType gets removed. The same holds for the arrays themselves, which are 
+kept (by Array traited attributes) in a second instance of the cache.
+"""
+
+import threading
+from collections import OrderedDict
+from tvb.basic.logger.builder import get_logger
+from tvb.basic.config.settings import TVBSettings as cfg
+
+LOG = get_logger(__name__)
+
+
+
+class PayloadsCache(object):
+    """
+    LRU cache of payloads, bounded by their total size in bytes.
+    
+    Keys are tuples, with the owner identifier (DataType GID, or file path) on the first position, 
+    so that all payloads of an owner can be dropped at once.
+    """
+
+    def __init__(self, max_size=None):
+        """
+        :param max_size: maximum number of bytes kept in cache; when None, WEB_CACHE_MAX_SIZE (MB) is used.
+        """
+        if max_size is None:
+            max_size = cfg.WEB_CACHE_MAX_SIZE * 1024 * 1024
+        self.max_size = max_size
+        self.current_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._owners = {}
+        self._lock = threading.Lock()
+
+
+    def get(self, key):
+        """
+        :return: the cached value for the given key, or None.
+        """
+        self._lock.acquire()
+        try:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            ## Mark as most recently used.
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+        finally:
+            self._lock.release()
+
+
+    def put(self, key, value, size=None):
+        """
+        Store a value in cache, evicting least recently used entries when over the size limit.
+        
+        :param size: number of bytes accounted for this value; by default len(value)
+        """
+        if size is None:
+            size = len(value)
+        if size > self.max_size:
+            LOG.debug("Payload of %d bytes is too big to be cached for %s" % (size, str(key)))
+            return
+        self._lock.acquire()
+        try:
+            self._remove(key)
+            self._entries[key] = (value, size)
+            self._owners.setdefault(key[0], set()).add(key)
+            self.current_size += size
+            while self.current_size > self.max_size:
+                self._remove(iter(self._entries).next())
+                self.evictions += 1
+        finally:
+            self._lock.release()
+
+
+    def invalidate(self, owner):
+        """
+        Drop all payloads cached for a DataType GID (or file path).
+        """
+        self._lock.acquire()
+        try:
+            for key in list(self._owners.get(owner, [])):
+                self._remove(key)
+        finally:
+            self._lock.release()
+
+
+    def clear(self):
+        """ Drop everything from cache and reset counters. """
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+            self._owners.clear()
+            self.current_size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+        finally:
+            self._lock.release()
+
+
+    def get_statistics(self):
+        """
+        :return: dictionary with the current state of the cache (for logging and monitoring).
+        """
+        self._lock.acquire()
+        try:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'size': self.current_size, 'max_size': self.max_size,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': float(self.hits) / lookups if lookups else 0.0}
+        finally:
+            self._lock.release()
+
+
+    def _remove(self, key):
+        """
+        Remove one entry, if present. To be called with the lock acquired.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.current_size -= entry[1]
+        owner_keys = self._owners.get(key[0])
+        if owner_keys is not None:
+            owner_keys.discard(key)
+            if not owner_keys:
+                del self._owners[key[0]]
+
+
+
+## Process-wide instance, shared by web controllers and invalidated by ProjectService.
+PAYLOADS_CACHE = PayloadsCache()
+## Process-wide instance holding (read-only) arrays of DataTypes, keyed by (GID, attribute name).
+ARRAYS_CACHE = PayloadsCache(cfg.ARRAYS_CACHE_MAX_SIZE * 1024 * 1024)
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+ZIP archives written as a stream of byte strings (e.g. sent directly as a HTTP response), 
+without staging the archive on disk.
+
+Every member is written with a data descriptor (CRC and sizes follow the member data), so the output 
+never needs to be seeked. Deflated members are compressed in parallel worker processes: each process 
+reads and compresses one chunk of a file, and chunks are joined with Z_SYNC_FLUSH markers (as pigz does).
+The CRC of the whole member is computed from the CRC of each chunk.
+"""
+
+import os
+import zlib
+import time
+import struct
+import multiprocessing
+from collections import deque
+from itertools import imap
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED
+from tvb.basic.logger.builder import get_logger
+from tvb.basic.config.settings import TVBSettings as cfg
+
+LOG = get_logger(__name__)
+
+## Size of the file parts compressed independently (and of the blocks written to the output).
+CHUNK_SIZE = 4 * 1024 * 1024
+## Extensions of files already compressed, and stored without deflate, unless EXPORT_ZIP_DEFLATE_H5 is set.
+COMPRESSED_EXTENSIONS = ('.h5',)
+
+DATA_DESCRIPTOR_SIGNATURE = 'PK\x07\x08'
+## Last (empty) block of a raw deflate stream.
+DEFLATE_END_BLOCK = '\x03\x00'
+ZIP64_VERSION = 45
+CRC_POLYNOMIAL = 0xedb88320
+
+
+
+def _gf2_matrix_times(matrix, vector):
+    """ Multiply a 32x32 GF(2) matrix with a vector. """
+    result = 0
+    index = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[index]
+        vector >>= 1
+        index += 1
+    return result
+
+
+
+def _gf2_matrix_square(matrix):
+    """ Square a 32x32 GF(2) matrix. """
+    return [_gf2_matrix_times(matrix, matrix[row]) for row in xrange(32)]
+
+
+
+def crc32_combine(crc1, crc2, length2):
+    """
+    Compute CRC-32 of the concatenation of two blocks, from CRC of each block and length of the second one.
+    Same algorithm as crc32_combine from zlib (which is not exposed by Python's zlib module).
+    """
+    crc1 &= 0xffffffff
+    crc2 &= 0xffffffff
+    if length2 <= 0:
+        return crc1
+    odd = [CRC_POLYNOMIAL] + [1 << row for row in xrange(31)]
+    even = _gf2_matrix_square(odd)
+    odd = _gf2_matrix_square(even)
+    while True:
+        even = _gf2_matrix_square(odd)
+        if length2 & 1:
+            crc1 = _gf2_matrix_times(even, crc1)
+        length2 >>= 1
+        if not length2:
+            break
+        odd = _gf2_matrix_square(even)
+        if length2 & 1:
+            crc1 = _gf2_matrix_times(odd, crc1)
+        length2 >>= 1
+        if not length2:
+            break
+    return crc1 ^ crc2
+
+
+
+def deflate_chunk(task):
+    """
+    Read and compress one part of a file. Executed in worker processes.
+        ::param task: tuple (file_path, offset, length, compression_level)
+        ::return: tuple (CRC of the raw data, raw data length, raw deflate data ending with a sync flush)
+    """
+    file_path, offset, length, level = task
+    with open(file_path, 'rb') as source:
+        source.seek(offset)
+        data = source.read(length)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    return zlib.crc32(data) & 0xffffffff, len(data), compressed
+
+
+
+class _StreamOutput(object):
+    """
+    File-like object collecting what ZipFile writes, until the next read. 
+    It only knows how many bytes were written so far, it can not seek.
+    """
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+
+    def write(self, data):
+        self._parts.append(data)
+        self._position += len(data)
+
+
+    def tell(self):
+        return self._position
+
+
+    def flush(self):
+        pass
+
+
+    def read_all(self):
+        """ Everything written since the previous call. """
+        result = ''.join(self._parts)
+        self._parts = []
+        return result
+
+
+
+class ZipMember(object):
+    """
+    One entry in a ZIP archive: either a file on disk, or a string held in memory.
+    """
+    def __init__(self, archive_name, file_path=None, data=None):
+        self.archive_name = archive_name
+        self.file_path = file_path
+        self.data = data
+
+
+    def size(self):
+        """ Uncompressed size of the member. """
+        if self.file_path is not None:
+            return os.path.getsize(self.file_path)
+        return len(self.data)
+
+
+
+class ZipStreamer(object):
+    """
+    Write ZIP archives as a sequence of byte strings, compressing members in parallel processes.
+    """
+
+    def __init__(self, processes=None, deflate_compressed=None, level=zlib.Z_DEFAULT_COMPRESSION, 
+                 chunk_size=CHUNK_SIZE):
+        """
+            ::param processes: number of worker processes used to deflate file members. 
+                               0 or None means the value from settings (when that is 0, one per CPU core).
+            ::param deflate_compressed: when False, files with COMPRESSED_EXTENSIONS are stored without deflate.
+        """
+        if not processes:
+            processes = cfg.EXPORT_ZIP_PROCESSES or multiprocessing.cpu_count()
+        if deflate_compressed is None:
+            deflate_compressed = cfg.EXPORT_ZIP_DEFLATE_H5
+        self.processes = max(1, processes)
+        self.deflate_compressed = deflate_compressed
+        self.level = level
+        self.chunk_size = chunk_size
+
+
+    @staticmethod
+    def folder_members(folder_root, folder_prefix=''):
+        """
+        Build ZIP members for all files under the given folder (empty directories are ignored).
+        Archive names are relative to folder_root.
+        """
+        members = []
+        for root, _, files in os.walk(folder_root):
+            for file_n in files:
+                abs_file_n = os.path.join(root, file_n)
+                members.append(ZipMember(folder_prefix + abs_file_n[len(folder_root) + len(os.sep):], abs_file_n))
+        return members
+
+
+    def is_deflated(self, member):
+        """ Check the compression to be used for a member. """
+        if member.file_path is None or self.deflate_compressed:
+            return True
+        return os.path.splitext(member.file_path)[1].lower() not in COMPRESSED_EXTENSIONS
+
+
+    def write_to_file(self, file_path, members, progress_callback=None):
+        """
+        Write the archive on disk.
+        """
+        with open(file_path, 'wb') as zip_file:
+            for block in self.stream(members, progress_callback):
+                zip_file.write(block)
+        return file_path
+
+
+    def stream(self, members, progress_callback=None):
+        """
+        Generator of the archive content, as byte strings (of about chunk_size).
+            ::param members: list of ZipMember instances
+            ::param progress_callback: function(processed_bytes, total_bytes), called after each chunk 
+        """
+        total_size = sum(member.size() for member in members)
+        processed_size = 0
+        deflate_tasks = []
+        chunks_count = []
+        for member in members:
+            if member.file_path is not None and self.is_deflated(member):
+                member_tasks = self.__chunk_tasks(member)
+                deflate_tasks.extend(member_tasks)
+                chunks_count.append(len(member_tasks))
+            else:
+                chunks_count.append(0)
+        
+        pool = None
+        if self.processes > 1 and len(deflate_tasks) > 1:
+            pool = multiprocessing.Pool(min(self.processes, len(deflate_tasks)))
+            deflated_chunks = self.__ordered_results(pool, deflate_tasks)
+        else:
+            deflated_chunks = imap(deflate_chunk, deflate_tasks)
+        
+        output = _StreamOutput()
+        zip_writer = ZipFile(output, "w", ZIP_DEFLATED, True)
+        try:
+            for member, nr_chunks in zip(members, chunks_count):
+                zip_info = self.__build_info(member)
+                zip_info.header_offset = output.tell()
+                output.write(zip_info.FileHeader(zip64=True))
+                crc = 0
+                file_size = 0
+                compress_size = 0
+                for raw_size, chunk_crc, data in self.__member_blocks(member, zip_info, nr_chunks, deflated_chunks):
+                    crc = crc32_combine(crc, chunk_crc, raw_size)
+                    file_size += raw_size
+                    compress_size += len(data)
+                    output.write(data)
+                    processed_size += raw_size
+                    if progress_callback is not None:
+                        progress_callback(processed_size, total_size)
+                    yield output.read_all()
+                zip_info.CRC = crc
+                zip_info.file_size = file_size
+                zip_info.compress_size = compress_size
+                output.write(struct.pack('<4sLQQ', DATA_DESCRIPTOR_SIGNATURE, crc, compress_size, file_size))
+                zip_writer.filelist.append(zip_info)
+                zip_writer.NameToInfo[zip_info.filename] = zip_info
+            ## Write central directory.
+            zip_writer.close()
+            yield output.read_all()
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+
+    def __chunk_tasks(self, member):
+        """ Split a file in parts to be compressed independently. """
+        size = member.size()
+        return [(member.file_path, offset, min(self.chunk_size, size - offset), self.level)
+                for offset in xrange(0, size, self.chunk_size)]
+
+
+    def __ordered_results(self, pool, tasks):
+        """
+        Yield results of deflate tasks in order. 
+        Only a few tasks are queued ahead of the consumer, so memory stays bounded when the output is slow.
+        """
+        pending = deque()
+        max_pending = 2 * self.processes
+        for task in tasks:
+            pending.append(pool.apply_async(deflate_chunk, (task,)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+    def __member_blocks(self, member, zip_info, nr_chunks, deflated_chunks):
+        """
+        Yield (raw size, CRC of raw data, data to write) for one member.
+        """
+        if member.file_path is None:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            compressed = compressor.compress(member.data) + compressor.flush()
+            yield len(member.data), zlib.crc32(member.data) & 0xffffffff, compressed
+        elif zip_info.compress_type == ZIP_DEFLATED:
+            for _ in xrange(nr_chunks):
+                chunk_crc, raw_size, compressed = deflated_chunks.next()
+                yield raw_size, chunk_crc, compressed
+            yield 0, 0, DEFLATE_END_BLOCK
+        else:
+            with open(member.file_path, 'rb') as source:
+                while True:
+                    data = source.read(self.chunk_size)
+                    if not data:
+                        break
+                    yield len(data), zlib.crc32(data) & 0xffffffff, data
+
+
+    def __build_info(self, member):
+        """ ZipInfo for a member, flagged to have CRC and sizes written after its data. """
+        if member.file_path is not None:
+            file_stat = os.stat(member.file_path)
+            zip_info = ZipInfo(member.archive_name, time.localtime(file_stat.st_mtime)[0:6])
+            zip_info.external_attr = (file_stat.st_mode & 0xFFFF) << 16L
+        else:
+            zip_info = ZipInfo(member.archive_name, time.localtime(time.time())[0:6])
+            zip_info.external_attr = 0600 << 16L
+        zip_info.compress_type = ZIP_DEFLATED if self.is_deflated(member) else ZIP_STORED
+        zip_info.flag_bits |= 0x08
+        zip_info.extract_version = ZIP64_VERSION
+        zip_info.create_version = ZIP64_VERSION
+        return zip_info
@@ -143,8 +143,18 @@ class DataType(Base):
         To be implemented in each sub-class which is about to be displayed in UI, 
         and return the text to appear.
         """
-        name = self.type
-        for tag in [self.user_tag_1, self.user_tag_2, self.user_tag_3, self.user_tag_4, self.user_tag_5]:
+        return self.build_display_name(self.type, [self.user_tag_1, self.user_tag_2, self.user_tag_3, 
+                                                   self.user_tag_4, self.user_tag_5])
+        
+        
+    @staticmethod
+    def build_display_name(type_name, user_tags):
+        """
+        Default display name: the type, followed by all non-empty user tags.
+        Also used for DB rows (without loading the entity), when the sub-class does not override display_name.
+        """
+        name = type_name
+        for tag in user_tags:
             if tag is not None and len(tag) > 0:
                 name = name + " - " + str(tag)
         return name
@@ -50,6 +50,21 @@ class CaseDAO(RootDAO):
         return user
     
         
+    def get_users_by_ids(self, user_ids):
+        """
+        Retrieve USER entities with a single query.
+        
+        :return: dictionary {user id: User entity}
+        """
+        result = {}
+        try:
+            for user in self.session.query(model.User).filter(model.User.id.in_(list(user_ids))).all():
+                result[user.id] = user
+        except Exception, excep:
+            self.logger.exception(excep)
+        return result
+        
+        
     def get_user_by_name(self, name):
         """Retrieve USER entity by name."""
         user = None
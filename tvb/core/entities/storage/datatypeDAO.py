@@ -34,6 +34,7 @@ from sqlalchemy.sql.expression import desc, cast
 from sqlalchemy.sql.expression import case as case_
 from sqlalchemy.sql.expression import literal_column as literal_
 from sqlalchemy.types import Text
+from sqlalchemy.orm import aliased
 from sqlalchemy.orm.exc import NoResultFound
 
 from tvb.core.entities import model
@@ -204,6 +205,10 @@ class DatatypeDAO(RootDAO):
         dataTypes which contains in the $filter_value value in one of the
         following fields: model.DataType.id, model.DataType.type,
         model.DataType.subject,model.DataType.state, model.DataType.gid
+        
+        Besides the DataType fields, each row also holds (on the last positions) the name of
+        the OperationGroup and the module of the DataType, so that the project tree 
+        can be built from this single query.
         """
         resulted_data = []
         try:
@@ -228,7 +233,9 @@ class DatatypeDAO(RootDAO):
                               func.max(model.DataType.user_tag_1), func.max(model.DataType.user_tag_2), 
                               func.max(model.DataType.user_tag_3), func.max(model.DataType.user_tag_4), 
                               func.max(model.DataType.user_tag_5), 
-                              func.max(case_([(model.DataType.visible, 1)], else_=0))
+                              func.max(case_([(model.DataType.visible, 1)], else_=0)),
+                              func.max(model.OperationGroup.name),
+                              func.max(model.DataType.module)
                               ).join((model.Operation, model.Operation.id== model.DataType.fk_from_operation)
                               ).join((model.User, model.Operation.fk_launched_by== model.User.id)
                               ).join(model.Algorithm).join(model.AlgorithmGroup ).join(model.AlgorithmCategory
@@ -238,6 +245,8 @@ class DatatypeDAO(RootDAO):
                                           model.DataType.fk_parent_burst==model.BurstConfiguration.id
                               ).outerjoin(model.DataTypeGroup,
                                           model.DataType.fk_datatype_group==model.DataTypeGroup.id
+                              ).outerjoin((model.OperationGroup, 
+                                           model.Operation.fk_operation_group==model.OperationGroup.id)
                               ).filter(or_(model.Operation.fk_launched_in== project_id,
                                            model.Links.fk_to_project == project_id))
             if visibility_filter:
@@ -270,6 +279,27 @@ class DatatypeDAO(RootDAO):
         return resulted_data
     
     
+    def get_datatypes_signature_for_project(self, project_id):
+        """
+        Cheap to compute, the result changes whenever a DataType is created in (or removed from) 
+        the given project, or a link towards the project is added or removed.
+        
+        :return: tuple (count, max ID) of the DataTypes in project, followed by (count, max ID) of the links;
+                 None when it could not be computed
+        """
+        try:
+            datatypes_count, max_datatype_id = self.session.query(func.count(model.DataType.id), 
+                                                                  func.max(model.DataType.id)
+                        ).join((model.Operation, model.Operation.id == model.DataType.fk_from_operation)
+                        ).filter(model.Operation.fk_launched_in == project_id).one()
+            links_count, max_link_id = self.session.query(func.count(model.Links.id), func.max(model.Links.id)
+                        ).filter(model.Links.fk_to_project == project_id).one()
+            return datatypes_count, max_datatype_id, links_count, max_link_id
+        except Exception, excep:
+            self.logger.exception(excep)
+            return None
+    
+    
     def get_datatype_details(self, datatype_gid):
         """
         Returns the details for the dataType with the given GID.
@@ -404,6 +434,45 @@ class DatatypeDAO(RootDAO):
         return data
     
     
+    def get_results_for_operation_group(self, op_group_id, measure_class, operation_ids=None):
+        """
+        Retrieve with a single query (per chunk of operations), for the operations in a group: 
+        the operation, its first resulting DataType and the first measure computed on that DataType.
+        
+        :param measure_class: DataType class holding measures, with an '_analyzed_datatype' GID column
+        :param operation_ids: when given, only these operations from the group are retrieved
+        :return: list of tuples (operation, datatype or None, measure or None), ordered by operation id
+        """
+        result_dt = aliased(model.DataType)
+        analyzed_gid = getattr(measure_class, '_analyzed_datatype')
+        query = self.session.query(model.Operation, result_dt, measure_class
+                        ).filter(model.Operation.fk_operation_group == op_group_id
+                        ).outerjoin((result_dt, and_(result_dt.fk_from_operation == model.Operation.id,
+                                                     result_dt.type != self.EXCEPTION_DATATYPE_GROUP,
+                                                     result_dt.type != self.EXCEPTION_DATATYPE_SIMULATION))
+                        ).outerjoin((measure_class, analyzed_gid == result_dt.gid)
+                        ).order_by(model.Operation.id, result_dt.id, measure_class.id)
+        try:
+            if operation_ids is None:
+                rows = query.all()
+            else:
+                rows = []
+                for start in xrange(0, len(operation_ids), self.BULK_QUERY_SIZE):
+                    chunk = operation_ids[start: start + self.BULK_QUERY_SIZE]
+                    rows.extend(query.filter(model.Operation.id.in_(chunk)).all())
+            ## Measures are changed by traited DB events, when loaded. Do not have them committed back.
+            self.session.expunge_all()
+        except Exception, excep:
+            self.logger.exception(excep)
+            return None
+        result = []
+        for operation, datatype, measure in rows:
+            ## Keep only the first DataType and first measure of each operation.
+            if not result or result[-1][0].id != operation.id:
+                result.append((operation, datatype, measure))
+        return result
+    
+    
     def get_datatype_group_disk_size(self, dt_group_id):
         """
         Return the size of all the datatypes from this datatype group.
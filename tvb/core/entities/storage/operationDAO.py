@@ -331,6 +331,73 @@ class OperationDAO(RootDAO):
             return None
         
         
+    def get_results_for_operations(self, operation_ids):
+        """
+        Retrieve the DataTypes resulted after executing the given operations, with one query for 
+        the operations (per chunk), plus one query for each resulted DataType class.
+        
+        :return: dictionary {operation id: list of DataType entities (of their specific class), ordered by ID}
+        """
+        result = dict((operation_id, []) for operation_id in operation_ids)
+        try:
+            datatypes = []
+            for start in xrange(0, len(operation_ids), self.BULK_QUERY_SIZE):
+                chunk = operation_ids[start: start + self.BULK_QUERY_SIZE]
+                datatypes.extend(self.session.query(model.DataType.id, model.DataType.gid, model.DataType.module,
+                                                    model.DataType.type, model.DataType.fk_from_operation
+                                        ).filter(model.DataType.fk_from_operation.in_(chunk)
+                                        ).filter(and_(model.DataType.type != self.EXCEPTION_DATATYPE_GROUP, 
+                                                      model.DataType.type != self.EXCEPTION_DATATYPE_SIMULATION)
+                                        ).order_by(model.DataType.id).all())
+            gids_per_class = {}
+            for _, gid, module, class_name, _ in datatypes:
+                gids_per_class.setdefault((module, class_name), []).append(gid)
+            entities = {}
+            for (module, class_name), gids in gids_per_class.iteritems():
+                entity_class = getattr(__import__(module, globals(), locals(), [str(class_name)]), class_name)
+                for start in xrange(0, len(gids), self.BULK_QUERY_SIZE):
+                    chunk = gids[start: start + self.BULK_QUERY_SIZE]
+                    for entity in self.session.query(entity_class).filter(entity_class.gid.in_(chunk)).all():
+                        entities[entity.gid] = entity
+            ## Entities have attributes loaded from traited DB events. Do not have them committed back.
+            self.session.expunge_all()
+            for _, gid, _, _, operation_id in datatypes:
+                result[operation_id].append(entities[gid])
+            return result
+        except Exception, excep:
+            self.logger.exception(excep)
+            return None
+        
+        
+    def get_figures_for_operations(self, operation_ids):
+        """
+        Retrieve Figure entities, resulted after executing the given operations, with one query (per chunk).
+        
+        :return: dictionary {operation id: list of ResultFigure entities}
+        """
+        result = dict((operation_id, []) for operation_id in operation_ids)
+        try:
+            for start in xrange(0, len(operation_ids), self.BULK_QUERY_SIZE):
+                chunk = operation_ids[start: start + self.BULK_QUERY_SIZE]
+                figures = self.session.query(model.ResultFigure).filter(model.ResultFigure.fk_from_operation.in_(chunk)
+                                                                ).order_by(model.ResultFigure.id).all()
+                if not figures:
+                    continue
+                ## Load parent operations and projects with one query each; the relations below are then 
+                ## resolved from the session, without more queries.
+                self.session.query(model.Operation).filter(model.Operation.id.in_(chunk)).all()
+                project_ids = list(set(figure.fk_in_project for figure in figures))
+                self.session.query(model.Project).filter(model.Project.id.in_(project_ids)).all()
+                for figure in figures:
+                    figure.project
+                    figure.operation
+                    result[figure.fk_from_operation].append(figure)
+            return result
+        except Exception, excep:
+            self.logger.exception(excep)
+            return None
+        
+        
     def get_operationgroup_by_gid(self, gid):
         """Retrieve by GID"""
         try:
@@ -340,6 +407,25 @@ class OperationDAO(RootDAO):
             return None
     
     
+    def get_operation_groups_with_datatype_groups(self, op_group_ids):
+        """
+        Retrieve with a single query the OperationGroup entities, and the corresponding DataTypeGroups.
+        
+        :return: dictionary {operation group id: (OperationGroup, DataTypeGroup or None)}
+        """
+        result = {}
+        try:
+            rows = self.session.query(model.OperationGroup, model.DataTypeGroup
+                               ).outerjoin((model.DataTypeGroup, 
+                                            model.DataTypeGroup.fk_operation_group == model.OperationGroup.id)
+                               ).filter(model.OperationGroup.id.in_(list(op_group_ids))).all()
+            for operation_group, datatype_group in rows:
+                result[operation_group.id] = (operation_group, datatype_group)
+        except Exception, excep:
+            self.logger.exception(excep)
+        return result
+    
+    
     def get_operationgroup_by_id(self, op_group_id):
         """Retrieve by ID"""
         try:
@@ -457,6 +543,18 @@ class OperationDAO(RootDAO):
             return None
     
     
+    def find_groups(self, modules):
+        """
+        Retrieve all Group entities declared in any of the given Python modules.
+        """
+        try:
+            result = self.session.query(model.AlgorithmGroup).filter(model.AlgorithmGroup.module.in_(modules)).all()
+        except Exception, excep:
+            self.logger.exception(excep)
+            result = []
+        return result
+    
+    
     def get_apliable_algo_groups(self, datatype, launch_categ):
         """
         Retrieve a list of algorithms in a given category with a given dataType
@@ -507,6 +605,27 @@ class OperationDAO(RootDAO):
         return result
     
     
+    def get_algorithms_by_ids(self, algorithm_ids):
+        """
+        Retrieve ALGORITHM entities (with their group and category loaded) with a single query.
+        
+        :return: dictionary {algorithm id: Algorithm entity}
+        """
+        result = {}
+        try:
+            rows = self.session.query(model.Algorithm, model.AlgorithmGroup, model.AlgorithmCategory
+                               ).join((model.AlgorithmGroup, model.Algorithm.fk_algo_group == model.AlgorithmGroup.id)
+                               ).join((model.AlgorithmCategory, 
+                                       model.AlgorithmGroup.fk_category == model.AlgorithmCategory.id)
+                               ).filter(model.Algorithm.id.in_(list(algorithm_ids))).all()
+            for algorithm, _, _ in rows:
+                algorithm.algo_group.group_category
+                result[algorithm.id] = algorithm
+        except Exception, ex:
+            self.logger.error(ex)
+        return result
+    
+    
     def get_algorithm_by_group(self, group_id, ident = ''):
         """Retrieve an algorithm for a given group_id and an identifier"""
         try:
@@ -519,6 +638,20 @@ class OperationDAO(RootDAO):
             return algo  
         except NoResultFound, _:
             return None
+    
+    
+    def get_algorithms_by_groups(self, group_ids):
+        """Retrieve all algorithms for the given group ids, with one query for each BULK_QUERY_SIZE chunk."""
+        result = []
+        try:
+            for start in xrange(0, len(group_ids), self.BULK_QUERY_SIZE):
+                chunk = group_ids[start: start + self.BULK_QUERY_SIZE]
+                result.extend(self.session.query(model.Algorithm
+                                                 ).filter(model.Algorithm.fk_algo_group.in_(chunk)).all())
+        except Exception, excep:
+            self.logger.exception(excep)
+            result = []
+        return result
         
         
     #
@@ -44,6 +44,9 @@ class RootDAO(object):
     EXCEPTION_DATATYPE_GROUP = "DataTypeGroup"
     EXCEPTION_DATATYPE_SIMULATION = SIMULATION_DATATYPE_CLASS
     
+    ## Maximum number of IDs in one "IN" clause (some DB engines limit the number of bound parameters).
+    BULK_QUERY_SIZE = 500
+    
     
     def store_entity(self, entity):
         """Store in DB one generic entity."""
@@ -54,13 +57,28 @@ class RootDAO(object):
         
      
     def store_entities(self, entities_list):
-        """Store in DB a list of generic entities."""
+        """
+        Store in DB a list of generic entities, with a single flush and commit.
+        Stored entities are loaded back with one query per entity class, and returned in the same order.
+        """
+        if not entities_list:
+            return []
         self.session.add_all(entities_list)
+        self.session.flush()
+        ## Read generated IDs before commit, while they are not expired (otherwise we need one query for each).
+        entity_keys = [(entity.__class__, entity.id) for entity in entities_list]
         self.session.commit()
-        stored_entities = []
-        for entity in entities_list:
-            stored_entities.append(self.session.query(entity.__class__).filter_by(id=entity.id).one())
-        return stored_entities
+        
+        ids_per_class = {}
+        for entity_class, entity_id in entity_keys:
+            ids_per_class.setdefault(entity_class, []).append(entity_id)
+        stored_entities = {}
+        for entity_class, entity_ids in ids_per_class.iteritems():
+            for start in xrange(0, len(entity_ids), self.BULK_QUERY_SIZE):
+                chunk = entity_ids[start: start + self.BULK_QUERY_SIZE]
+                for stored in self.session.query(entity_class).filter(entity_class.id.in_(chunk)).all():
+                    stored_entities[(entity_class, stored.id)] = stored
+        return [stored_entities[key] for key in entity_keys]
     
     
     def get_generic_entity(self, entity_type, filter_value, select_field="id"):
@@ -22,11 +22,12 @@
 """
 DAO layer for WorkFlow and Burst entities.
 """
+import os
 from tvb.core.entities import model
 from tvb.core.entities.storage.rootDAO import RootDAO
 from sqlalchemy import func as func
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.sql.expression import desc, not_
+from sqlalchemy.sql.expression import desc, not_, or_
 
     
 class WorkflowDAO(RootDAO):
@@ -55,6 +56,43 @@ class WorkflowDAO(RootDAO):
         return all_invalid_entities
     
     
+    def mark_introspection_valid(self, category_names, adapter_modules, xml_folders, portlet_folders, check_time):
+        """
+        Set last_introspection_check to check_time for the categories with the given names, 
+        for their algorithm groups declared in the given adapter modules (or in XML files under the given 
+        folders), and for the portlets declared in XML files under the given folders.
+        Categories can be shared with other introspected modules, thus their other groups are left untouched.
+        Bulk updates are issued, so no entity gets loaded. 
+        Used on start-up, for introspected modules which did not change since previous run.
+        Returns the number of categories found.
+        """
+        if not category_names:
+            return 0
+        try:
+            category_ids = [row[0] for row in self.session.query(model.AlgorithmCategory.id).filter(
+                                            model.AlgorithmCategory.displayname.in_(category_names)).all()]
+            group_conditions = ([model.AlgorithmGroup.module == module_name for module_name in adapter_modules] + 
+                                [model.AlgorithmGroup.module.like(module_name + '.%') 
+                                 for module_name in adapter_modules] + 
+                                [model.AlgorithmGroup.init_parameter.like(os.path.join(folder, '%')) 
+                                 for folder in xml_folders])
+            if category_ids:
+                self.session.query(model.AlgorithmCategory).filter(model.AlgorithmCategory.id.in_(category_ids)
+                                    ).update({"last_introspection_check": check_time}, synchronize_session=False)
+            if category_ids and group_conditions:
+                self.session.query(model.AlgorithmGroup).filter(model.AlgorithmGroup.fk_category.in_(category_ids)
+                                    ).filter(or_(*group_conditions)
+                                    ).update({"last_introspection_check": check_time}, synchronize_session=False)
+            for folder in portlet_folders:
+                self.session.query(model.Portlet).filter(model.Portlet.xml_path.like(os.path.join(folder, '%'))
+                                    ).update({"last_introspection_check": check_time}, synchronize_session=False)
+            self.session.commit()
+            return len(category_ids)
+        except Exception, excep:
+            self.logger.exception(excep)
+            return 0
+    
+    
     def get_bursts_for_project(self, project_id, page_start=0, page_end=None, count=False):
         """Get latest 50 BurstConfiguration entities for the current project"""
         try:
@@ -302,6 +340,27 @@ class WorkflowDAO(RootDAO):
         except Exception, excep:
             self.logger.error(excep)
         return burst
+    
+    
+    def get_bursts_for_operations(self, operation_ids):
+        """
+        Get the bursts for which the given operations were created, with one query (per chunk of operations).
+        
+        :return: dictionary {operation id: BurstConfiguration}, without the operations launched outside a burst
+        """
+        result = {}
+        try:
+            for start in xrange(0, len(operation_ids), self.BULK_QUERY_SIZE):
+                chunk = operation_ids[start: start + self.BULK_QUERY_SIZE]
+                rows = self.session.query(model.WorkflowStep.fk_operation, model.BurstConfiguration
+                                   ).join((model.Workflow, model.Workflow.id == model.WorkflowStep.fk_workflow)
+                                   ).join((model.BurstConfiguration, model.Workflow.fk_burst == model.BurstConfiguration.id)
+                                   ).filter(model.WorkflowStep.fk_operation.in_(chunk)).all()
+                for operation_id, burst in rows:
+                    result[operation_id] = burst
+        except Exception, excep:
+            self.logger.exception(excep)
+        return result
       
       
     def get_all_datatypes_in_burst(self, burst_id):
@@ -31,10 +31,30 @@ The purpose of this entities is to be used in Genshi UI, or for populating visua
 import sys
 import json
 import math
+import threading
+from collections import OrderedDict
 from tvb.basic.config.settings import EnhancedDictionary
 from tvb.core.entities import model
 
 
+## Results of the most recently displayed PSE groups, indexed by DataTypeGroup GID 
+## (filled by the PSE visualizer, shared by all requests).
+PSE_RESULTS_CACHE = OrderedDict()
+PSE_RESULTS_LOCK = threading.Lock()
+
+
+
+def clear_pse_results():
+    """
+    Drop all cached PSE results, e.g. when a DataType (result or measure in a group) is removed or edited.
+    """
+    PSE_RESULTS_LOCK.acquire()
+    try:
+        PSE_RESULTS_CACHE.clear()
+    finally:
+        PSE_RESULTS_LOCK.release()
+
+
 class ContextPSE(EnhancedDictionary):
     """
     Entity used for filling a PSE visualizer.
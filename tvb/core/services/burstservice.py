@@ -42,7 +42,7 @@ from tvb.core.adapters.abcdisplayer import ABCDisplayer, ABCMPLH5Displayer
 from tvb.core.services.operationservice import OperationService
 from tvb.core.services.flowservice import FlowService
 from tvb.core.services.workflowservice import WorkflowService
-from tvb.core.services.projectservice import ProjectService
+from tvb.core.services.projectservice import ProjectService, STRUCTURES_CACHE
 from tvb.core.services.exceptions import RemoveDataTypeException, InvalidPortletConfiguration, BurstServiceException
 from tvb.core.portlets.portlet_configurer import PortletConfigurer
 
@@ -171,6 +171,8 @@ class BurstService():
         burst = dao.get_burst_by_id(burst_id)
         burst.name = new_name
         dao.store_entity(burst)
+        ## Burst names are shown in project trees (including the trees of projects linking its results).
+        STRUCTURES_CACHE.clear()
     
     def load_burst(self, burst_id):
         """
@@ -28,6 +28,8 @@
 import os
 import json
 import shutil
+import hashlib
+from multiprocessing.pool import ThreadPool
 from tvb.config import ADAPTERS
 from cgi import FieldStorage
 from datetime import datetime
@@ -45,10 +47,15 @@ from tvb.core.services.projectservice import ProjectService
 from tvb.core.entities.file.metadatahandler import XMLReader
 from tvb.core.entities.file.fileshelper import FilesHelper
 from tvb.core.entities.file.hdf5storage import HDF5StorageManager
+from tvb.core.entities.file.hdf5pool import FILES_POOL
 from tvb.core.entities.file.filesupdatemanager import FilesUpdateManager
 from tvb.core.entities.file.exceptions import FileStructureException, MissingDataSetException
 from tvb.core.entities.transient.burst_export_entities import BurstInformation
 from tvb.core.entities.transient.structure_entities import DataTypeMetaData
+
+
+## Suffix of the file (next to the folder where an uploaded ZIP is exploded) recording the extracted members.
+UNPACK_CHECKPOINT_SUFFIX = "-unpacked.checkpoint"
 
 
 class ImportService():
@@ -77,6 +84,9 @@ class ImportService():
             - create all operations
             - import all images
             - create all dataTypes
+        
+        The ZIP is exploded in a folder named after the archive content. An import interrupted 
+        while extracting (e.g. a killed process) resumes from the members already on disk.
         """
         
         self.user_id = user_id
@@ -90,24 +100,34 @@ class ImportService():
         uq_file_name = os.path.join(cfg.TVB_TEMP_FOLDER, uq_name + ".zip")
         
         temp_folder = None
+        checkpoint_file = None
         try:
             if isinstance(uploaded, FieldStorage) or isinstance(uploaded, Part):
                 if uploaded.file:
-                    file_obj = open(uq_file_name, 'wb')
-                    file_obj.write(uploaded.file.read())
-                    file_obj.close()
+                    archive_key = self._store_uploaded_archive(uploaded.file, uq_file_name)
+                    archive_path = uq_file_name
                 else:
                     raise ProjectImportException("Please select the archive which contains the project structure.")
             else:
-                shutil.copyfile(uploaded, uq_file_name)
+                ## A ZIP already on disk is read in place, without copying it first.
+                archive_key = self._compute_archive_key(uploaded)
+                archive_path = uploaded
                 
             # Now compute the name of the folder where to explode uploaded ZIP file
-            temp_folder = os.path.join(cfg.TVB_TEMP_FOLDER, uq_name)
+            temp_folder = os.path.join(cfg.TVB_TEMP_FOLDER, "ImportProject-%s-%s" % (user_id, archive_key))
+            checkpoint_file = temp_folder + UNPACK_CHECKPOINT_SUFFIX
+            if os.path.exists(temp_folder) and not os.path.exists(checkpoint_file):
+                ## Left-over from an import which failed after the extraction was completed.
+                FILES_POOL.invalidate_folder(temp_folder)
+                shutil.rmtree(temp_folder)
             try:
-                self.files_helper.unpack_zip(uq_file_name, temp_folder)
+                self.files_helper.unpack_zip(archive_path, temp_folder, checkpoint_file)
             except FileStructureException, excep:
                 self.logger.exception(excep)
                 raise ProjectImportException("Bad ZIP archive provided. A TVB exported project is expected!")
+            # Extracted files are about to be moved into the projects storage, so there is nothing to resume from.
+            if os.path.exists(checkpoint_file):
+                os.remove(checkpoint_file)
             
             try:
                 self._import_project_from_folder(temp_folder)
@@ -126,9 +146,38 @@ class ImportService():
             # Now delete uploaded file
             if os.path.exists(uq_file_name):
                 os.remove(uq_file_name)
-            # Now delete temporary folder where uploaded ZIP was exploded.
-            if temp_folder is not None and os.path.exists(temp_folder):
+            # Now delete temporary folder where uploaded ZIP was exploded, unless the extraction 
+            # was interrupted (then its checkpoint still exists and the next import will resume it).
+            if temp_folder is not None and os.path.exists(temp_folder) and not os.path.exists(checkpoint_file):
+                FILES_POOL.invalidate_folder(temp_folder)
                 shutil.rmtree(temp_folder)
+    
+    
+    @staticmethod
+    def _store_uploaded_archive(source, file_name, buffer_size=1024 * 1024):
+        """
+        Write an uploaded archive on disk, in chunks.
+        :return: MD5 hex digest of the archive content
+        """
+        content_hash = hashlib.md5()
+        with open(file_name, 'wb') as file_obj:
+            while True:
+                copy_buffer = source.read(buffer_size)
+                if not copy_buffer:
+                    break
+                content_hash.update(copy_buffer)
+                file_obj.write(copy_buffer)
+        return content_hash.hexdigest()
+    
+    
+    @staticmethod
+    def _compute_archive_key(file_name):
+        """
+        :return: hex digest identifying an archive on disk, computed from its path, size and last change time
+        """
+        file_stat = os.stat(file_name)
+        key = "%s|%d|%s" % (os.path.abspath(file_name), file_stat.st_size, file_stat.st_mtime)
+        return hashlib.md5(key).hexdigest()
         
         
     def _import_project_from_folder(self, temp_folder):
@@ -260,7 +309,13 @@ class ImportService():
         
         # Now we sort operations by start date, to be sure data dependency is resolved correct
         operations = sorted(operations, key=lambda operation: operation.start_date) 
-                
+        
+        # Metadata of all H5 files is read before-hand, in parallel threads
+        datatypes_metadata = self._read_datatypes_metadata([os.path.split(operation.import_file)[0]
+                                                            for operation in operations])
+        # Data types are inserted into DB in batches, spanning consecutive operations
+        pending_datatypes = []
+        
         # Here we process each operation found
         for operation in operations:
             old_operation_folder, _ = os.path.split(operation.import_file)
@@ -269,6 +324,8 @@ class ImportService():
             # Rename operation folder with the ID of the stored operation 
             new_operation_path = FilesHelper().get_operation_folder(project.name, operation_entity.id)
             if old_operation_folder != new_operation_path:
+                # Handles opened while reading metadata are no longer valid after the move
+                FILES_POOL.invalidate_folder(old_operation_folder)
                 # Delete folder of the new operation, otherwise move will fail
                 shutil.rmtree(new_operation_path)
                 shutil.move(old_operation_folder, new_operation_path)
@@ -277,22 +334,27 @@ class ImportService():
             all_datatypes = []
             for file_name in os.listdir(new_operation_path):
                 if (file_name.endswith(FilesHelper.TVB_STORAGE_FILE_EXTENSION)):
-                    file_update_manager = FilesUpdateManager()
-                    file_update_manager.upgrade_file(os.path.join(new_operation_path, file_name))
-                    datatype = self.load_datatype_from_file(new_operation_path, file_name, 
-                                                            operation_entity.id, datatype_group)
+                    meta_dictionary = datatypes_metadata.get(os.path.join(old_operation_folder, file_name))
+                    if meta_dictionary is None:
+                        # File written by an older version of TVB, to be upgraded before loading
+                        file_update_manager = FilesUpdateManager()
+                        file_update_manager.upgrade_file(os.path.join(new_operation_path, file_name))
+                    datatype = self.load_datatype_from_file(new_operation_path, file_name, operation_entity.id,
+                                                            datatype_group, meta_dictionary)
                     all_datatypes.append(datatype)
             
             # Before inserting into DB sort data types by creation date (to solve any dependencies)
             all_datatypes = sorted(all_datatypes, key=lambda datatype: datatype.create_date) 
             
-            # Now store data types into DB
             for datatype in all_datatypes:
                 if datatype.gid in dt_burst_mappings:
                     old_burst_id = dt_burst_mappings[datatype.gid]
                     if old_burst_id is not None:
                         datatype.fk_parent_burst = burst_ids_mapping[old_burst_id]
-                self.store_datatype(datatype)
+            pending_datatypes.extend(all_datatypes)
+            if len(pending_datatypes) >= cfg.IMPORT_DATATYPES_BATCH_SIZE:
+                self.store_datatypes(pending_datatypes)
+                pending_datatypes = []
                         
             # Now import all images from current operation
             images_root = self.files_helper.get_images_folder(project.name, operation_entity.id)
@@ -303,6 +365,8 @@ class ImportService():
                             self.__populate_image(os.path.join(root, file_name), project.id, operation_entity.id)
             imported_operations.append(operation_entity)
         
+        # Now store remaining data types into DB
+        self.store_datatypes(pending_datatypes)
         return imported_operations				
     
     
@@ -327,14 +391,49 @@ class ImportService():
             self.files_helper.write_image_metadata(figure)  
     
     
-    def load_datatype_from_file(self, storage_folder, file_name, op_id, datatype_group = None):
+    @staticmethod
+    def _read_datatypes_metadata(operation_folders):
+        """
+        Read in parallel threads the metadata of all H5 files in the given operation folders.
+        :return: dictionary {H5 file path: metadata dictionary}. Files written by an older 
+                 version of TVB are not read (they need to be upgraded first, which also touches DB).
+        """
+        files_paths = []
+        for folder in operation_folders:
+            for file_name in os.listdir(folder):
+                if file_name.endswith(FilesHelper.TVB_STORAGE_FILE_EXTENSION):
+                    files_paths.append(os.path.join(folder, file_name))
+        if not files_paths:
+            return {}
+        
+        file_update_manager = FilesUpdateManager()
+        
+        def _read_metadata(file_path):
+            """ Thread job: read metadata from one H5 file, when its data version is the current one."""
+            if not file_update_manager.is_file_up_to_date(file_path):
+                return None
+            return HDF5StorageManager(*os.path.split(file_path)).get_metadata()
+        
+        pool = ThreadPool(max(1, min(cfg.IMPORT_THREADS, len(files_paths))))
+        try:
+            all_metadata = pool.map(_read_metadata, files_paths)
+        finally:
+            pool.close()
+            pool.join()
+        return dict((file_path, meta_dictionary) for file_path, meta_dictionary in zip(files_paths, all_metadata)
+                    if meta_dictionary is not None)
+    
+    
+    def load_datatype_from_file(self, storage_folder, file_name, op_id, datatype_group = None, meta_dictionary = None):
         """
         Creates an instance of datatype from storage / H5 file 
+        :param meta_dictionary: metadata already read from the H5 file (it is read from file when missing)
         :return: datatype
         """
         self.logger.debug("Loading datatType from file: %s"%file_name)
-        storage_manager = HDF5StorageManager(storage_folder, file_name)
-        meta_dictionary = storage_manager.get_metadata()
+        if meta_dictionary is None:
+            storage_manager = HDF5StorageManager(storage_folder, file_name)
+            meta_dictionary = storage_manager.get_metadata()
         meta_structure = DataTypeMetaData(meta_dictionary)
         
         # Now try to determine class and instantiate it
@@ -360,6 +459,7 @@ class ImportService():
         current_file = os.path.join(storage_folder, file_name)
         new_file = type_instance.get_storage_file_path()
         if new_file != current_file:
+            FILES_POOL.invalidate(current_file)
             shutil.move(current_file, new_file)
         
         return type_instance
@@ -372,13 +472,42 @@ class ImportService():
             return dao.store_entity(datatype)
         except MissingDataSetException, excep:
             self.logger.error("Datatype %s has missing data and could not be imported properly."%(datatype,))
-            os.remove(datatype.get_storage_file_path())
+            self._remove_datatype_file(datatype)
         except IntegrityError, excep:
             self.logger.exception(excep)
             error_msg = ("Could not import data with gid: %s. "
                          "There is already a one with the same name or gid.")%(datatype.gid)
-            os.remove(datatype.get_storage_file_path()) # Delete file if can't be imported
+            self._remove_datatype_file(datatype) # Delete file if can't be imported
             raise ProjectImportException(error_msg)     
+    
+    
+    def store_datatypes(self, datatypes):
+        """
+        Store a batch of data types into DB, with a single commit.
+        When the batch can not be stored (duplicate gid or missing data for one of them), 
+        fall back on storing its data types one by one, so that only the faulty ones are skipped.
+        :return: the list of stored data types, in the same order (None for skipped ones)
+        """
+        if not datatypes:
+            return []
+        self.logger.debug("Store a batch of %d imported datatypes" % len(datatypes))
+        try:
+            return dao.store_entities(datatypes)
+        except (IntegrityError, MissingDataSetException), excep:
+            self.logger.warning("Could not store the batch of datatypes at once (%s), "
+                                "storing them one by one." % str(excep))
+            return [self.store_datatype(datatype) for datatype in datatypes]
+    
+    
+    @staticmethod
+    def _remove_datatype_file(datatype):
+        """
+        Delete the H5 file of a data type which could not be imported.
+        """
+        file_path = datatype.get_storage_file_path()
+        if os.path.exists(file_path):
+            FILES_POOL.invalidate(file_path)
+            os.remove(file_path)
                 
                 
     def __populate_project(self, project_path):
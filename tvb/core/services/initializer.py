@@ -21,6 +21,8 @@
 """
 .. moduleauthor:: Lia Domide <lia.domide@codemart.ro>
 """
+import os
+import json
 import datetime
 import tvb.core.services.eventhandler as eventhandler
 from tvb.core.entities.model import ROLE_ADMINISTRATOR
@@ -32,16 +34,52 @@ from tvb.core.services.userservice import UserService
 from tvb.core.services.settingsservice import SettingsService
 from tvb.core.adapters.introspector import Introspector
 from tvb.basic.config.settings import TVBSettings as cfg
+from tvb.basic.logger.builder import get_logger
 from tvb.core.entities import model
 from tvb.core.entities.storage import dao
 from tvb.core.traits import db_events
 
 
+LOGGER = get_logger(__name__)
+INTROSPECTION_FINGERPRINTS_FILE = "introspection_fingerprints.json"
+
+
 def reset():
     """
     Service Layer for Database reset.
     """
     reset_database()
+    _store_fingerprints({})
+
+
+def _read_fingerprints():
+    """
+    Read fingerprints stored at the previous successful start-up, as a dictionary {module_name: digest}.
+    """
+    fingerprints_file = os.path.join(cfg.TVB_STORAGE, INTROSPECTION_FINGERPRINTS_FILE)
+    try:
+        if os.path.exists(fingerprints_file):
+            with open(fingerprints_file, 'r') as file_reader:
+                return json.load(file_reader)
+    except Exception, excep:
+        LOGGER.warning("Could not read introspection fingerprints, all modules will be introspected.")
+        LOGGER.warning(excep)
+    return {}
+
+
+def _store_fingerprints(fingerprints):
+    """
+    Persist fingerprints for the introspected modules, to be compared at the next start-up.
+    """
+    fingerprints_file = os.path.join(cfg.TVB_STORAGE, INTROSPECTION_FINGERPRINTS_FILE)
+    try:
+        if not fingerprints and not os.path.exists(fingerprints_file):
+            return
+        with open(fingerprints_file, 'w') as file_writer:
+            json.dump(fingerprints, file_writer)
+    except Exception, excep:
+        LOGGER.warning("Could not store introspection fingerprints.")
+        LOGGER.warning(excep)
 
 
 def initialize(introspected_modules, load_xml_events=True):
@@ -60,10 +98,16 @@ def initialize(introspected_modules, load_xml_events=True):
     ## Populate DB algorithms, by introspection
     event_folders = []
     start_introspection_time = datetime.datetime.now()
+    previous_fingerprints = {} if is_db_empty else _read_fingerprints()
+    current_fingerprints = {}
     for module in introspected_modules:
         introspector = Introspector(module)
-        # Introspection is always done, even if DB was not empty.
-        introspector.introspect(True)
+        # Adapters and portlets are loaded again only for modules changed since previous start-up.
+        current_fingerprints[module] = introspector.compute_fingerprint()
+        is_changed = previous_fingerprints.get(module) != current_fingerprints[module]
+        if not is_changed:
+            LOGGER.info("Module %s was not changed since previous start, will skip adapters introspection." % module)
+        introspector.introspect(True, refresh_algorithms=is_changed)
         event_path = introspector.get_events_path()
         if event_path:
             event_folders.append(event_path)
@@ -71,6 +115,8 @@ def initialize(introspected_modules, load_xml_events=True):
     invalid_stored_entities = dao.get_non_validated_entities(start_introspection_time)
     for entity in invalid_stored_entities:
         dao.remove_entity(entity.__class__, entity.id)
+    previous_fingerprints.update(current_fingerprints)
+    _store_fingerprints(previous_fingerprints)
    
     ## Populate events
     if load_xml_events:
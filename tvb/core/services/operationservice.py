@@ -31,6 +31,7 @@ Module in charge with Launching an operation (creating the Operation entity as w
 import os
 import json
 import zipfile
+import itertools
 import tvb.core.utils as utils
 from copy import copy
 from cgi import FieldStorage
@@ -58,6 +59,9 @@ except Exception, _:
 TEMPORARY_PREFIX = ".tmp"
 PARAM_RANGE_1 = 'first_range'
 PARAM_RANGE_2 = 'second_range'
+PARAM_RANGE_3 = 'third_range'
+## All rangers accepted by the back-end (an OperationGroup can store at most 3 ranges).
+RANGE_PARAMETERS = [PARAM_RANGE_1, PARAM_RANGE_2, PARAM_RANGE_3]
 
 UIKEY_SUBJECT = "RESERVEDsubject"
 UIKEY_USERGROUP = "RESERVEDusergroup"
@@ -70,6 +74,8 @@ class OperationService:
     immediately, or to be sent on the cluster.
     """
     ATT_UID = "uid"
+    ## Number of operations from a range, stored in DB with a single commit.
+    OPERATIONS_BATCH_SIZE = 500
     
     
     def __init__(self):
@@ -190,12 +196,15 @@ class OperationService:
         """
         operations = []
         
-        available_args, group = self._prepare_group(project_id, kwargs)
-        if len(available_args) > cfg.MAX_RANGE_NUMBER:
+        ranges_values, group = self._prepare_group(project_id, kwargs)
+        nr_of_operations = 1
+        for _, range_values in ranges_values:
+            nr_of_operations *= len(range_values)
+        if nr_of_operations > cfg.MAX_RANGE_NUMBER:
             raise LaunchException("Too big range specified. You should limit the"
                                   " resulting operations to %d"%cfg.MAX_RANGE_NUMBER)
         else:
-            self.logger.debug("Launching a range with %d operations..."%len(available_args))
+            self.logger.debug("Launching a range with %d operations..."%nr_of_operations)
         group_id = None
         if group is not None:
             group_id = group.id
@@ -206,15 +215,19 @@ class OperationService:
 
         visible_operation = visible and not (category.display == True and method_name == ABCAdapter.LAUNCH_METHOD)
         meta_str = json.dumps(metadata)
-        for (one_set_of_args, range_vals) in available_args:
+        operations_batch = []
+        for (one_set_of_args, range_vals) in self.__expand_arguments(kwargs, ranges_values):
             range_values = json.dumps(range_vals) if range_vals else None
             operation = model.Operation(user_id, project_id, algorithm.id, 
                                         json.dumps(one_set_of_args, cls=MapAsJson.MapAsJsonEncoder), 
                                         meta_str, method_name, op_group_id=group_id, user_group=user_group, 
                                         range_values=range_values)
             operation.visible = visible_operation
-            operations.append(operation)
-        operations = dao.store_entities(operations) 
+            operations_batch.append(operation)
+            if len(operations_batch) >= self.OPERATIONS_BATCH_SIZE:
+                operations.extend(dao.store_entities(operations_batch))
+                operations_batch = []
+        operations.extend(dao.store_entities(operations_batch))
         
         if group is not None:
             burst_id = None
@@ -234,14 +247,23 @@ class OperationService:
         Will be generated workflows x workflow_step_list Operations.
         For every step in workflow_step_list one OperationGroup and one DataTypeGroup will be created 
         (in case of PSE).
+        All entities are first built in memory, and then stored with one commit per entity type.
         """
+        operation_groups = [None] * len(workflow_step_list)
+        if group is not None:
+            group_indexes = [idx for idx, step in enumerate(workflow_step_list) 
+                             if not isinstance(step, model.WorkflowStepView)]
+            new_groups = dao.store_entities([model.OperationGroup(project_id=project_id, 
+                                                                  ranges=group.range_references) 
+                                             for _ in group_indexes])
+            for idx, operation_group in zip(group_indexes, new_groups):
+                operation_groups[idx] = operation_group
         
-        for step in workflow_step_list:
-            operation_group = None
-            if (group is not None) and not isinstance(step, model.WorkflowStepView):
-                operation_group = model.OperationGroup(project_id = project_id, ranges = group.range_references)
-                operation_group = dao.store_entity(operation_group)
-                
+        cloned_steps = []
+        step_operations = []
+        last_step_operations = []
+        for step_idx, step in enumerate(workflow_step_list):
+            operation_group = operation_groups[step_idx]
             operation = None
             metadata = {DataTypeMetaData.KEY_BURST: burst_id}
             algo_category = dao.get_algorithm_by_id(step.fk_algorithm)
@@ -269,15 +291,23 @@ class OperationService:
                                                 meta=json.dumps(metadata), method_name= ABCAdapter.LAUNCH_METHOD,
                                                 op_group_id=group_id, range_values=range_values, user_group=user_group)
                     operation.visible = step.step_visible
-                    operation = dao.store_entity(operation)
-                    cloned_w_step.fk_operation = operation.id
-                
-                dao.store_entity(cloned_w_step)
+                    step_operations.append((cloned_w_step, operation))
+                cloned_steps.append(cloned_w_step)
                 
             if operation_group is not None and operation is not None:
-                datatype_group = model.DataTypeGroup(operation_group.id, operation_id=operation.id, 
-                                                fk_parent_burst=burst_id, state=metadata[DataTypeMetaData.KEY_STATE])
-                datatype_group = dao.store_entity(datatype_group) 
+                last_step_operations.append((operation_group, operation, metadata[DataTypeMetaData.KEY_STATE]))
+        
+        stored_operations = dao.store_entities([operation for _, operation in step_operations])
+        for (cloned_w_step, _), operation in zip(step_operations, stored_operations):
+            cloned_w_step.fk_operation = operation.id
+        dao.store_entities(cloned_steps)
+        
+        datatype_groups = []
+        for operation_group, operation, state in last_step_operations:
+            ## Operation instance got its ID when stored above.
+            datatype_groups.append(model.DataTypeGroup(operation_group.id, operation_id=operation.id, 
+                                                       fk_parent_burst=burst_id, state=state))
+        dao.store_entities(datatype_groups)
 
 
     def initiate_prelaunch(self, operation, adapter_instance, temp_files, **kwargs):
@@ -413,25 +443,21 @@ class OperationService:
     def _prepare_group(self, project_id, kwargs):
         """
         Create and store OperationGroup entity, or return None
+        :return: tuple (list of (ranger name, range values) for the rangers found in kwargs, group)
         """
-        range1_values = self.__get_range_values(kwargs, PARAM_RANGE_1)
-        range2_values = self.__get_range_values(kwargs, PARAM_RANGE_2)
-        available_args = self.__expand_arguments([(kwargs, None)], range1_values, PARAM_RANGE_1)
-        available_args = self.__expand_arguments(available_args, range2_values, PARAM_RANGE_2)
-        is_group = False
+        ranges_values = []
         ranges = []
-        if PARAM_RANGE_1 in kwargs and range1_values is not None:
-            is_group = True
-            ranges.append(json.dumps((kwargs[PARAM_RANGE_1], range1_values)))
-        if PARAM_RANGE_2 in kwargs and range2_values is not None:
-            is_group = True
-            ranges.append(json.dumps((kwargs[PARAM_RANGE_2], range2_values)))
-        if not is_group:
+        for ranger_name in RANGE_PARAMETERS:
+            range_values = self.__get_range_values(kwargs, ranger_name)
+            if range_values is not None:
+                ranges_values.append((ranger_name, range_values))
+                ranges.append(json.dumps((kwargs[ranger_name], range_values)))
+        if len(ranges) == 0:
             group = None
         else:
             group = model.OperationGroup(project_id = project_id, ranges= ranges)
             group = dao.store_entity(group)
-        return available_args, group
+        return ranges_values, group
         
         
     def __get_range_values(self, kwargs, ranger_name):
@@ -474,25 +500,26 @@ class OperationService:
 
     
     @staticmethod
-    def __expand_arguments(arguments_list, range_values, range_title):
+    def __expand_arguments(kwargs, ranges_values):
         """
         Parse the arguments submitted from UI (flatten form) 
-        If any ranger is found, return a list of arguments for all possible operations.
+        If any ranger is found, generate arguments for all possible operations, as tuples
+        (operation arguments, range values), with the first ranger varying fastest.
+        The same arguments dictionary is updated and returned for every operation (to avoid a copy 
+        per operation), thus it needs to be consumed (e.g. serialized) before asking for the next one.
         """
-        if range_values is None:
-            return arguments_list
-        result = []
-        for value in range_values:
-            for args, range_ in arguments_list:
-                kw_new = copy(args)
-                range_new = copy(range_)
-                kw_new[kw_new[range_title]] = value
-                if range_new is None:
-                    range_new = {}
-                range_new[kw_new[range_title]] = value
-                del kw_new[range_title]
-                result.append((kw_new, range_new))
-        return result
+        if len(ranges_values) == 0:
+            yield kwargs, None
+            return
+        arguments = copy(kwargs)
+        for ranger_name, _ in ranges_values:
+            del arguments[ranger_name]
+        parameter_names = [kwargs[ranger_name] for ranger_name, _ in reversed(ranges_values)]
+        all_values = [range_values for _, range_values in reversed(ranges_values)]
+        for combination in itertools.product(*all_values):
+            range_new = dict(zip(parameter_names, combination))
+            arguments.update(range_new)
+            yield arguments, range_new
     
     
     ##########################################################################################
@@ -516,9 +543,11 @@ class OperationService:
                     dao.store_entity(operation)
                     return True
             else:
-                ## Set the thread stop flag to true
-                BACKEND_CLIENT.stop_operation(operation_id)
-                if operation_process is not None:
+                ## Set the thread stop flag to true. A running thread also kills its worker process.
+                ## Operations are executed in reusable workers, so the stored PID is killed only when
+                ## no thread is found (otherwise we might kill a worker already running another operation).
+                stopped_thread = BACKEND_CLIENT.stop_operation(operation_id)
+                if operation_process is not None and not stopped_thread:
                     ## Now try to kill the operation if it exists
                     stopped = utils.stop_pid(operation_process.pid)
                     if not stopped:
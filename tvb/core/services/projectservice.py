@@ -32,6 +32,7 @@ from tvb.core import utils
 from inspect import stack
 from tvb.basic.traits.types_mapped import MappedType
 from tvb.basic.logger.builder import get_logger
+from tvb.basic.config.settings import TVBSettings as cfg
 from tvb.basic.filters.chain import FilterChain
 from tvb.core.utils import string2date, date2string, timedelta2string
 from tvb.core.removers_factory import get_remover
@@ -39,8 +40,10 @@ from tvb.core.entities import model
 from tvb.core.entities.storage import dao
 from tvb.core.entities.transient.filtering import StaticFiltersFactory
 from tvb.core.entities.transient.structure_entities import StructureNode, DataTypeMetaData
+from tvb.core.entities.transient.pse import clear_pse_results
 from tvb.core.entities.file.fileshelper import FilesHelper
 from tvb.core.entities.file.exceptions import FileStructureException
+from tvb.core.entities.file.payloadcache import PayloadsCache, PAYLOADS_CACHE, ARRAYS_CACHE
 from tvb.core.services.exceptions import StructureException
 from tvb.core.services.exceptions import ProjectServiceException
 from tvb.core.services.exceptions import RemoveDataTypeException
@@ -74,6 +77,9 @@ KEY_VALUE = "value"
 MONTH_YEAR_FORMAT = "%B %Y"
 DAY_MONTH_YEAR_FORMAT = "%d %B %Y"
 
+## Project trees, keyed by project ID (first), DataTypes signature of the project and the tree parameters.
+STRUCTURES_CACHE = PayloadsCache(cfg.PROJECT_STRUCTURE_CACHE_SIZE * 1024 * 1024)
+
 
 class ProjectService:
     """
@@ -164,6 +170,9 @@ class ProjectService:
     def retrieve_project_full(self, project_id, applied_filters = None, current_page=1):
         """
         Return a Tuple with Project entity and Operations for current Project.
+        
+        Bursts, groups, algorithms, users, results and figures of the operations on the page are 
+        retrieved together (a few IN queries for the whole page), not separately for each row.
         """
         selected_project = self.find_project(project_id)
         total_filtered = self.count_filtered_operations(project_id, applied_filters)
@@ -175,10 +184,23 @@ class ProjectService:
             end_idx = total_filtered - start_idx
             
         pages_no = total_filtered//OPERATIONS_PAGE_SIZE + (1 if total_filtered % OPERATIONS_PAGE_SIZE else 0)
-        total_ops_nr = self.count_filtered_operations(project_id)
+        if applied_filters is None or not applied_filters.fields:
+            total_ops_nr = total_filtered
+        else:
+            total_ops_nr = self.count_filtered_operations(project_id)
         current_ops = dao.get_filtered_operations(project_id, applied_filters, start_idx, end_idx)
         if current_ops is None:
             return selected_project, [], 0
+        
+        ## Prefetch everything needed for the rows on this page.
+        single_ops_ids = [one_op[0] for one_op in current_ops if not one_op[3]]
+        bursts = dao.get_bursts_for_operations([one_op[0] for one_op in current_ops])
+        groups = dao.get_operation_groups_with_datatype_groups(set(one_op[3] for one_op in current_ops if one_op[3]))
+        algorithms = dao.get_algorithms_by_ids(set(one_op[4] for one_op in current_ops))
+        users = dao.get_users_by_ids(set(one_op[6] for one_op in current_ops))
+        results = dao.get_results_for_operations(single_ops_ids) or {}
+        figures = dao.get_figures_for_operations(single_ops_ids) or {}
+        
         operations = []
         for one_op in current_ops:
             try:
@@ -187,19 +209,17 @@ class ProjectService:
                     result["id"] = str(one_op[0]) + "-" + str(one_op[1])
                 else:
                     result["id"] = str(one_op[0])
-                burst = dao.get_burst_for_operation_id(one_op[0])
+                burst = bursts.get(one_op[0])
                 result["burst_name"] = burst.name if burst else '-'
                 result["count"] = one_op[2]
                 result["gid"] = one_op[14]
                 if one_op[3] is not None and one_op[3]:
                     try:
-                        operation_group = dao.get_generic_entity(model.OperationGroup, one_op[3])[0]
+                        operation_group, datatype_group = groups[one_op[3]]
                         result["group"] = operation_group.name
                         result["group"] = result["group"].replace("_", " ")
                         result["operation_group_id"] = operation_group.id
-                        datatype_group = dao.get_datatypegroup_by_op_group_id(one_op[3])
-                        datatype = dao.get_datatype_by_id(datatype_group.id)
-                        result["datatype_group_gid"] = datatype.gid
+                        result["datatype_group_gid"] = datatype_group.gid
                         result["gid"] = operation_group.gid
                     except Exception, excep:
                         self.logger.error(excep)
@@ -208,9 +228,9 @@ class ProjectService:
                 else:
                     result['group'] = None
                     result['datatype_group_gid'] = None
-                result["algorithm"] = dao.get_algorithm_by_id(one_op[4])
+                result["algorithm"] = algorithms.get(one_op[4])
                 result["method"] = one_op[5]
-                result["user"] = dao.get_user_by_id(one_op[6])
+                result["user"] = users.get(one_op[6])
                 if type(one_op[7]) in (str, unicode):
                     result["create"] = string2date(str(one_op[7]))
                 else:
@@ -232,10 +252,8 @@ class ProjectService:
                 result['operation_tag'] = one_op[13]
                 result['figures'] = None
                 if not result['group']:
-                    datatype_results = dao.get_results_for_operation(result['id'])
-                    result['results'] = [dao.get_generic_entity(dt.module + '.' + dt.type, 
-                                                                dt.gid, 'gid')[0] for dt in datatype_results]
-                    operation_figures = dao.get_figures_for_operation(result['id'])
+                    result['results'] = results.get(one_op[0], [])
+                    operation_figures = figures.get(one_op[0], [])
                     
                     # Compute the full path to the figure / image on disk
                     for figure in operation_figures:
@@ -299,6 +317,7 @@ class ProjectService:
             self.structure_helper.remove_project_structure(project2delete.name)
             name = project2delete.name
             dao.delete_project(project_id)
+            STRUCTURES_CACHE.invalidate(project_id)
             self.logger.debug("Deleted project: id=" + str(project_id) +' name='+name)
         except RemoveDataTypeError, excep:
             self.logger.error("Invalid DataType to remove!")
@@ -437,62 +456,70 @@ class ProjectService:
         """
         Find through introspection the inside structure for a given Project.
         In case of a problem, will return an empty list.
+        
+        The tree is cached until a DataType (or link) is created in the project (noticed through a cheap 
+        signature query, thus also when done by another process), or a DataType gets removed or edited.
         """ 
+        filter_str = visibility_filter.get_sql_filter_equivalent() if visibility_filter else None
+        signature = dao.get_datatypes_signature_for_project(project.id)
+        cache_key = (project.id, project.gid, signature, project.name, 
+                     filter_str, first_level, second_level, filter_value)
+        if signature is not None:
+            cached_tree = STRUCTURES_CACHE.get(cache_key)
+            if cached_tree is not None:
+                return cached_tree
+        
         datas = dao.get_datatypes_info_for_project(project.id, visibility_filter, filter_value)
-        dt_ids = [row[11] for row in datas]
+        rows_by_id = dict((row[11], row) for row in datas)
         groups_collapsed_data = []
-        full_groups = []
+        full_groups = set()
         # No longer make group by operation group at SQL level so we can handle situation where
         # we have link from one datatype in a group but not the whole group
         for entry in datas:
             if entry[0] == model.DataTypeGroup.__name__:
                 # Do nothing for groups sice we will get more info for the first datatype we found in each group
                 continue
-            if entry[14] not in dt_ids:
+            if entry[14] not in rows_by_id:
                 # entry[14] = fk_datatype_group - if we are not part of a group just append to data
                 groups_collapsed_data.append(entry)
-            else:
-                if entry[14] not in full_groups:
-                    # If we are part of a group just store the first found datatype since we dont need rest
-                    full_groups.append(entry[14])
-                    groups_collapsed_data.append(entry)
+            elif entry[14] not in full_groups:
+                # If we are part of a group just store the first found datatype since we dont need rest
+                full_groups.add(entry[14])
+                groups_collapsed_data.append(entry)
         metadatas = []
+        default_names = {}
         for row in groups_collapsed_data:
-            metadatas.append(self.__datatype2metastructure(row, dt_ids))
-        return StructureNode.metadata2tree(metadatas, first_level, second_level, project.id, project.name)
+            metadatas.append(self.__datatype2metastructure(row, rows_by_id, default_names))
+        tree = StructureNode.metadata2tree(metadatas, first_level, second_level, project.id, project.name)
+        if signature is not None:
+            STRUCTURES_CACHE.put(cache_key, tree)
+        return tree
     
     
     @staticmethod
-    def __datatype2metastructure(row, dt_ids):
+    def __datatype2metastructure(row, rows_by_id, default_names):
         """
         Convert a list of data retrieved from DB and create a DataTypeMetaData object.
+        
+        :param rows_by_id: all rows of the project, by DataType ID (for retrieving DataTypeGroup rows)
+        :param default_names: dictionary (module, type) -> True when display_name is not overridden for that class
         """
         data = {}
-        is_group = False
-        if row[7] is not None and row[7] and row[14] in dt_ids:
-            is_group = True
-            group = dao.get_generic_entity(model.OperationGroup, row[7])
-            if group and len(group):
-                group = group[0]
-            else:
-                is_group = False
-        datatype_group = None
-        if row[14] is not None and row[14] in dt_ids:
-            datatype_group = dao.get_datatype_by_id(row[14])
-        dt_entity = dao.get_datatype_by_gid(row[9])
-        data[DataTypeMetaData.KEY_TITLE] = dt_entity.display_name
+        datatype_group = rows_by_id.get(row[14]) if row[14] is not None else None
+        is_group = datatype_group is not None and bool(row[7])
+        data[DataTypeMetaData.KEY_TITLE] = ProjectService.__get_display_name(row, default_names)
         ## All these fields are necessary here for dynamic Tree levels.
-        data[DataTypeMetaData.KEY_NODE_TYPE] = datatype_group.type if datatype_group is not None else row[0]
+        data[DataTypeMetaData.KEY_NODE_TYPE] = datatype_group[0] if datatype_group is not None else row[0]
         data[DataTypeMetaData.KEY_STATE] = row[1]
         data[DataTypeMetaData.KEY_SUBJECT] = str(row[2])
         operation_name = context.CommonDetails.compute_operation_name(row[3], row[4], row[5])
         data[DataTypeMetaData.KEY_OPERATION_TYPE] = operation_name
         data[DataTypeMetaData.KEY_AUTHOR] = row[6]
-        data[DataTypeMetaData.KEY_OPERATION_TAG] = group.name if is_group else row[8]
-        data[DataTypeMetaData.KEY_OP_GROUP_ID] = group.id if is_group else None
-        data[DataTypeMetaData.KEY_GID] = datatype_group.gid if datatype_group is not None else row[9]
+        data[DataTypeMetaData.KEY_OPERATION_TAG] = row[22] if is_group else row[8]
+        data[DataTypeMetaData.KEY_OP_GROUP_ID] = row[7] if is_group else None
+        data[DataTypeMetaData.KEY_GID] = datatype_group[9] if datatype_group is not None else row[9]
         data[DataTypeMetaData.KEY_DATE] = date2string(row[10]) if (row[10] is not None) else ''
-        data[DataTypeMetaData.KEY_DATATYPE_ID] = datatype_group.id if datatype_group is not None else row[11]
+        data[DataTypeMetaData.KEY_DATATYPE_ID] = datatype_group[11] if datatype_group is not None else row[11]
         data[DataTypeMetaData.KEY_LINK] = row[12]
         data[DataTypeMetaData.KEY_OPERATION_ALGORITHM] = row[5]
         date_string = row[10].strftime(MONTH_YEAR_FORMAT) if row[10] is not None else ""
@@ -510,6 +537,24 @@ class ProjectService:
         return DataTypeMetaData(data, invalid)
     
     
+    @staticmethod
+    def __get_display_name(row, default_names):
+        """
+        :return: display name for the DataType in a row retrieved by get_datatypes_info_for_project.
+            The entity is loaded from DB only when its class overrides the default display_name.
+        """
+        class_key = (row[23], row[0])
+        if class_key not in default_names:
+            try:
+                data_class = getattr(__import__(row[23], globals(), locals(), [str(row[0])]), row[0])
+                default_names[class_key] = data_class.display_name is model.DataType.display_name
+            except (ImportError, AttributeError, TypeError):
+                default_names[class_key] = False
+        if default_names[class_key]:
+            return model.DataType.build_display_name(row[0], row[16:21])
+        return dao.get_datatype_by_gid(row[9]).display_name
+    
+    
     @staticmethod
     def get_datatype_details(datatype_gid):
         """
@@ -612,6 +657,8 @@ class ProjectService:
             data_list = dao.get_datatypes_from_datatype_group(datatype.id)
             for adata in data_list:
                 self._remove_project_node_files(project_id, adata.gid, skip_validation)
+                PAYLOADS_CACHE.invalidate(adata.gid)
+                ARRAYS_CACHE.invalidate(adata.gid)
                 if adata.fk_from_operation not in operations_set:
                     operations_set.append(adata.fk_from_operation)
 
@@ -621,6 +668,8 @@ class ProjectService:
 
         else:
             self._remove_project_node_files(project_id, datatype.gid, skip_validation)
+        PAYLOADS_CACHE.invalidate(datatype.gid)
+        ARRAYS_CACHE.invalidate(datatype.gid)
         
         ## Remove Operation entity in case no other DataType needs them.
         project = dao.get_project_by_id(project_id)
@@ -633,6 +682,12 @@ class ProjectService:
             ## Make sure Operation folder is removed
             self.structure_helper.remove_operation_data(project.name, datatype.fk_from_operation)
         
+        ## The signature of a project does not always change on removal (e.g. when the newest DataType 
+        ## is removed and another one gets stored with the same ID), and links span projects.
+        STRUCTURES_CACHE.clear()
+        ## The removed DataType might be a result or a measure displayed in a PSE.
+        clear_pse_results()
+        
         if not correct:
             raise RemoveDataTypeException("Could not remove DataType "+ str(datatype_gid))
         else:
@@ -733,6 +788,10 @@ class ProjectService:
         except Exception, excep:
             self.logger.exception(excep)
             raise StructureException(excep.message)
+        finally:
+            ## Edited DataTypes might be linked in other projects as well.
+            STRUCTURES_CACHE.clear()
+            clear_pse_results()
         
         
     def _edit_data(self, datatype, new_data, from_group=False):
@@ -919,6 +978,7 @@ class ProjectService:
             datatype_gid = dao.get_datatype_by_id(datatype.fk_datatype_group).gid
 
         dao.set_datatype_visibility(datatype_gid, is_visible)
+        STRUCTURES_CACHE.clear()
 
 
     @staticmethod
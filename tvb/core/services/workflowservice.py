@@ -61,15 +61,14 @@ class WorkflowService:
         :param simulator_id: the id of the simulator adapter
         :param operations: a list with the operations created for the simulator steps
         """
-        workflows = []
+        workflows = dao.store_entities([model.Workflow(project_id, burst_id) for _ in operations])
+        simulation_steps = []
         for idx in range(len(operations)):
-            new_workflow = model.Workflow(project_id, burst_id)
-            new_workflow = dao.store_entity(new_workflow)
-            workflows.append(new_workflow)
-            simulation_step  = model.WorkflowStep(algorithm_id= simulator_id, workflow_id= new_workflow.id, 
+            simulation_step  = model.WorkflowStep(algorithm_id= simulator_id, workflow_id= workflows[idx].id, 
                                                   step_index= simulator_index, static_param= operations[idx].parameters)
             simulation_step.fk_operation = operations[idx].id
-            dao.store_entity(simulation_step)
+            simulation_steps.append(simulation_step)
+        dao.store_entities(simulation_steps)
         return workflows
         
 
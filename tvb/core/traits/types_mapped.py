@@ -28,6 +28,7 @@
 
 import os
 import json
+import weakref
 import numpy
 from scipy import sparse
 from sqlalchemy.ext.declarative import declared_attr
@@ -45,6 +46,9 @@ from tvb.core.entities.storage import dao
 from tvb.core.entities.file.fileshelper import FilesHelper
 from tvb.core.entities.file.hdf5storage import HDF5StorageManager
 from tvb.core.entities.file.exceptions import MissingDataSetException
+from tvb.core.entities.file import envelopes
+from tvb.core.entities.file.arraystatistics import ArrayStatistics
+from tvb.core.entities.file.payloadcache import ARRAYS_CACHE
 
 
 
@@ -59,6 +63,7 @@ class MappedType(model.DataType, mapped.MappedTypeLight):
     framework_metadata = None
     logger = get_logger(__name__)
     _ui_complex_datatype = False
+    _async_writes_queue_size = None
     
 
     def __init__(self, **kwargs):
@@ -70,7 +75,8 @@ class MappedType(model.DataType, mapped.MappedTypeLight):
         if KWARG_STORAGE_PATH in kwargs:
             self.storage_path = kwargs[KWARG_STORAGE_PATH]
             kwargs.pop(KWARG_STORAGE_PATH)
-        self._current_metadata = dict()
+        self._current_statistics = dict()
+        self._current_envelopes = dict()
         super(MappedType, self).__init__(**kwargs)
     
 
@@ -174,6 +180,22 @@ class MappedType(model.DataType, mapped.MappedTypeLight):
                                               (self.__class__.__name__, key))
         
         
+    def detach_cached_arrays(self):
+        """
+        Replace the arrays this instance shares through ARRAYS_CACHE (read-only) with private, writeable copies.
+        To be called before handing the instance to code which changes its arrays in place 
+        (e.g. the scientific library, when configuring a simulation).
+        """
+        for key, attr in self.trait.iteritems():
+            if isinstance(attr, mapped.Array) and attr.trait.file_storage != FILE_STORAGE_NONE:
+                ## Reading the attribute loads it from storage (and ARRAYS_CACHE) when needed.
+                data = getattr(self, key)
+                data_reference = getattr(self, '__' + key + '_ref', None)
+                if data is not None and data_reference is not None and data_reference() is data:
+                    setattr(self, '__' + key, data.copy())
+                    setattr(self, '__' + key + '_ref', None)
+        
+        
     def set_operation_id(self, operation_id):
         """
         Setter for FK_operation_id.
@@ -196,8 +218,9 @@ class MappedType(model.DataType, mapped.MappedTypeLight):
             ::param data: data to be stored (can be a list / array / numpy array...) 
             ::param where: represents the path where to store our dataset (e.g. /data/info) 
         """
+        ARRAYS_CACHE.invalidate(self.gid)
         store_manager = self._get_file_storage_mng()
-        store_manager.store_data(data_name, data, where)
+        store_manager.store_data(data_name, data, where, self.get_storage_layout(data_name, where))
         ### Also store Array specific meta-data.
         meta_dictionary = self.__retrieve_array_metadata(data, data_name)
         self.set_metadata(meta_dictionary, data_name, where=where)
@@ -216,33 +239,77 @@ class MappedType(model.DataType, mapped.MappedTypeLight):
                                    growable dimension. Providing an accurate value for this 
                                    parameter improves storage performance. 
             ::param close_file: Specify if the file should be closed automatically after write operation. 
-                                If not, you have to close file by calling method close_file()
+                                If not, you have to close file by calling method close_file().
+                                With asynchronous writes enabled (see enable_async_writes), closing 
+                                waits for all queued chunks to be written.
             ::param where: represents the path where to store our dataset (e.g. /data/info)  
         """
         if isinstance(data, list):
             data = numpy.array(data)
+        ARRAYS_CACHE.invalidate(self.gid)
         store_manager = self._get_file_storage_mng()
-        store_manager.append_data(data_name, data, grow_dimension, expected_rows, buffer_shape, close_file, where)
+        store_manager.append_data(data_name, data, grow_dimension, expected_rows, buffer_shape, close_file, where,
+                                  self.get_storage_layout(data_name, where))
         
-        ### Start updating array meta-data after new chunk of data stored. 
-        new_metadata = self.__retrieve_array_metadata(data, data_name)
-        previous_meta = dict()
-        if data_name in self._current_metadata:
-            previous_meta = self._current_metadata[data_name]
-        self.__merge_metadata(new_metadata, previous_meta, data)
-        self._current_metadata[data_name] = new_metadata
+        ### Update array statistics with the new chunk. They are written as meta-data on close_file.
+        if data_name in self.trait:
+            if data_name not in self._current_statistics:
+                statistics_axes = self.trait[data_name].trait.inits.kwd.get(Array.KWD_STATISTICS_AXES, None)
+                self._current_statistics[data_name] = ArrayStatistics(statistics_axes)
+            self._current_statistics[data_name].update(data, grow_dimension)
+            
+            ### Min / max envelopes for data-sets growing on their first (time) dimension, also written on close_file.
+            if data_name not in self._current_envelopes:
+                builder = None
+                with_envelopes = self.trait[data_name].trait.inits.kwd.get(Array.KWD_ENVELOPES, True)
+                if (with_envelopes and not close_file and where == self.ROOT_NODE_PATH and grow_dimension == 0 
+                        and numpy.asarray(data).dtype.kind in 'biuf'):
+                    builder = envelopes.EnvelopeBuilder(self.__get_envelope_writer(data_name))
+                self._current_envelopes[data_name] = builder
+            if self._current_envelopes[data_name] is not None:
+                self._current_envelopes[data_name].add_chunk(data)
+    
+    
+    def __get_envelope_writer(self, data_name):
+        """ Build the function appending blocks of envelope points, to the data-sets of a level. """
+        store_manager = self._get_file_storage_mng()
+        
+        def _write_envelope(level, minimums, maximums):
+            """ Append a block of points to the data-sets of one level. """
+            min_name, max_name = envelopes.envelope_dataset_names(data_name, level)
+            store_manager.append_data(min_name, minimums, 0, close_file=False)
+            store_manager.append_data(max_name, maximums, 0, close_file=False)
+        
+        return _write_envelope
     
 
-    def get_data(self, data_name, data_slice=None, where=ROOT_NODE_PATH, ignore_errors=False):
+    def get_storage_layout(self, data_name, where=ROOT_NODE_PATH):
+        """
+        Chunking / compression profile for a data-set of the current DataType.
+        By default it is the 'storage_layout' keyword declared on the traited Array attribute
+        (e.g. Array(storage_layout=DataSetLayout(DataSetLayout.ACCESS_SPACE_MAJOR))).
+        Subclasses can overwrite this method, for data-sets which are not traited attributes.
+            ::param data_name: name of the data-set
+            ::param where: represents the path where dataset is stored (e.g. /data/info)
+            ::return: DataSetLayout instance or None for the default layout
+        """
+        if where != self.ROOT_NODE_PATH or data_name not in self.trait:
+            return None
+        return self.trait[data_name].trait.inits.kwd.get(Array.KWD_STORAGE_LAYOUT, None)
+    
+    
+    def get_data(self, data_name, data_slice=None, where=ROOT_NODE_PATH, ignore_errors=False, use_memmap=False):
         """
         This method reads data from the given data set based on the slice specification
             ::param data_name: Name of the data set from where to read data
             ::param data_slice: Specify how to retrieve data from array {e.g [slice(1,10,1),slice(1,6,2)] ]
             ::param where: represents the path where dataset is stored (e.g. /data/info)  
+            ::param use_memmap: when True, try to return a read-only numpy.memmap view over the H5 file, 
+                                 without copying data in memory (only for contiguous, uncompressed data-sets)
             ::return: a numpy.ndarray containing filtered data
         """
         store_manager = self._get_file_storage_mng()
-        return store_manager.get_data(data_name, data_slice, where, ignore_errors)
+        return store_manager.get_data(data_name, data_slice, where, ignore_errors, use_memmap)
     
     
     def get_data_shape(self, data_name, where=ROOT_NODE_PATH):
@@ -262,8 +329,53 @@ class MappedType(model.DataType, mapped.MappedTypeLight):
                 return ()
         else:
             return super(MappedType, self).get_data_shape(data_name)
-        
-        
+    
+    
+    def get_envelope_levels(self, data_name='data'):
+        """
+        The min / max envelopes of a data-set (time on the first dimension) are written together with 
+        the data, by store_data_chunk and close_file. Nothing is computed or written here.
+            ::param data_name: name of the full resolution data-set
+            ::return: the coarsest level available (window of 2**level time points per envelope point), 
+                      or 0 when no envelopes were stored for the current data
+        """
+        metadata = self.get_metadata(data_name)
+        if metadata.get(envelopes.METADATA_ENVELOPE_LENGTH) != self.get_data_shape(data_name)[0]:
+            ## No envelopes, or data was appended later (e.g. by another writer).
+            return 0
+        return int(metadata.get(envelopes.METADATA_ENVELOPE_LEVEL, 0))
+    
+    
+    def read_data_envelope(self, from_idx, to_idx, pixel_width, specific_slices=None, data_name='data'):
+        """
+        Read the min / max envelope of a time window, at the coarsest level still giving 
+        one point per pixel (see envelopes.select_level).
+            ::param from_idx: first time point of the window
+            ::param to_idx: end (exclusive) of the time window
+            ::param pixel_width: number of points the client is able to draw
+            ::param specific_slices: JSON list with an index or null for each dimension (e.g. [null,0,null,0]),
+                                     the time dimension being ignored
+            ::return: array of shape (2, points, ...) with minimums on [0] and maximums on [1]. 
+                      Point i covers time points [(first + i) * 2**level, (first + i + 1) * 2**level), 
+                      with first = from_idx // 2**level. On level 0, minimums and maximums are the data itself.
+        """
+        from_idx, to_idx, pixel_width = int(from_idx), int(to_idx), int(pixel_width)
+        level = envelopes.select_level(to_idx - from_idx, pixel_width, self.get_envelope_levels(data_name))
+        factor = 2 ** level
+        data_slice = [slice(from_idx // factor, (to_idx + factor - 1) // factor)]
+        if specific_slices is not None:
+            if isinstance(specific_slices, basestring):
+                specific_slices = json.loads(specific_slices)
+            for index in specific_slices[1:]:
+                data_slice.append(slice(None) if index is None else int(index))
+        data_slice = tuple(data_slice)
+        if level == 0:
+            data = self.get_data(data_name, data_slice)
+            return numpy.array([data, data])
+        min_name, max_name = envelopes.envelope_dataset_names(data_name, level)
+        return numpy.array([self.get_data(min_name, data_slice), self.get_data(max_name, data_slice)])
+    
+    
     def get_info_about_array(self, array_name, included_info=None):
         """
         :return: dictionary {label: value} about an attribute of type mapped.Array
@@ -437,11 +549,18 @@ class MappedType(model.DataType, mapped.MappedTypeLight):
         """
         Close file used to store data.
         """
-        for data_name, new_metadata in self._current_metadata.iteritems():
-            ## Remove transient metadata, used just for performance issues
-            if self._METADATA_ARRAY_SIZE in new_metadata:
-                del new_metadata[self._METADATA_ARRAY_SIZE]
-            self.set_metadata(new_metadata, data_name)
+        for data_name, statistics in self._current_statistics.iteritems():
+            self.set_metadata(statistics.to_metadata(self.METADATA_ARRAY_MIN, self.METADATA_ARRAY_MAX,
+                                                     self.METADATA_ARRAY_MEAN, self.METADATA_ARRAY_VAR,
+                                                     self.trait[data_name]._stored_metadata), data_name)
+        for data_name, builder in self._current_envelopes.iteritems():
+            if builder is not None:
+                max_level = builder.finish()
+                if max_level > 0:
+                    self.set_metadata({envelopes.METADATA_ENVELOPE_LENGTH: builder.length, 
+                                       envelopes.METADATA_ENVELOPE_LEVEL: max_level}, data_name)
+        ## Envelopes are complete only for the chunks seen until now.
+        self._current_envelopes = dict()
         store_manager = self._get_file_storage_mng()
         store_manager.close_file()
     
@@ -452,10 +571,22 @@ class MappedType(model.DataType, mapped.MappedTypeLight):
         """
         if not hasattr(self, "_storage_manager") or self._storage_manager is None:
             file_name = self.get_storage_file_name()      
-            self._storage_manager = HDF5StorageManager(self.storage_path, file_name)       
+            self._storage_manager = HDF5StorageManager(self.storage_path, file_name)
+            self._storage_manager.enable_async_writes(self._async_writes_queue_size)
         return self._storage_manager
     
     
+    def enable_async_writes(self, queue_size):
+        """
+        Have chunks written through store_data_chunk queued and written to disk from a background thread.
+        All pending chunks are written when close_file() is called.
+            ::param queue_size: maximum number of chunks waiting to be written, before store_data_chunk blocks.
+                                None or 0 means synchronous writes.
+        """
+        self._async_writes_queue_size = queue_size
+        self._get_file_storage_mng().enable_async_writes(queue_size)
+    
+    
     def get_storage_file_name(self):
         """
         This method returns the name of the file where data will be stored.
@@ -497,31 +628,23 @@ class MappedType(model.DataType, mapped.MappedTypeLight):
         meta_dictionary[self._METADATA_ARRAY_SIZE] = data.size
         return meta_dictionary
     
-    
-    def __merge_metadata(self, result_meta, merge_meta, new_data):
-        """
-        Merge after new chunk added.
-        """
-        if self.METADATA_ARRAY_VAR in result_meta:
-            del result_meta[self.METADATA_ARRAY_VAR]
-        if (self.METADATA_ARRAY_MIN in merge_meta 
-            and merge_meta[self.METADATA_ARRAY_MIN] < result_meta[self.METADATA_ARRAY_MIN]):
-            result_meta[self.METADATA_ARRAY_MIN] = merge_meta[self.METADATA_ARRAY_MIN]
-        if (self.METADATA_ARRAY_MAX in merge_meta 
-            and merge_meta[self.METADATA_ARRAY_MAX] > result_meta[self.METADATA_ARRAY_MAX]):
-            result_meta[self.METADATA_ARRAY_MAX] = merge_meta[self.METADATA_ARRAY_MAX]
-        if (self.METADATA_ARRAY_MEAN in merge_meta and self._METADATA_ARRAY_SIZE in merge_meta):
-            prev_no = merge_meta[self._METADATA_ARRAY_SIZE]
-            curr_no = new_data.size
-            result_meta[self.METADATA_ARRAY_MEAN] = (merge_meta[self.METADATA_ARRAY_MEAN]* prev_no + 
-                                                     result_meta[self.METADATA_ARRAY_MEAN]*curr_no)/(prev_no+curr_no)
-            result_meta[self._METADATA_ARRAY_SIZE] = prev_no + curr_no
-    
     # ---------------------------- END ARRAY ATTR METADATAS ------------------------
 
 
 class Array(mapped.Array):
     
+    ## Keyword to be declared on the traited attribute, e.g. Array(use_memmap=True), 
+    ## when the full array is to be read as a memory-mapped view, instead of an in-memory copy.
+    KWD_USE_MEMMAP = 'use_memmap'
+    ## Keyword for declaring a DataSetLayout (chunking / compression) on the traited attribute.
+    KWD_STORAGE_LAYOUT = 'storage_layout'
+    ## Keyword listing dimensions for which statistics of chunked writes are also kept per index,
+    ## e.g. Array(statistics_axes=(1, 3)) for the state-variables and modes of a 4D TimeSeries.
+    KWD_STATISTICS_AXES = 'statistics_axes'
+    ## Keyword for not storing min / max envelopes of an attribute written in chunks along its first dimension,
+    ## e.g. Array(envelopes=False) when the first dimension is not time.
+    KWD_ENVELOPES = 'envelopes'
+    
     
     def __set__(self, inst, value):
         """
@@ -545,6 +668,12 @@ class Array(mapped.Array):
     def _get_cached_data(self, inst):
         """
         Overwrite method from library mode array to read from storage when needed.
+        
+        Arrays read from storage are kept in the process-wide ARRAYS_CACHE, keyed by GID and attribute name, 
+        thus shared (read-only) by all instances of the same DataType. The instance only keeps a weak 
+        reference, so an array evicted from cache is freed as soon as nobody else uses it.
+        Arrays bigger than the whole cache are not shared: they stay on the instance (writeable), as before.
+        See also MappedType.detach_cached_arrays, for code changing arrays in place.
         """
         cached_data = get(inst, '__'+ self.trait.name, None)
             
@@ -553,13 +682,58 @@ class Array(mapped.Array):
             and isinstance(inst, mapped.MappedTypeLight)):
             
             ### Data not already loaded, and storage usage
-            cached_data = self._read_from_storage(inst)
-            setattr(inst, '__' + self.trait.name, cached_data)
+            reference_name = '__' + self.trait.name + '_ref'
+            data_reference = getattr(inst, reference_name, None)
+            if data_reference is not None and data_reference() is not None:
+                return data_reference()
+            
+            cache_key = (inst.gid, self.trait.name)
+            cached_data = ARRAYS_CACHE.get(cache_key)
+            if cached_data is None:
+                cached_data = self._read_from_storage(inst)
+                cache_size = self._get_cache_size(cached_data)
+                if cache_size is None or cache_size > ARRAYS_CACHE.max_size:
+                    ## Not to be shared (e.g. memory-mapped view, or too big for the cache): 
+                    ## keep it on the instance, as it is.
+                    setattr(inst, '__' + self.trait.name, cached_data)
+                    return cached_data
+                self._set_read_only(cached_data)
+                ARRAYS_CACHE.put(cache_key, cached_data, cache_size)
+            setattr(inst, reference_name, weakref.ref(cached_data))
             
         ## Data already loaded, or no storage is used
         return cached_data
     
     
+    @staticmethod
+    def _get_cache_size(data):
+        """
+        :return: number of bytes to be accounted in ARRAYS_CACHE for an array read from storage, 
+                 or None when it should not be cached (empty, memory-mapped or not a numpy array).
+        """
+        if data is None or data.size == 0 or isinstance(data, numpy.memmap):
+            return None
+        if isinstance(data, numpy.ndarray):
+            return data.nbytes
+        if sparse.issparse(data):
+            return sum(getattr(data, part).nbytes for part in ('data', 'indices', 'indptr', 'row', 'col') 
+                       if isinstance(getattr(data, part, None), numpy.ndarray))
+        return None
+    
+    
+    @staticmethod
+    def _set_read_only(data):
+        """
+        Arrays in ARRAYS_CACHE are shared between instances: in-place changes are forbidden.
+        """
+        if sparse.issparse(data):
+            for part in ('data', 'indices', 'indptr', 'row', 'col'):
+                if isinstance(getattr(data, part, None), numpy.ndarray):
+                    getattr(data, part).flags.writeable = False
+        else:
+            data.flags.writeable = False
+    
+    
     def _write_in_storage(self, inst, value):
         """
         Store value on disk (in h5 file).
@@ -575,18 +749,22 @@ class Array(mapped.Array):
             raise StorageException("You should not use SET on attributes-to-be-stored-in-files!")
         
         
-    def _read_from_storage(self, inst):
+    def _read_from_storage(self, inst, use_memmap=None):
         """
         Call correct storage methods, and validation
         :param inst: Will give us the storage_path, it is a MappedType instance
+        :param use_memmap: request a read-only memory-mapped view instead of an in-memory copy.
+                           When None, the 'use_memmap' keyword declared on the traited attribute is used.
         :return: entity of self.wraps type
         @raise: Exception when used with chunks
         """
+        if use_memmap is None:
+            use_memmap = self.trait.inits.kwd.get(self.KWD_USE_MEMMAP, False)
         if self.trait.file_storage == FILE_STORAGE_NONE:
             return None
         elif self.trait.file_storage == FILE_STORAGE_DEFAULT:
             try:
-                return inst.get_data(self.trait.name, ignore_errors=True)
+                return inst.get_data(self.trait.name, ignore_errors=True, use_memmap=use_memmap)
             except StorageException, exc:
                 self.logger.debug("Missing dataSet " + self.trait.name)
                 self.logger.debug(exc)
@@ -598,7 +776,7 @@ class Array(mapped.Array):
 class SparseMatrix(mapped.SparseMatrix, Array):
     
     
-    def _read_from_storage(self, inst):
+    def _read_from_storage(self, inst, use_memmap=None):
         """
         Overwrite method from superclass, and call Sparse_Matrix specific reader.
         """
@@ -633,41 +811,107 @@ class SparseMatrix(mapped.SparseMatrix, Array):
     @staticmethod   
     def _store_sparse_matrix(inst, mtx, data_name): 
         """    
-        This method stores sparse matrix into H5 file.
+        This method stores sparse matrix into H5 file, with a single open of the file.
+        CSR, CSC and COO matrices are stored in their own format, any other format is stored as CSR.
         ::param inst: instance on for which to store sparse matrix
         ::param mtx: sparse matrix to store
         ::param data_name: name of data group which will contain sparse matrix details     
         """
+        if mtx.format not in ('csr', 'csc', 'coo'):
+            mtx = mtx.tocsr()
         info_dict = {}
         info_dict[SparseMatrix.DTYPE_META] = mtx.dtype.str 
-        info_dict[SparseMatrix.SHAPE_META] = str(mtx.shape) 
+        info_dict[SparseMatrix.SHAPE_META] = str(tuple(int(dim) for dim in mtx.shape))
         info_dict[SparseMatrix.FORMAT_META] = mtx.format 
     
-        data_group_path = SparseMatrix.ROOT_PATH + data_name
-        
-        # Store data and additional info
-        inst.store_data(SparseMatrix.DATA_DS, mtx.data, data_group_path) 
-        inst.store_data(SparseMatrix.INDPTR_DS, mtx.indptr, data_group_path) 
-        inst.store_data(SparseMatrix.INDICES_DS, mtx.indices, data_group_path)
+        if mtx.format == 'coo':
+            data_sets = {SparseMatrix.DATA_DS: mtx.data, 
+                         SparseMatrix.ROWS_DS: mtx.row, 
+                         SparseMatrix.COLS_DS: mtx.col}
+        else:
+            data_sets = {SparseMatrix.DATA_DS: mtx.data, 
+                         SparseMatrix.INDPTR_DS: mtx.indptr, 
+                         SparseMatrix.INDICES_DS: mtx.indices}
         
-        # Store additional info on the group dedicated to sparse matrix
-        inst.set_metadata(info_dict, '', True, data_group_path) 
+        # Store data and additional info on the group dedicated to sparse matrix
+        ARRAYS_CACHE.invalidate(inst.gid)
+        inst._get_file_storage_mng().store_data_group(data_sets, info_dict, SparseMatrix.ROOT_PATH + data_name)
      
     
     @staticmethod
     def _read_sparse_matrix(inst, data_name):
         """
-        Reads SparseMatrix from H5 file and returns an instance of such matrix
+        Reads SparseMatrix from H5 file (opened only once) and returns an instance of such matrix
         ::param inst: instance on for which to read sparse matrix
         ::param data_name: name of data group which contains sparse matrix details
         ::return in instance of sparse matrix with data loaded from H5 file
         """ 
-        constructors = {'csr':sparse.csr_matrix, 'csc':sparse.csc_matrix} 
+        data_group_path = SparseMatrix.ROOT_PATH + data_name
+        storage_manager = inst._get_file_storage_mng()
+        info_dict = storage_manager.get_data_group([], data_group_path, with_metadata=True)[0]
+        mtx_format, dtype, shape = SparseMatrix._read_sparse_info(info_dict)
+    
+        if mtx_format in ['csc', 'csr']:
+            data, indices, indptr = storage_manager.get_data_group([(SparseMatrix.DATA_DS, None), 
+                                                                    (SparseMatrix.INDICES_DS, None),
+                                                                    (SparseMatrix.INDPTR_DS, None)], data_group_path)
+            constructor = sparse.csr_matrix if mtx_format == 'csr' else sparse.csc_matrix
+            mtx = constructor((data, indices, indptr), shape = shape, dtype = dtype)
+            mtx.sort_indices() 
+        elif mtx_format == 'coo': 
+            data, rows, cols = storage_manager.get_data_group([(SparseMatrix.DATA_DS, None), 
+                                                               (SparseMatrix.ROWS_DS, None),
+                                                               (SparseMatrix.COLS_DS, None)], data_group_path)
+            mtx = sparse.coo_matrix((data, (rows, cols)), shape = shape, dtype = dtype)
+        else: 
+            raise Exception("Unsupported format: %s"%mtx_format) 
+    
+        return mtx 
     
+    
+    @staticmethod
+    def read_sparse_vector(inst, data_name, index, axis=0):
+        """
+        Read one row (axis=0) or one column (axis=1) of a sparse matrix stored in H5.
+        Rows of a CSR matrix (and columns of a CSC matrix) are read without loading the full matrix:
+        only the corresponding range of indptr, data and indices. Any other case reads the whole matrix.
+        ::param inst: instance on for which to read sparse matrix
+        ::param data_name: name of data group which contains sparse matrix details
+        ::return: dense 1D numpy array
+        """
         data_group_path = SparseMatrix.ROOT_PATH + data_name
+        storage_manager = inst._get_file_storage_mng()
+        try:
+            info_dict, indptr = storage_manager.get_data_group([(SparseMatrix.INDPTR_DS, slice(index, index + 2))],
+                                                               data_group_path, with_metadata=True)
+            mtx_format, dtype, shape = SparseMatrix._read_sparse_info(info_dict)
+        except MissingDataSetException:
+            ## No indptr stored (COO matrix).
+            mtx_format = None
         
-        info_dict = inst.get_metadata('', data_group_path)
+        if (mtx_format, axis) not in (('csr', 0), ('csc', 1)):
+            vector = SparseMatrix._read_sparse_matrix(inst, data_name)
+            vector = vector.tocsr()[index] if axis == 0 else vector.tocsc()[:, index]
+            return vector.toarray().ravel()
         
+        if index < 0 or index >= shape[axis]:
+            raise IndexError("Index %d out of bounds for sparse matrix of shape %s" % (index, str(shape)))
+        start, end = int(indptr[0]), int(indptr[1])
+        if end == start:
+            return numpy.zeros(shape[1 - axis], dtype=dtype)
+        data, indices = storage_manager.get_data_group([(SparseMatrix.DATA_DS, slice(start, end)), 
+                                                        (SparseMatrix.INDICES_DS, slice(start, end))], data_group_path)
+        ## Built through scipy, so that duplicate entries get summed, as in the full matrix.
+        vector = sparse.csr_matrix((data, indices, [0, end - start]), shape=(1, shape[1 - axis]), dtype=dtype)
+        return vector.toarray().ravel()
+    
+    
+    @staticmethod
+    def _read_sparse_info(info_dict):
+        """
+        :param info_dict: meta-data of the group dedicated to a sparse matrix
+        :return: tuple (format, dtype, shape)
+        """
         mtx_format = info_dict[SparseMatrix.FORMAT_META] 
         if not isinstance(mtx_format, str): 
             mtx_format = mtx_format[0] 
@@ -675,26 +919,11 @@ class SparseMatrix(mapped.SparseMatrix, Array):
         dtype = info_dict[SparseMatrix.DTYPE_META] 
         if not isinstance(dtype, str): 
             dtype = dtype[0] 
-    
-        constructor = constructors[mtx_format] 
-    
-        if mtx_format in ['csc', 'csr']:
-            data =  inst.get_data(SparseMatrix.DATA_DS, where=data_group_path)
-            indices = inst.get_data(SparseMatrix.INDICES_DS, where=data_group_path)
-            indptr = inst.get_data(SparseMatrix.INDPTR_DS, where=data_group_path)
-            shape = eval(info_dict[SparseMatrix.SHAPE_META])
-            
-            mtx = constructor((data, indices, indptr), shape = shape, dtype = dtype)
-            mtx.sort_indices() 
-        elif mtx_format == 'coo': 
-            data =  inst.get_data(SparseMatrix.DATA_DS, where=data_group_path)
-            shape = eval(info_dict[SparseMatrix.SHAPE_META])
-            rows =  inst.get_data(SparseMatrix.ROWS_DS, where=data_group_path)
-            cols =  inst.get_data(SparseMatrix.COLS_DS, where=data_group_path)
-            
-            mtx = constructor((data, sparse.c_[rows, cols].T), shape = shape, dtype = dtype ) 
-        else: 
-            raise Exception("Unsupported format: %s"%mtx_format) 
-    
-        return mtx 
+        
+        ## Shape is stored as a string, e.g. "(16384, 16384)" (or "(16384L, 16384L)" in older files).
+        shape = info_dict[SparseMatrix.SHAPE_META]
+        if not isinstance(shape, str):
+            shape = shape[0]
+        shape = tuple(int(dim.strip().rstrip('lL')) for dim in shape.strip().strip('()').split(',') if dim.strip())
+        return mtx_format, dtype, shape
 
@@ -29,6 +29,8 @@ This is the main UI entry point.
 """
 
 import os
+import json
+import hashlib
 import cherrypy
 from copy import copy
 from genshi.template.loader import TemplateLoader
@@ -38,6 +40,7 @@ from tvb.basic.logger.builder import get_logger
 from tvb.core.services.settingsservice import SettingsService
 from tvb.core.services.userservice import UserService
 from tvb.core.services.flowservice import FlowService
+from tvb.core.entities.file.payloadcache import PayloadsCache
 from tvb.interfaces.web.structure import WebStructure
 
 #These are global constants, used for session attributes and template variables.
@@ -95,6 +98,13 @@ KEY_OVERLAY_PAGINATION = "show_overlay_pagination"
 KEY_OVERLAY_PREVIOUS = "action_overlay_previous"
 KEY_OVERLAY_NEXT = "action_overlay_next"
 
+## Shared by all requests, so that every template is parsed only once.
+## Genshi loader is thread safe; its cache needs to hold all our templates.
+TEMPLATE_LOADER = TemplateLoader(auto_reload=cfg.TEMPLATES_AUTO_RELOAD, max_cache_size=500)
+## Rendered HTML, for fragments declared as cacheable in using_template.
+FRAGMENTS_CACHE = PayloadsCache(cfg.TEMPLATE_FRAGMENTS_CACHE_SIZE * 1024 * 1024)
+FRAGMENTS_REPORT_INTERVAL = 500
+
 
 def settings():
     """
@@ -120,15 +130,65 @@ def profile(template_path, func, *a, **b):
     """
     template_dict = func(*a, **b)
     ### Generate HTML given the path to the template and the data dictionary.
-    loader = TemplateLoader()
-    template = loader.load(template_path)
+    template = TEMPLATE_LOADER.load(template_path)
     stream = template.generate(**template_dict)
     return stream.render('xhtml')
 
 
-def using_template(template_name):
+def preload_templates():
+    """
+    Parse all templates at startup, to have them compiled in the shared loader before the first requests.
+    """
+    logger = get_logger("tvb.interface.web.controllers.basecontroller")
+    loaded = 0
+    for folder, _, file_names in os.walk(cfg.TEMPLATE_ROOT):
+        for file_name in file_names:
+            if file_name.endswith('.html'):
+                try:
+                    TEMPLATE_LOADER.load(os.path.join(folder, file_name))
+                    loaded += 1
+                except Exception, excep:
+                    ## Some fragments can only be parsed when included from their parent template.
+                    logger.debug("Could not preload template %s: %s" % (file_name, str(excep)))
+    logger.info("Preloaded %d templates." % loaded)
+
+
+def template_vars_key(*var_names):
+    """
+    Build a function computing the fragment cache key, as a digest of the given template variables. 
+    Objects without a JSON representation are digested by their repr.
+    """
+    def compute_key(template_dict):
+        """ Digest the variables the fragment depends on. """
+        values = [template_dict.get(var_name) for var_name in var_names]
+        return hashlib.sha1(json.dumps(values, sort_keys=True, default=repr)).hexdigest()
+    return compute_key
+
+
+def _render_fragment(template_path, template_dict, fragment_key):
+    """
+    Render a template, reusing the HTML previously rendered for the same fragment key.
     """
-    Annotation to check if a user is logged before accessing a controller method.
+    cache_key = (template_path, fragment_key(template_dict))
+    html = FRAGMENTS_CACHE.get(cache_key)
+    if html is None:
+        html = TEMPLATE_LOADER.load(template_path).generate(**template_dict).render('xhtml')
+        FRAGMENTS_CACHE.put(cache_key, html)
+    statistics = FRAGMENTS_CACHE.get_statistics()
+    if (statistics['hits'] + statistics['misses']) % FRAGMENTS_REPORT_INTERVAL == 0:
+        get_logger("tvb.interface.web.controllers.basecontroller").info(
+            "Template fragments cache: %(hits)d hits, %(misses)d misses (hit rate %(hit_rate).2f), "
+            "%(entries)d fragments, %(size)d bytes." % statistics)
+    return html
+
+
+def using_template(template_name, fragment_key=None):
+    """
+    Annotation to render the dictionary returned by a controller method, with a Genshi template.
+    
+    :param fragment_key: optional function(template_dictionary) returning a key for the rendered HTML.
+        When given, the HTML is cached and reused for the same key (use only for fragments which do not 
+        depend on anything else than the variables in the key, e.g. see template_vars_key). 
     """
     template_path = os.path.join(cfg.TEMPLATE_ROOT, template_name + '.html')
     def dec(func):
@@ -144,9 +204,10 @@ def using_template(template_name):
                 template_dict = func(*a, **b)
                 if not cfg.RENDER_HTML:
                     return template_dict
+                if fragment_key is not None:
+                    return _render_fragment(template_path, template_dict, fragment_key)
                 ### Generate HTML given the path to the template and the data dictionary.
-                loader = TemplateLoader()
-                template = loader.load(template_path)
+                template = TEMPLATE_LOADER.load(template_path)
                 stream = template.generate(**template_dict)
                 return stream.render('xhtml')
 
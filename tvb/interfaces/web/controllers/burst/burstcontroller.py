@@ -45,6 +45,13 @@ from tvb.interfaces.web.controllers.flowcontroller import context_selected, KEY_
 PORTLET_STEP_SEPARATOR = "____"
 BURST_NAME = 'burstName'
 
+
+def portlets_fragment_key(template_dict):
+    """ The portlets preview only depends on the identity and name of each displayed portlet. """
+    return tuple((portlet.id, portlet.algorithm_identifier, portlet.name) 
+                 for portlet in template_dict['portlet_tab_list'])
+
+
 class BurstController(base.BaseController):
     """
     Controller class for Burst-Pages.
@@ -154,7 +161,7 @@ class BurstController(base.BaseController):
     
     
     @cherrypy.expose
-    @using_template('burst/portlets_preview')
+    @using_template('burst/portlets_preview', portlets_fragment_key)
     def portlet_tab_display(self, **data):
         """
         When saving a new configuration of tabs, check if any of the old 
@@ -199,7 +206,7 @@ class BurstController(base.BaseController):
     
     
     @cherrypy.expose
-    @using_template('burst/portlets_preview')
+    @using_template('burst/portlets_preview', portlets_fragment_key)
     def get_configured_portlets(self):
         """
         Return the portlets for one given tab. This is used when changing
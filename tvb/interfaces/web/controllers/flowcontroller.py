@@ -26,11 +26,20 @@ given action are described here.
 .. moduleauthor:: Lia Domide <lia.domide@codemart.ro>
 """
 
-import cherrypy
-import formencode
+import os
+import zlib
+import gzip
 import copy
 import json
+import numpy
+import hashlib
+import cherrypy
+import formencode
+from StringIO import StringIO
+from email.utils import formatdate
+from cherrypy.lib import cptools
 from tvb.core.entities.file.fileshelper import FilesHelper
+from tvb.core.entities.file.payloadcache import PAYLOADS_CACHE
 from tvb.core.utils import url2path, parse_json_parameters, string2date, string2bool
 from tvb.basic.filters.chain import FilterChain
 from tvb.datatypes.arrays import MappedArray
@@ -42,6 +51,7 @@ from tvb.core.services.projectservice import ProjectService
 from tvb.interfaces.web.entities.context_selected_adapter import SelectedAdapterContext
 from tvb.interfaces.web.controllers.userscontroller import logged
 from tvb.interfaces.web.controllers.basecontroller import using_template
+from tvb.basic.config.settings import TVBSettings as cfg
 import tvb.interfaces.web.controllers.basecontroller as base
 
 KEY_CONTENT = ABCDisplayer.KEY_CONTENT
@@ -50,6 +60,15 @@ FILTER_TYPE = "type"
 FILTER_VALUES = "values"
 FILTER_OPERATIONS = "operations"
 KEY_CONTROLLS = "controlPage"
+## Variables on which the rendered adapter input tree depends (including the per-user online help flag).
+ADAPTER_FRAGMENT_VARS = ('inputList', 'errors', 'treeSessionKey', 'draw_hidden_ranges', 
+                         'includeGenericAdapterTemplateFunctions', 'isCallout', 
+                         base.KEY_SHOW_ONLINE_HELP, base.KEY_PARAMETERS_CONFIG)
+## Compression level for binary array responses (fast; float data does not compress much anyway).
+BINARY_COMPRESSION_LEVEL = 1
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+FORMAT_FILE = "file"
 
 
 def context_selected():
@@ -497,13 +516,26 @@ class FlowController(base.BaseController):
     def readserverstaticfile(self, coded_path):
         """
         Retrieve file from Local storage, having a File System Path.
+        The file content is cached in memory, for as long as the file is not changed on disk.
         """
         try:
-            my_file = open(url2path(coded_path), "rb")
-            result = my_file.read()
-            my_file.close()
+            file_path = url2path(coded_path)
+            file_stat = os.stat(file_path)
+            cache_key = (file_path, FORMAT_FILE, file_stat.st_size, file_stat.st_mtime)
+            self._validate_cache(self._compute_etag(*cache_key), file_stat.st_mtime)
+            result = PAYLOADS_CACHE.get(cache_key)
+            if result is None:
+                ## The file was changed on disk (or was never read), forget any older content.
+                PAYLOADS_CACHE.invalidate(file_path)
+                my_file = open(file_path, "rb")
+                result = my_file.read()
+                my_file.close()
+                PAYLOADS_CACHE.put(cache_key, result)
             return result
+        except cherrypy.HTTPRedirect:
+            raise
         except Exception, excep:
+            self._drop_cache_headers()
             self.logger.error("Could not retrieve file from path:" + str(coded_path))
             self.logger.exception(excep)
             
@@ -519,19 +551,156 @@ class FlowController(base.BaseController):
         :param flatten: result should be flatten before return (use with WebGL data mainly e.g vertices/triangles)
         :param kwargs: extra parameters to be passed when dataset_name is method. 
         """
+        cache_key = self._datatype_cache_key(entity_gid, dataset_name, flatten, FORMAT_JSON, kwargs)
+        self._validate_cache(self._compute_etag(*cache_key))
+        result = PAYLOADS_CACHE.get(cache_key)
+        if result is not None:
+            return result
         try:
-            self.logger.debug("Starting to read HDF5: "+ entity_gid + "/" + dataset_name + "/" + str(kwargs))
-            entity = ABCAdapter.load_entity_by_gid(entity_gid)
-            if kwargs is None or len(kwargs) < 1:
-                numpy_array = copy.deepcopy(getattr(entity, dataset_name))
-            else:
-                numpy_array = eval("entity."+ dataset_name +"(**kwargs)")
-            if flatten == True or flatten == "True":
-                numpy_array = numpy_array.flatten()
-            return json.dumps(numpy_array.tolist())
+            numpy_array = self._read_datatype_array(entity_gid, dataset_name, **kwargs)
+            if cache_key[2]:
+                numpy_array = numpy_array.ravel()
+            result = json.dumps(numpy_array.tolist())
+            PAYLOADS_CACHE.put(cache_key, result)
+            return result
         except Exception, excep:
+            self._drop_cache_headers()
             self.logger.error("Could not retrieve complex entity field:" + str(entity_gid) + "/" + str(dataset_name))
             self.logger.exception(excep)
+            
+            
+    @cherrypy.expose 
+    @logged()
+    def read_binary_datatype_attribute(self, entity_gid, dataset_name, flatten=False, **kwargs):
+        """
+        Retrieve from a given DataType a property or a method result, as raw little-endian bytes.
+        Same parameters as read_datatype_attribute. The array dtype (NumPy notation, e.g. '<f8') and 
+        shape (comma separated) are returned in the X-Array-Dtype and X-Array-Shape headers.
+        The body is compressed with gzip or deflate, when accepted by the client.
+        """
+        cache_key = self._datatype_cache_key(entity_gid, dataset_name, flatten, FORMAT_BINARY, kwargs)
+        self._validate_cache(self._compute_etag(*cache_key))
+        cached = PAYLOADS_CACHE.get(cache_key)
+        if cached is None:
+            try:
+                numpy_array = self._to_transport_array(self._read_datatype_array(entity_gid, dataset_name, **kwargs))
+            except Exception, excep:
+                self._drop_cache_headers()
+                self.logger.error("Could not retrieve complex entity field:" + str(entity_gid) + "/" + str(dataset_name))
+                self.logger.exception(excep)
+                raise cherrypy.HTTPError(500, "Could not read binary data for " + str(dataset_name))
+            shape = numpy_array.shape
+            if cache_key[2]:
+                shape = (numpy_array.size,)
+            cached = (numpy_array.tostring(), numpy_array.dtype.str, ','.join(str(dim) for dim in shape))
+            PAYLOADS_CACHE.put(cache_key, cached, len(cached[0]))
+        body, dtype, shape = cached
+        headers = cherrypy.response.headers
+        headers['Content-Type'] = 'application/octet-stream'
+        headers['X-Array-Dtype'] = dtype
+        headers['X-Array-Shape'] = shape
+        return self._encode_binary_body(body)
+    
+    
+    @staticmethod
+    def _datatype_cache_key(entity_gid, dataset_name, flatten, data_format, kwargs):
+        """
+        Build the cache key for a DataType attribute, starting with the DataType GID (for invalidation).
+        """
+        flatten = flatten == True or flatten == "True"
+        return entity_gid, dataset_name, flatten, data_format, tuple(sorted(kwargs.iteritems()))
+    
+    
+    @staticmethod
+    def _compute_etag(*cache_key):
+        """
+        :return: strong ETag, derived from the cache key of a response.
+        """
+        return '"%s"' % hashlib.sha1(repr(cache_key)).hexdigest()
+    
+    
+    @staticmethod
+    def _validate_cache(etag, last_modified=None):
+        """
+        Set ETag (and Last-Modified) and Cache-Control headers on the current response.
+        When the client already has this exact response, a 304 (Not Modified) redirect is raised.
+        """
+        headers = cherrypy.response.headers
+        headers['ETag'] = etag
+        headers['Cache-Control'] = 'private, max-age=%d' % cfg.WEB_CACHE_MAX_AGE
+        if last_modified is not None:
+            headers['Last-Modified'] = formatdate(last_modified, usegmt=True)
+        cptools.validate_etags()
+        if last_modified is not None and 'If-None-Match' not in cherrypy.request.headers:
+            cptools.validate_since()
+    
+    
+    @staticmethod
+    def _drop_cache_headers():
+        """
+        Make sure a failed response does not get cached by the browser.
+        """
+        headers = cherrypy.response.headers
+        for header_name in ('ETag', 'Last-Modified'):
+            headers.pop(header_name, None)
+        headers['Cache-Control'] = 'no-cache'
+    
+    
+    def _read_datatype_array(self, entity_gid, dataset_name, **kwargs):
+        """
+        Read a property or a method result from a DataType.
+        No copy is made here: properties come from the DataType cache, and methods 
+        (e.g. read_data_page) slice directly in H5.
+        """
+        self.logger.debug("Starting to read HDF5: "+ entity_gid + "/" + dataset_name + "/" + str(kwargs))
+        entity = ABCAdapter.load_entity_by_gid(entity_gid)
+        if kwargs is None or len(kwargs) < 1:
+            return numpy.asarray(getattr(entity, dataset_name))
+        return numpy.asarray(getattr(entity, dataset_name)(**kwargs))
+    
+    
+    @staticmethod
+    def _to_transport_array(numpy_array):
+        """
+        Prepare an array for binary transport towards JS typed arrays: C-contiguous, little-endian,
+        with no 64 bits integers (not supported by typed arrays) and no boolean type.
+        """
+        numpy_array = numpy.ascontiguousarray(numpy_array)
+        if numpy_array.dtype.kind == 'b':
+            numpy_array = numpy_array.astype(numpy.uint8)
+        elif numpy_array.dtype.kind in 'iu' and numpy_array.dtype.itemsize == 8:
+            if numpy_array.size == 0 or (numpy_array.min() >= -2 ** 31 and numpy_array.max() < 2 ** 31):
+                numpy_array = numpy_array.astype(numpy.int32)
+            else:
+                numpy_array = numpy_array.astype(numpy.float64)
+        elif numpy_array.dtype.kind not in 'iuf':
+            raise ValueError("Only numeric arrays can be sent in binary format, not %s" % str(numpy_array.dtype))
+        little_endian = numpy_array.dtype.newbyteorder('<')
+        if numpy_array.dtype != little_endian:
+            numpy_array = numpy_array.astype(little_endian)
+        return numpy_array
+    
+    
+    @staticmethod
+    def _encode_binary_body(body):
+        """
+        Compress a binary response body with gzip or deflate, when the client accepts it.
+        (CherryPy gzip tool is only configured for text responses).
+        """
+        accepted = [element.value.lower() for element in cherrypy.request.headers.elements('Accept-Encoding')
+                    if element.qvalue > 0]
+        cherrypy.response.headers['Vary'] = 'Accept-Encoding'
+        if 'gzip' in accepted:
+            buffer_ = StringIO()
+            gzip_file = gzip.GzipFile(mode='wb', fileobj=buffer_, compresslevel=BINARY_COMPRESSION_LEVEL)
+            gzip_file.write(body)
+            gzip_file.close()
+            cherrypy.response.headers['Content-Encoding'] = 'gzip'
+            return buffer_.getvalue()
+        if 'deflate' in accepted:
+            cherrypy.response.headers['Content-Encoding'] = 'deflate'
+            return zlib.compress(body, BINARY_COMPRESSION_LEVEL)
+        return body
 
             
     @cherrypy.expose
@@ -570,7 +739,7 @@ class FlowController(base.BaseController):
    
    
     @cherrypy.expose
-    @using_template("flow/genericAdapterFormFields")
+    @using_template("flow/genericAdapterFormFields", base.template_vars_key(*ADAPTER_FRAGMENT_VARS))
     @logged()
     def get_simple_adapter_interface(self, algo_group_id, parent_div='', is_uploader=False):
         """
@@ -585,7 +754,8 @@ class FlowController(base.BaseController):
         
     
     @cherrypy.expose
-    @using_template("flow/full_adapter_interface")
+    @using_template("flow/full_adapter_interface", 
+                    base.template_vars_key('submitLink', 'displayControl', 'figure_exportable', *ADAPTER_FRAGMENT_VARS))
     @logged()
     def getadapterinterface(self, project_id, algo_group_id, export_png_available, back_page=None):
         """
@@ -757,16 +757,28 @@ class ProjectController(bc.BaseController):
     def downloadproject(self, project_id):
         """
         Export the data from a whole project.
+        The ZIP is streamed to the client while it is built, nothing is written on disk.
         """
         current_project = self.project_service.find_project(project_id)
         export_mng = ExportManager()
-        export_file = export_mng.export_project(current_project)
-        
-        # Register export file for delete when download complete
-        # We force parent folder deletion because export process generated it.
-        self.mark_file_for_delete(export_file, True)
-        
-        return serve_file(export_file, "application/x-download", "attachment")
+        zip_file_name, zip_content = export_mng.stream_project(current_project)
+        cherrypy.response.headers['Content-Type'] = "application/x-download"
+        cherrypy.response.headers['Content-Disposition'] = 'attachment; filename="%s"' % zip_file_name
+        return zip_content
+    downloadproject._cp_config = {'response.stream': True}
+    
+    
+    @cherrypy.expose
+    @logged()
+    def exportprogress(self, project_id):
+        """
+        Progress of the export currently running for a project, as JSON: 
+        {'running': bool, 'processed': bytes, 'total': bytes}
+        """
+        progress = ExportManager.get_export_progress(int(project_id))
+        if progress is None:
+            return json.dumps({'running': False})
+        return json.dumps({'running': True, 'processed': progress[0], 'total': progress[1]})
 
 
     #methods related to data structure - graph
@@ -29,6 +29,7 @@ import json
 
 from tvb.datatypes.surfaces import LocalConnectivity
 from tvb.core.adapters.abcadapter import ABCAdapter
+from tvb.core.traits.types_mapped import SparseMatrix
 import tvb.interfaces.web.controllers.basecontroller as base
 from tvb.interfaces.web.controllers.basecontroller import using_template
 from tvb.interfaces.web.controllers.userscontroller import logged
@@ -256,7 +257,8 @@ class LocalConnectivityController(SpatioTemporalController):
         surface = selected_local_conn.surface
         triangle_index = int(selected_triangle)
         vertex_index = int(surface.triangles[triangle_index][0])
-        picked_data = list(selected_local_conn.matrix[vertex_index].toarray().squeeze())
+        ## Read only the row of the picked vertex, not the full (cortex-sized) matrix.
+        picked_data = list(SparseMatrix.read_sparse_vector(selected_local_conn, 'matrix', vertex_index))
         chunk_size = surface.SPLIT_MAX_SIZE
         buffer_size = surface.SPLIT_BUFFER_SIZE
         result = []
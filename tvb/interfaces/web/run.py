@@ -54,7 +54,7 @@ from tvb.core.services.settingsservice import SettingsService
 from tvb.core.services.initializer import initialize, reset
 from tvb.core.services.exceptions import InvalidSettingsException
 from tvb.interfaces.web.request_handler import RequestHandler
-from tvb.interfaces.web.controllers.basecontroller import BaseController
+from tvb.interfaces.web.controllers.basecontroller import BaseController, preload_templates
 from tvb.interfaces.web.controllers.userscontroller import UserController
 from tvb.interfaces.web.controllers.help.helpcontroller import HelpController
 from tvb.interfaces.web.controllers.project.projectcontroller import ProjectController
@@ -111,6 +111,7 @@ def init_cherrypy(arguments = None):
     cherrypy.tree.mount(SurfaceStimulusController(), "/spatial/stimulus/surface/", config= CONFIGUER)
     cherrypy.tree.mount(LocalConnectivityController(), "/spatial/localconnectivity/", config= CONFIGUER)
     cherrypy.config.update(CONFIGUER)
+    preload_templates()
     
     #----------------- Register additional request handlers -----------------
     # This tool checks for MAX upload size
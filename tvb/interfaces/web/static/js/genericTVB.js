@@ -305,7 +305,31 @@ function selectProject(projectId, formId) {
 }
 
 function exportProject(projectId) {
-	window.location = "/project/downloadproject/?project_id=" + projectId
+	window.location = "/project/downloadproject/?project_id=" + projectId;
+	setTimeout(function() { _displayExportProgress(projectId, false, 5); }, 1000);
+}
+
+/**
+ * Poll the server for the progress of a project export (the archive is built while it is downloaded).
+ */
+function _displayExportProgress(projectId, wasRunning, retries) {
+	$.ajax({ async : true,
+			 type: 'GET',
+			 url: "/project/exportprogress/" + projectId,
+			 success: function(r) {
+				 var progress = $.parseJSON(r);
+				 if (progress.running) {
+					 var percent = progress.total ? Math.floor(100 * progress.processed / progress.total) : 0;
+					 displayMessage("Exporting project: " + percent + "% done.", "infoMessage");
+					 setTimeout(function() { _displayExportProgress(projectId, true, 0); }, 2000);
+				 } else if (wasRunning) {
+					 displayMessage("Project export finished.", "infoMessage");
+				 } else if (retries > 0) {
+					 // Export did not start yet.
+					 setTimeout(function() { _displayExportProgress(projectId, false, retries - 1); }, 2000);
+				 }
+			 }
+	});
 }
 
 // ---------------END PROJECT ------------------------
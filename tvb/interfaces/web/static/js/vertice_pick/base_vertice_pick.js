@@ -743,7 +743,7 @@ function BASE_PICK_initBuffers(urlVertices, urlNormals, urlTriangles) {
     var indexes = HLPR_getDataBuffers(gl, urlTriangles, false, true);
     var result = [];
     for (var i=0; i< urlVertices.length; i++) {
-            var verticesSliceData = HLPR_readJSONfromFile(urlVertices[i]);
+            var verticesSliceData = HLPR_readArrayFromURL(urlVertices[i]);
             verticesPoints.push(verticesSliceData);
             var verticesBuffer = HLPR_createWebGlBuffer(gl, verticesSliceData, false, false);
 
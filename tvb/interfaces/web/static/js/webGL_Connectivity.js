@@ -101,6 +101,68 @@ function HLPR_readJSONfromFile(fileName, staticFiles) {
     return jQuery.parseJSON(oxmlhttp.responseText);
 }
 
+/**
+ * JS typed array constructor, for each NumPy dtype returned by the binary transport.
+ */
+var HLPR_TYPED_ARRAYS = {'<f4': Float32Array, '<f8': Float64Array, '<i4': Int32Array, '<u4': Uint32Array,
+                         '<i2': Int16Array, '<u2': Uint16Array, '|i1': Int8Array, '|u1': Uint8Array};
+
+/**
+ * Read a DataType attribute through the binary transport (raw little-endian buffer, with dtype and
+ * shape in the response headers) and return it as a JS typed array.
+ * Two dimensional arrays are returned as an Array of typed-array rows (views over the same buffer).
+ * Returns null when the URL is not a DataType attribute URL, or the binary read failed, 
+ * so that callers can fall back on HLPR_readJSONfromFile.
+ */
+function HLPR_readTypedArrayFromURL(dataURL) {
+    var binaryURL = dataURL.replace('/read_datatype_attribute/', '/read_binary_datatype_attribute/');
+    if (binaryURL == dataURL) {
+        return null;
+    }
+    var request = null;
+    try {
+        request = new XMLHttpRequest();
+        request.open("GET", binaryURL, false);
+        // Synchronous requests can not ask for an ArrayBuffer, thus read bytes with a user-defined charset.
+        request.overrideMimeType("text/plain; charset=x-user-defined");
+        request.send(null);
+    } catch(e) {
+        return null;
+    }
+    var ArrayType = HLPR_TYPED_ARRAYS[request.getResponseHeader("X-Array-Dtype")];
+    if (request.status != 200 || ArrayType == undefined) {
+        return null;
+    }
+    var text = request.responseText;
+    var bytes = new Uint8Array(text.length);
+    for (var i = 0; i < text.length; i++) {
+        bytes[i] = text.charCodeAt(i) & 0xff;
+    }
+    var data = new ArrayType(bytes.buffer);
+    var shape = (request.getResponseHeader("X-Array-Shape") || "").split(",");
+    if (shape.length == 2) {
+        var nrRows = parseInt(shape[0]);
+        var nrColumns = parseInt(shape[1]);
+        var rows = [];
+        for (var row = 0; row < nrRows; row++) {
+            rows.push(data.subarray(row * nrColumns, (row + 1) * nrColumns));
+        }
+        return rows;
+    }
+    return data;
+}
+
+/**
+ * Read a numeric DataType attribute, as typed array when possible, otherwise from JSON.
+ */
+function HLPR_readArrayFromURL(dataURL) {
+    var result = HLPR_readTypedArrayFromURL(dataURL);
+    if (result == null) {
+        result = HLPR_readJSONfromFile(dataURL);
+    }
+    return result;
+}
+
 /**
  * Create vertices, normals and triangles buffers for a cube, around point p.
  * @param {Object} p center of the cube. (expected [x, y, z] )
@@ -188,7 +250,7 @@ function HLPR_bufferAtPoint(glcontext, p) {
 function HLPR_getDataBuffers(glcontext, data_url_list, staticFiles, isIndex) {
     var result = [];
     for (var i = 0; i < data_url_list.length; i++) {
-        var data_json = HLPR_readJSONfromFile(data_url_list[i], staticFiles);
+        var data_json = staticFiles ? HLPR_readJSONfromFile(data_url_list[i], true) : HLPR_readArrayFromURL(data_url_list[i]);
         var buffer = HLPR_createWebGlBuffer(glcontext, data_json, isIndex, staticFiles);
         result.push(buffer);
         data_json = null;
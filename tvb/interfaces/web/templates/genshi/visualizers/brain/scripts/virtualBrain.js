@@ -837,7 +837,7 @@ function createWebGlBuffers(dataList) {
 function readFloatData(data_url_list, staticFiles) {
     var result = [];
     for (var i = 0; i < data_url_list.length; i++) {
-        var data_json = HLPR_readJSONfromFile(data_url_list[i], staticFiles);
+        var data_json = staticFiles ? HLPR_readJSONfromFile(data_url_list[i], true) : HLPR_readArrayFromURL(data_url_list[i]);
         if (staticFiles) {
             for (var j = 0; j < data_json.length; j++) {
                 data_json[j] = parseFloat(data_json[j]);
@@ -82,6 +82,38 @@ function readDataChannelURL(baseDatatypeMethodURL, fromIdx, toIdx, stateVariable
 	var baseURL = readDataPageURL(baseDatatypeMethodURL, fromIdx, toIdx, stateVariable, mode, step);
 	return baseURL.replace('read_data_page', 'read_channels_page') + ';channels_list=' + channels;
 }
+
+/*
+ * Min / max envelope of the time window [fromIdx, toIdx), to be drawn on pixelWidth points.
+ * The response has the shape [2, points, channels]; see MappedType.read_data_envelope.
+ */
+function readDataEnvelopeURL(baseDatatypeMethodURL, fromIdx, toIdx, pixelWidth, stateVariable, mode) {
+	if (stateVariable == undefined || stateVariable == null) {
+		stateVariable = 0;
+	}
+	if (mode == undefined || mode == null) {
+		mode = 0;
+	}
+	return baseDatatypeMethodURL + '/read_data_envelope/False?from_idx=' + fromIdx + ";to_idx=" + toIdx + ";pixel_width=" + pixelWidth + ";specific_slices=[null," + stateVariable + ",null," + mode +"]";
+}
+
+/*
+ * Same rule as tvb.core.entities.file.envelopes.select_level: the coarsest envelope level 
+ * still giving one point per pixel. Level 0 means full resolution data.
+ * maxLevel is read once per DataType, from baseDatatypeMethodURL + '/get_envelope_levels/False'
+ * (0 when no envelopes were stored while writing the DataType).
+ */
+function selectEnvelopeLevel(windowLength, pixelWidth, maxLevel) {
+	var firstLevel = 2;
+	if (maxLevel < firstLevel || windowLength <= 2 * pixelWidth) {
+		return 0;
+	}
+	var level = firstLevel;
+	while (level < maxLevel && Math.ceil(windowLength / Math.pow(2, level + 1)) >= pixelWidth) {
+		level++;
+	}
+	return level;
+}
  
 // -------------------------------------------------------------
 //              Datatype methods mappings end here
@@ -70,8 +70,20 @@ function GFUNC_recomputeMinMaxW() {
 }
 
 function GFUNC_initTractsAndWeights(fileWeights, fileTracts) {
-	GVAR_interestAreaVariables[1]['values'] = HLPR_readJSONfromFile(fileWeights);
-	GVAR_interestAreaVariables[2]['values'] = HLPR_readJSONfromFile(fileTracts);
+	GVAR_interestAreaVariables[1]['values'] = HLPR_readArrayFromURL(fileWeights);
+	GVAR_interestAreaVariables[2]['values'] = HLPR_readArrayFromURL(fileTracts);
+}
+
+/**
+ * Copy a matrix into nested JS Arrays. Rows read through the binary transport are typed arrays,
+ * which $.toJSON would serialize as {"0": .., "1": ..} objects instead of lists.
+ */
+function GFUNC_toPlainMatrix(matrix) {
+	var result = [];
+	for (var i = 0; i < matrix.length; i++) {
+		result.push(Array.prototype.slice.call(matrix[i]));
+	}
+	return result;
 }
 
 
@@ -562,7 +562,8 @@ function colorTable() {
 
 function saveChanges() {
     // clone the weights matrix
-    $("#newWeightsId").val($.toJSON(GVAR_interestAreaVariables[GVAR_selectedAreaType]['values']));
+    var newWeights = GFUNC_toPlainMatrix(GVAR_interestAreaVariables[GVAR_selectedAreaType]['values']);
+    $("#newWeightsId").val($.toJSON(newWeights));
     $("#interestAreaNodeIndexesId").val($.toJSON(GVAR_interestAreaNodeIndexes));
     $("#experimentFormId").submit();
 }
@@ -168,6 +168,10 @@ var tsModes = [0, 0, 0];
 var tsStates = [0, 0, 0];
 var longestChannelIndex = 0;
 var channelLengths = []
+// The envelope level used for reading data pages (see selectEnvelopeLevel), 0 for full resolution data.
+// With a level L > 0, every window of 2^L time points is drawn as two points (its minimum and maximum), 
+// and all lengths (page, visible points, total length) are counted in drawn points.
+var AG_envelopeLevel = 0;
 
 window.onresize = function(event) {
     if (isDoubleView == false && isSmallPreview == false) {
@@ -213,9 +217,12 @@ function drawAnimatedChart(longestChannelLength, channelsPerSet, baseURLS, pageS
     if (AG_numberOfVisiblePoints > maxChannelLength) {
     	AG_numberOfVisiblePoints = maxChannelLength;
     }
+    AG_envelopeLevel = AG_selectEnvelopeLevel($('#EEGcanvasDiv').width());
+    maxChannelLength = AG_toDrawnPoints(maxChannelLength);
+    AG_numberOfVisiblePoints = AG_toDrawnPoints(AG_numberOfVisiblePoints);
     targetVerticalLinePosition = AG_numberOfVisiblePoints * procentualLinePosition;
     totalNumberOfChannels = noOfChannels;
-    totalTimeLength = totalLength;
+    totalTimeLength = AG_toDrawnPoints(totalLength);
     if (nan_value_found == "True") {
         nanValueFound = true;
     }
@@ -240,6 +247,86 @@ function drawAnimatedChart(longestChannelLength, channelsPerSet, baseURLS, pageS
 }
 
 
+/**
+ * Choose the envelope level for all the displayed time-series: the coarsest one still giving 
+ * one point per pixel of the canvas, for the visible time window (see selectEnvelopeLevel).
+ * The level should also divide the page size, for pages to start on envelope windows.
+ */
+function AG_selectEnvelopeLevel(canvasWidth) {
+	if (baseDataURLS.length == 0) {
+		return 0;
+	}
+	var level = Number.MAX_VALUE;
+	for (var i = 0; i < baseDataURLS.length; i++) {
+		var maxLevel = HLPR_readJSONfromFile(baseDataURLS[i] + '/get_envelope_levels/False');
+		if (maxLevel == undefined || maxLevel == null) {
+			maxLevel = 0;
+		}
+		level = Math.min(level, selectEnvelopeLevel(AG_numberOfVisiblePoints, canvasWidth, maxLevel));
+	}
+	while (level > 0 && dataPageSize % Math.pow(2, level) != 0) {
+		level--;
+	}
+	// Level 1 is not stored.
+	if (level < 2) {
+		return 0;
+	}
+	return level;
+}
+
+/**
+ * Number of drawn points for a number of time points, at the current envelope level.
+ */
+function AG_toDrawnPoints(timeLength) {
+	if (AG_envelopeLevel == 0) {
+		return timeLength;
+	}
+	return 2 * Math.ceil(timeLength / Math.pow(2, AG_envelopeLevel));
+}
+
+/**
+ * URL for reading the page [fromIdx, toIdx) of time points of a time-series, at the current envelope level.
+ */
+function AG_readDataPageURL(dataSetIndex, fromIdx, toIdx) {
+	if (AG_envelopeLevel == 0) {
+		return readDataPageURL(baseDataURLS[dataSetIndex], fromIdx, toIdx, tsStates[dataSetIndex], tsModes[dataSetIndex]);
+	}
+	var pixelWidth = (toIdx - fromIdx) / Math.pow(2, AG_envelopeLevel);
+	return readDataEnvelopeURL(baseDataURLS[dataSetIndex], fromIdx, toIdx, pixelWidth, tsStates[dataSetIndex], tsModes[dataSetIndex]);
+}
+
+/**
+ * Data read from AG_readDataPageURL, as an array of drawn points: [minimum, maximum] for every envelope window.
+ */
+function AG_toDrawnData(data) {
+	if (AG_envelopeLevel == 0) {
+		return data;
+	}
+	var result = [];
+	for (var i = 0; i < data[0].length; i++) {
+		result.push(data[0][i]);
+		result.push(data[1][i]);
+	}
+	return result;
+}
+
+/**
+ * Times of the drawn points, from the times of a page: the start and the middle of every envelope window.
+ */
+function AG_toDrawnTimes(times) {
+	if (AG_envelopeLevel == 0) {
+		return times;
+	}
+	var windowLength = Math.pow(2, AG_envelopeLevel);
+	var result = [];
+	for (var i = 0; i < times.length; i += windowLength) {
+		result.push(times[i]);
+		result.push(times[Math.min(i + windowLength / 2, times.length - 1)]);
+	}
+	return result;
+}
+
+
 function AG_createYAxisDictionary(nr_channels) {
 	/*
 	 * Create FLOT specific options dictionary for the y axis, with correct labels and positioning for 
@@ -336,8 +423,8 @@ function submitSelectedChannels(isEndOfData) {
 		
 		var offset = 0;
         for (var i = 0; i < nrOfPagesSet.length; i++) {
-        	var dataURL = readDataPageURL(baseDataURLS[i], 0, dataPageSize, tsStates[i], tsModes[i]);
-            var data = HLPR_readJSONfromFile(dataURL);
+        	var dataURL = AG_readDataPageURL(i, 0, dataPageSize);
+            var data = AG_toDrawnData(HLPR_readJSONfromFile(dataURL));
             var result = parseData(data, i);
             selectedChannels = getDisplayedChannels(result, offset);
             offset = offset + result.length;
@@ -790,9 +877,9 @@ function AG_readFileDataAsynchronous(nrOfPages, noOfChannelsPerSet, currentFileI
         AG_readFileDataAsynchronous(nrOfPages, noOfChannelsPerSet, currentFileIndex, maxChannelLength, dataSetIndex + 1);
     } else {
         $.ajax({
-            url: readDataPageURL(baseDataURLS[dataSetIndex], currentFileIndex * dataPageSize, (currentFileIndex + 1) * dataPageSize, tsStates[dataSetIndex], tsModes[dataSetIndex]),
+            url: AG_readDataPageURL(dataSetIndex, currentFileIndex * dataPageSize, (currentFileIndex + 1) * dataPageSize),
             success: function(data) {
-            	data = $.parseJSON(data);
+            	data = AG_toDrawnData($.parseJSON(data));
                 var result = parseData(data, dataSetIndex);
                 // nextData = nextData.concat(result);
                 nextData.push(result);
@@ -842,12 +929,12 @@ function readTimeData(fileIndex, asyncRead) {
             $.ajax({
                 url: timeSetUrls[longestChannelIndex][fileIndex],
                 success: function(data) {
-                    nextTimeData = $.parseJSON(data);
+                    nextTimeData = AG_toDrawnTimes($.parseJSON(data));
                     isNextTimeDataLoaded = true;
                 }
             });
         } else {
-            nextTimeData = HLPR_readJSONfromFile(timeSetUrls[longestChannelIndex][fileIndex]);
+            nextTimeData = AG_toDrawnTimes(HLPR_readJSONfromFile(timeSetUrls[longestChannelIndex][fileIndex]));
             isNextTimeDataLoaded = true;
         }
     }
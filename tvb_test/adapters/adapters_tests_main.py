@@ -33,6 +33,7 @@ from tvb_test.adapters.uploaders import nifti_importer_test
 from tvb_test.adapters.uploaders import gifti_importer_test
 from tvb_test.adapters.uploaders import sensors_importer_test
 from tvb_test.adapters.uploaders import region_mapping_importer_test
+from tvb_test.adapters.uploaders import zip_surface_importer_test
 from tvb_test.adapters.visualizers import visualizers_tests_main
 
 
@@ -50,6 +51,7 @@ def suite():
     test_suite.addTest(gifti_importer_test.suite())
     test_suite.addTest(sensors_importer_test.suite())
     test_suite.addTest(region_mapping_importer_test.suite())
+    test_suite.addTest(zip_surface_importer_test.suite())
     test_suite.addTest(visualizers_tests_main.suite())
     return test_suite
 
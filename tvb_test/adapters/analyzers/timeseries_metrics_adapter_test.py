@@ -65,9 +65,9 @@ class TimeSeriesMetricsAdapterTest(TransactionalTestCase):
         FilesHelper().remove_project_structure(self.test_project.name)
         cfg.CURRENT_DIR = self.old_config_file
         
-    def test_adapter_launch(self):
+    def _store_time_series(self):
         """
-        Test that the adapters launches and succesfully generates a datatype measure entry.
+        Store a dummy 4D TimeSeriesRegion, and return it as loaded from DB.
         """
         meta = {DataTypeMetaData.KEY_SUBJECT : "John Doe", DataTypeMetaData.KEY_STATE : "RAW"}
         _, algo_group = FlowService().get_algorithm_by_module_and_class(SIMULATOR_MODULE, SIMULATOR_CLASS)
@@ -99,13 +99,47 @@ class TimeSeriesMetricsAdapterTest(TransactionalTestCase):
         adapter_instance = StoreAdapter([dummy_time_series])
         OperationService().initiate_prelaunch(self.operation, adapter_instance, {})
         
-        dummy_time_series = dao.get_generic_entity(dummy_time_series.__class__, dummy_time_series.gid, 'gid')[0]
+        return dao.get_generic_entity(dummy_time_series.__class__, dummy_time_series.gid, 'gid')[0]
+        
+        
+    def test_adapter_launch(self):
+        """
+        Test that the adapters launches and succesfully generates a datatype measure entry.
+        """
+        dummy_time_series = self._store_time_series()
         ts_metric_adapter = TimeseriesMetricsAdapter()
         resulted_metric = ts_metric_adapter.launch(dummy_time_series)
         self.assertTrue(isinstance(resulted_metric, DatatypeMeasure), "Result should be a datatype measure.")
         self.assertTrue(len(resulted_metric.metrics) == len(ts_metric_adapter.available_algorithms.keys()),
                         "A result should have been generated for every metric.")
         
+        
+    def test_metrics_can_not_change_input(self):
+        """
+        Test that a metric changing its input in place does not alter the input of the metrics computed after it.
+        """
+        dummy_time_series = self._store_time_series()
+        ts_metric_adapter = TimeseriesMetricsAdapter()
+        ts_metric_adapter.available_algorithms = {'InPlace1': _InPlaceMetric, 'InPlace2': _InPlaceMetric}
+        resulted_metric = ts_metric_adapter.launch(dummy_time_series)
+        self.assertEqual({'InPlace1': 10000.0, 'InPlace2': 10000.0}, resulted_metric.metrics)
+        
+        
+
+class _InPlaceMetric(object):
+    """
+    Metric which (wrongly) clears its input in place, after computing its maximum.
+    """
+    accept_filter = None
+    
+    def __init__(self, time_series):
+        self.time_series = time_series
+        
+    def evaluate(self):
+        result = float(self.time_series.data.max())
+        self.time_series.data[:] = 0
+        return result
+        
 
 def suite():
     """
@@ -24,6 +24,7 @@
 import unittest
 import os
 import numpy as numpy
+import nibabel as nib
 from tvb.core.entities.file.fileshelper import FilesHelper
 from tvb_test.datatypes.datatypes_factory import DatatypesFactory
 from tvb_test.core.base_testcase import TransactionalTestCase
@@ -113,6 +114,16 @@ class NIFTIImporterTest(TransactionalTestCase):
         self.assertTrue(volume is not None)
         self.assertTrue(numpy.equal(self.DEFAULT_ORIGIN, volume.origin).all())
         self.assertEquals("mm", volume.voxel_unit)
+        
+    def test_import_demo_nii_values(self):
+        """
+            Data imported in blocks of time frames should match the image as read by nibabel.
+        """
+        time_series = self._import(self.TVB_NII_FILE)
+        expected_data = nib.load(self.TVB_NII_FILE).get_data()
+        imported_data = time_series.get_data('data')
+        self.assertEqual(expected_data.shape[3], imported_data.shape[0])
+        self.assertTrue(numpy.allclose(numpy.rollaxis(expected_data, 3), imported_data))
     
     def test_import_nii_without_time_dimension(self):
         """
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Tests for the ZIP Surface importer.
+"""
+import os
+import shutil
+import unittest
+import zipfile
+import numpy
+from StringIO import StringIO
+from tvb.basic.config.settings import TVBSettings as cfg
+from tvb.core.entities.file.fileshelper import FilesHelper
+from tvb.adapters.uploaders.zip_surface_importer import ZIPSurfaceImporter
+from tvb.datatypes.surfaces_data import CORTICAL
+from tvb.core.adapters.exceptions import LaunchException
+from tvb_test.datatypes.datatypes_factory import DatatypesFactory
+from tvb_test.core.base_testcase import TransactionalTestCase
+
+
+
+class ZIPSurfaceImporterTest(TransactionalTestCase):
+    """
+    Unit-tests for ZIP Surface importer.
+    """
+    
+    ## Left hemisphere members are plain matrices, right ones have comment lines (or no content at all).
+    MEMBERS = [("lh_vertices.txt", "0.0 0.0 0.0\n1.5 0.0 0.0\n0.0 1.5 0.0\n1.5 1.5 0.25\n"),
+               ("lh_normals.txt", "0 0 1\n0 0 1\n0 0 1\n0.1 0 0.9\n"),
+               ("lh_triangles.txt", "0 1 2\n1 3 2\n"),
+               ("rh_vertices.txt", "# right hemisphere\n10.0 0.0 0.0\n11.5 0.0 0.0\n# last vertex\n10.0 1.5 0.0\n"),
+               ("rh_normals.txt", "# normals\n0 0 -1\n0 0 -1\n0 0 -1\n"),
+               ("rh_triangles.txt", "")]
+    
+    
+    def setUp(self):
+        self.datatypeFactory = DatatypesFactory()
+        self.test_project = self.datatypeFactory.get_project()
+        self.temp_folder = os.path.join(cfg.TVB_TEMP_FOLDER, "test_zip_surface")
+        if not os.path.exists(self.temp_folder):
+            os.makedirs(self.temp_folder)
+        self.zip_path = os.path.join(self.temp_folder, "surface.zip")
+        zip_archive = zipfile.ZipFile(self.zip_path, 'w', zipfile.ZIP_DEFLATED)
+        for file_name, content in self.MEMBERS:
+            zip_archive.writestr(file_name, content)
+        zip_archive.close()
+        
+        
+    def tearDown(self):
+        """
+        Clean-up tests data
+        """
+        shutil.rmtree(self.temp_folder)
+        FilesHelper().remove_project_structure(self.test_project.name)
+        
+        
+    def _load_expected(self, token, dtype):
+        """
+        Read with numpy.loadtxt, from all members with the given token, skipping empty ones.
+        """
+        return [numpy.loadtxt(StringIO(content), dtype=dtype) for file_name, content in self.MEMBERS
+                if token in file_name and content]
+        
+        
+    def _get_expected_surface(self):
+        """
+        Vertices, normals and triangles (shifted with the number of vertices in previous files), 
+        as read with numpy.loadtxt.
+        """
+        vertices = self._load_expected(ZIPSurfaceImporter.VERTICES_TOKEN, numpy.float32)
+        normals = self._load_expected(ZIPSurfaceImporter.NORMALS_TOKEN, numpy.float32)
+        triangles = self._load_expected(ZIPSurfaceImporter.TRIANGLES_TOKEN, numpy.int32)
+        offsets = numpy.cumsum([0] + [len(current_vertices) for current_vertices in vertices])
+        triangles = [current_triangles.astype(numpy.int64) + offsets[i] for i, current_triangles in enumerate(triangles)]
+        return (numpy.concatenate(vertices).astype(numpy.float64), 
+                numpy.concatenate(normals).astype(numpy.float64),
+                numpy.concatenate(triangles))
+        
+        
+    def test_process_files(self):
+        """
+        Members of a two hemispheres archive are read as numpy.loadtxt would.
+        """
+        zip_archive = zipfile.ZipFile(self.zip_path)
+        try:
+            file_names = zip_archive.namelist()
+            result = ZIPSurfaceImporter._process_files(zip_archive, 
+                                [name for name in file_names if ZIPSurfaceImporter.VERTICES_TOKEN in name],
+                                [name for name in file_names if ZIPSurfaceImporter.NORMALS_TOKEN in name],
+                                [name for name in file_names if ZIPSurfaceImporter.TRIANGLES_TOKEN in name])
+        finally:
+            zip_archive.close()
+        
+        for expected_array, actual_array in zip(self._get_expected_surface(), result):
+            self.assertEqual(expected_array.dtype, actual_array.dtype)
+            self.assertEqual(expected_array.shape, actual_array.shape)
+            self.assertTrue(numpy.equal(expected_array, actual_array).all())
+            
+            
+    def test_launch(self):
+        """
+        Import a two hemispheres archive, and check the resulting Surface.
+        """
+        importer = ZIPSurfaceImporter()
+        importer.storage_path = FilesHelper().get_project_folder(self.test_project, 
+                                                                 str(self.datatypeFactory.get_operation().id))
+        surface = importer.launch(self.zip_path, CORTICAL, True)
+        
+        vertices, normals, triangles = self._get_expected_surface()
+        self.assertTrue(numpy.equal(vertices, surface.vertices).all())
+        self.assertTrue(numpy.equal(normals, surface.vertex_normals).all())
+        self.assertTrue(numpy.equal(triangles, surface.triangles).all())
+        
+        
+    def test_launch_wrong_file(self):
+        """
+        A file which is not a ZIP archive is rejected.
+        """
+        importer = ZIPSurfaceImporter()
+        self.assertRaises(LaunchException, importer.launch, os.path.abspath(__file__), CORTICAL, True)
+    
+    
+    
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(ZIPSurfaceImporterTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
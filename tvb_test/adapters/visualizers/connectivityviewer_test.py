@@ -21,7 +21,9 @@
 """
 .. moduleauthor:: Bogdan Neacsa <bogdan.neacsa@codemart.ro>
 """
+import json
 import unittest
+import numpy
 from tvb.core.entities.file.fileshelper import FilesHelper
 from tvb_test.datatypes.datatypes_factory import DatatypesFactory
 from tvb_test.core.base_testcase import TransactionalTestCase
@@ -75,6 +77,23 @@ class ConnectivityViewerTest(TransactionalTestCase):
                          'leftHemisphereJson', 'connectivity_entity', 'bothHemisphereJson']
         for key in expected_keys:
             self.assertTrue(key in result)
+            
+            
+    def test_submit_connectivity(self):
+        """
+        Submit the weights the way the matrix page saves them (JSON list of lists),
+        and check that the new Connectivity holds the edited values.
+        """
+        viewer = ConnectivityViewer()
+        operation = self.datatypeFactory.get_operation()
+        viewer.storage_path = FilesHelper().get_project_folder(self.test_project, str(operation.id))
+        new_weights = numpy.array(self.connectivity.weights)
+        new_weights[0][1] = new_weights.max() + 1
+        interest_area = range(new_weights.shape[0])
+        result = viewer.submit_connectivity(self.connectivity.gid, json.dumps(new_weights.tolist()),
+                                            json.dumps(interest_area))
+        self.assertTrue(isinstance(result[0], Connectivity))
+        self.assertTrue(numpy.allclose(new_weights, result[0].weights))
     
     
 def suite():
@@ -30,6 +30,7 @@ from tvb_test.core.adapters import xmlreader_test
 from tvb_test.core.adapters import introspector_test
 from tvb_test.core.adapters import adapters_memory_usage_tests
 from tvb_test.core.adapters import abcadapter_test
+from tvb_test.core.adapters import backend_client_test
 
 def suite():
     """
@@ -40,6 +41,7 @@ def suite():
     test_suite.addTest(xmlreader_test.suite())
     test_suite.addTest(adapters_memory_usage_tests.suite())
     test_suite.addTest(abcadapter_test.suite())
+    test_suite.addTest(backend_client_test.suite())
     return test_suite
 
 
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Tests for the scheduling of operations in the backend client.
+"""
+
+import time
+import unittest
+import threading
+from tvb.core.adapters.backend_client import OperationScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+
+
+class OperationSchedulerTest(unittest.TestCase):
+    """
+    Unit tests for the local operations scheduler (no DB or worker process involved).
+    """
+    
+    def setUp(self):
+        self.scheduler = OperationScheduler(max_running=1, memory_budget=1000)
+        self.scheduler.RECHECK_INTERVAL = 0.05
+        
+        
+    def _acquire_in_thread(self, operation_id, priority, started):
+        """ Try to get a slot from a separate thread, recording the order in which slots were given."""
+        def _acquire():
+            self.scheduler.acquire_slot(operation_id, priority)
+            started.append(operation_id)
+        thread = threading.Thread(target=_acquire)
+        thread.start()
+        return thread
+    
+    
+    def _wait_for_waiting(self, count):
+        """ Wait until the given number of operations are queued."""
+        for _ in range(100):
+            status = self.scheduler.get_status()
+            if status['waiting_interactive'] + status['waiting_batch'] >= count:
+                return
+            time.sleep(0.01)
+        
+        
+    def test_interactive_before_batch(self):
+        """
+        When a slot gets free, interactive operations go before batch operations launched earlier.
+        """
+        self.assertTrue(self.scheduler.acquire_slot(1))
+        started = []
+        batch_thread = self._acquire_in_thread(2, PRIORITY_BATCH, started)
+        self._wait_for_waiting(1)
+        interactive_thread = self._acquire_in_thread(3, PRIORITY_INTERACTIVE, started)
+        self._wait_for_waiting(2)
+        status = self.scheduler.get_status()
+        self.assertEqual(1, status['waiting_batch'])
+        self.assertEqual(1, status['waiting_interactive'])
+        self.assertEqual(1, status['running'])
+        
+        self.scheduler.release(1)
+        interactive_thread.join(5)
+        self.assertEqual([3], started)
+        self.scheduler.release(3)
+        batch_thread.join(5)
+        self.assertEqual([3, 2], started)
+        self.scheduler.release(2)
+        self.assertEqual(0, self.scheduler.get_status()['running'])
+        
+        
+    def test_cancel_waiting(self):
+        """
+        An operation stopped while waiting for a slot does not get one.
+        """
+        self.assertTrue(self.scheduler.acquire_slot(1))
+        self.assertFalse(self.scheduler.acquire_slot(2, PRIORITY_BATCH, is_cancelled=lambda: True))
+        status = self.scheduler.get_status()
+        self.assertEqual(0, status['waiting_batch'])
+        self.assertEqual(1, status['running'])
+        
+        
+    def test_memory_admission(self):
+        """
+        Declared memory is reserved, and an operation waits until enough memory was released.
+        """
+        self.scheduler.max_running = 3
+        for operation_id in (1, 2, 3):
+            self.assertTrue(self.scheduler.acquire_slot(operation_id))
+        ## First operation is always admitted, as nothing else is reserved.
+        self.assertTrue(self.scheduler.admit(1, 1, 800, 0, 0))
+        self.assertTrue(self.scheduler.admit(2, 1, -1, 0, 0))
+        self.assertEqual(800, self.scheduler.get_status()['reserved_memory'])
+        self.assertFalse(self.scheduler.admit(3, 1, 500, 0, 0, is_cancelled=lambda: True))
+        
+        admitted = []
+        thread = threading.Thread(target=lambda: admitted.append(self.scheduler.admit(3, 1, 500, 0, 0)))
+        thread.start()
+        time.sleep(0.1)
+        self.assertEqual([], admitted)
+        self.scheduler.release(1)
+        thread.join(5)
+        self.assertEqual([True], admitted)
+        self.assertEqual(500, self.scheduler.get_status()['reserved_memory'])
+        
+        
+    def test_disk_admission(self):
+        """
+        Disk is checked against the quota, only for operations of the same user.
+        """
+        self.scheduler.max_running = 3
+        for operation_id in (1, 2, 3):
+            self.assertTrue(self.scheduler.acquire_slot(operation_id))
+        self.assertTrue(self.scheduler.admit(1, 1, 0, 70, 100))
+        self.assertTrue(self.scheduler.admit(2, 2, 0, 70, 100))
+        self.assertFalse(self.scheduler.admit(3, 1, 0, 70, 100, is_cancelled=lambda: True))
+        self.scheduler.release(1)
+        self.assertTrue(self.scheduler.admit(3, 1, 0, 70, 100))
+        
+        
+        
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(OperationSchedulerTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
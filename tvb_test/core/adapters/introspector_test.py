@@ -26,7 +26,9 @@ Created on Jul 21, 2011
 '''
 
 import os
+import datetime
 import unittest
+from tvb.core.entities import model
 from tvb.core.entities.storage import dao
 from tvb.core.adapters.introspector import Introspector
 from tvb.core.services.projectservice import initialize_storage
@@ -102,6 +104,35 @@ class IntrospectorTest(BaseTestCase):
         self.assertEqual(group.algorithm_param_name, "simple", "The algorithm_param_name of the group is not valid")
         self.assertEqual(group.classname, "TestGroupAdapter", "The class-name of the group is not valid")
         self.assertEqual(group.module, "tvb_test.adapters.testgroupadapter", "Group Module invalid")
+        
+        
+    def test_introspect_unchanged_module(self):
+        """
+        Introspecting without refreshing algorithms should only mark previously stored entities as valid.
+        """
+        fingerprint = self.introspector.compute_fingerprint()
+        self.assertEqual(fingerprint, self.introspector.compute_fingerprint(), "Fingerprint should be stable")
+        self.introspector.introspect(True)
+        all_categories = dao.get_algorithm_categories()
+        category_ids = [cat.id for cat in all_categories if cat.displayname == "AdaptersTest"]
+        ## A group from another module in the same category (e.g. just removed from that module) stays invalid.
+        yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+        other_group = dao.store_entity(model.AlgorithmGroup("tvb_test.other_module.removed_adapter", "RemovedAdapter", 
+                                                            category_ids[0], last_introspection_check=yesterday))
+        groups_before = dao.get_groups_by_categories(category_ids)
+        
+        check_time = datetime.datetime.now()
+        self.introspector.introspect(True, refresh_algorithms=False)
+        groups_after = dao.get_groups_by_categories(category_ids)
+        self.assertEqual(sorted([group.id for group in groups_before]), sorted([group.id for group in groups_after]))
+        non_validated = dao.get_non_validated_entities(check_time)
+        for entity in non_validated:
+            self.assertFalse(entity.__class__.__name__ in ["AlgorithmGroup", "AlgorithmCategory"] and 
+                             getattr(entity, 'fk_category', entity.id) in category_ids and entity.id != other_group.id,
+                             "Entity %s should have been marked as valid" % str(entity))
+        self.assertTrue(other_group.id in [entity.id for entity in non_validated 
+                                           if entity.__class__.__name__ == "AlgorithmGroup"],
+                        "Group from another module should not have been marked as valid")
 
         
 def suite():
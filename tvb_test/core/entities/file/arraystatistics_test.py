@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#
+"""
+Tests for the statistics of arrays written in chunks.
+"""
+
+import numpy
+import unittest
+from tvb.core.entities.file import arraystatistics
+from tvb.core.entities.file.arraystatistics import ArrayStatistics
+
+KEYS = ("Minimum", "Maximum", "Mean", "Variance")
+
+
+
+class ArrayStatisticsTest(unittest.TestCase):
+    """
+    Tests for tvb.core.entities.file.arraystatistics module.
+    """
+    
+    def _accumulate(self, data, chunk_length, axes=None, grow_dimension=0):
+        """ Feed data in chunks along grow_dimension and return the resulting meta-data."""
+        statistics = ArrayStatistics(axes)
+        for start in xrange(0, data.shape[grow_dimension], chunk_length):
+            chunk_slice = [slice(None)] * data.ndim
+            chunk_slice[grow_dimension] = slice(start, start + chunk_length)
+            statistics.update(data[tuple(chunk_slice)], grow_dimension)
+        return statistics.to_metadata(*KEYS)
+    
+    
+    def test_global_statistics(self):
+        """
+        Statistics merged from chunks of any length match those of the full array.
+        """
+        data = numpy.random.randn(101, 2, 7, 3) * 1000 + 1e6
+        for chunk_length in (1, 10, 101):
+            metadata = self._accumulate(data, chunk_length)
+            self.assertEqual(data.min(), metadata["Minimum"])
+            self.assertEqual(data.max(), metadata["Maximum"])
+            self.assertTrue(numpy.allclose(data.mean(), metadata["Mean"], rtol=1e-12))
+            self.assertTrue(numpy.allclose(data.var(), metadata["Variance"], rtol=1e-9))
+            self.assertEqual(0, metadata[arraystatistics.METADATA_ARRAY_NAN_COUNT])
+    
+    
+    def test_nan_and_integer_values(self):
+        """
+        NaN values are counted and ignored. Integer data is supported.
+        """
+        data = numpy.arange(40, dtype=numpy.float64).reshape(20, 2)
+        data[3, 1] = numpy.nan
+        data[15, 0] = numpy.nan
+        metadata = self._accumulate(data, 7)
+        valid = data[~numpy.isnan(data)]
+        self.assertEqual(2, metadata[arraystatistics.METADATA_ARRAY_NAN_COUNT])
+        self.assertEqual(valid.min(), metadata["Minimum"])
+        self.assertEqual(valid.max(), metadata["Maximum"])
+        self.assertTrue(numpy.allclose(valid.mean(), metadata["Mean"]))
+        self.assertTrue(numpy.allclose(valid.var(), metadata["Variance"]))
+        
+        metadata = self._accumulate(numpy.arange(40).reshape(20, 2), 3)
+        self.assertEqual(0, metadata["Minimum"])
+        self.assertEqual(39, metadata["Maximum"])
+        self.assertTrue(numpy.allclose(numpy.arange(40).var(), metadata["Variance"]))
+        
+        
+    def test_per_axes_statistics(self):
+        """
+        Statistics kept per state-variable and mode, and only the requested keys returned.
+        """
+        data = numpy.random.rand(50, 2, 5, 3)
+        statistics = ArrayStatistics((3, 1))
+        for start in xrange(0, 50, 8):
+            statistics.update(data[start: start + 8], 0)
+        metadata = statistics.to_metadata(*KEYS, included_keys=["Minimum", "Variance"])
+        self.assertFalse("Mean" in metadata)
+        self.assertEqual([1, 3], list(metadata[arraystatistics.METADATA_STATISTICS_AXES]))
+        suffix = arraystatistics.METADATA_PER_AXES_SUFFIX
+        self.assertTrue(numpy.allclose(data.min(axis=(0, 2)), metadata["Minimum" + suffix]))
+        self.assertTrue(numpy.allclose(data.var(axis=(0, 2)), metadata["Variance" + suffix]))
+        self.assertEqual(data.min(), metadata["Minimum"])
+        
+        ## When chunks grow along a statistics axis, only global statistics are kept.
+        metadata = self._accumulate(data, 1, axes=(1,), grow_dimension=1)
+        self.assertFalse("Minimum" + suffix in metadata)
+        self.assertTrue(numpy.allclose(data.var(), metadata["Variance"]))
+        
+        
+    def test_no_chunks(self):
+        """
+        Nothing to be written, when no chunk was received.
+        """
+        self.assertTrue(ArrayStatistics().to_metadata(*KEYS) is None)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(ArrayStatisticsTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Tests for the pre-computed envelopes of time-series.
+"""
+
+import os
+import shutil
+import numpy
+import unittest
+from tvb.basic.config.settings import TVBSettings as cfg
+from tvb.core.entities.file import envelopes
+from tvb.datatypes.time_series import TimeSeries
+
+
+
+class EnvelopesTest(unittest.TestCase):
+    """
+    Tests for tvb.core.entities.file.envelopes module.
+    """
+    
+    def setUp(self):
+        self.min_length = envelopes.ENVELOPE_MIN_LENGTH
+        envelopes.ENVELOPE_MIN_LENGTH = 4
+        self.storage_folder = os.path.join(cfg.TVB_STORAGE, "test_envelopes")
+        if os.path.exists(self.storage_folder):
+            shutil.rmtree(self.storage_folder)
+        os.makedirs(self.storage_folder)
+        
+        
+    def tearDown(self):
+        envelopes.ENVELOPE_MIN_LENGTH = self.min_length
+        if os.path.exists(self.storage_folder):
+            shutil.rmtree(self.storage_folder)
+        
+        
+    def test_levels_selection(self):
+        """
+        Check the level chosen for drawing a window.
+        """
+        self.assertEqual(0, envelopes.select_level(15, 10, 5))
+        self.assertEqual(3, envelopes.select_level(100, 10, 5))
+        self.assertEqual(2, envelopes.select_level(100, 10, 2))
+        self.assertEqual(0, envelopes.select_level(100, 10, 0))
+        
+        
+    def test_builder(self):
+        """
+        Check that envelopes built from chunks of any length match min / max over each window.
+        """
+        data = numpy.random.random((101, 3))
+        for chunk_length in [1, 3, 8, 1000]:
+            written = {}
+            
+            def _write(level, minimums, maximums):
+                written.setdefault(level, ([], []))
+                written[level][0].append(minimums)
+                written[level][1].append(maximums)
+                
+            builder = envelopes.EnvelopeBuilder(_write)
+            for start in xrange(0, len(data), chunk_length):
+                builder.add_chunk(data[start: start + chunk_length])
+            ## Level 5 is the coarsest one with at least 4 points (ceil(101 / 32) = 4).
+            self.assertEqual(5, builder.finish())
+            self.assertEqual(101, builder.length)
+            self.assertEqual(range(envelopes.ENVELOPE_FIRST_LEVEL, 6), sorted(written.keys()))
+            for level, (minimums, maximums) in written.iteritems():
+                factor = 2 ** level
+                expected_min = [data[i: i + factor].min(axis=0) for i in xrange(0, len(data), factor)]
+                expected_max = [data[i: i + factor].max(axis=0) for i in xrange(0, len(data), factor)]
+                self.assertTrue(numpy.allclose(expected_min, numpy.concatenate(minimums)))
+                self.assertTrue(numpy.allclose(expected_max, numpy.concatenate(maximums)))
+                
+                
+    def test_builder_short_data(self):
+        """
+        No level is written for data too short for a pyramid.
+        """
+        written = []
+        builder = envelopes.EnvelopeBuilder(lambda level, minimums, maximums: written.append(level))
+        builder.add_chunk(numpy.random.random((10, 3)))
+        self.assertEqual(0, builder.finish())
+        self.assertEqual([], written)
+        
+        
+    def test_write_time_series(self):
+        """
+        Envelopes are stored while a TimeSeries is written in chunks, and only read afterwards.
+        """
+        data = numpy.random.random((101, 2, 3, 1))
+        time_series = TimeSeries(storage_path=self.storage_folder)
+        for start in xrange(0, len(data), 10):
+            time_series.write_data_slice(data[start: start + 10])
+        time_series.close_file()
+        self.assertEqual(5, time_series.get_envelope_levels())
+        
+        envelope = time_series.read_data_envelope(0, 101, 10, "[null,1,null,0]")
+        ## ceil(101 / 16) = 7 points for level 4 are not enough for 10 pixels, so level 3 is used.
+        self.assertEqual((2, 13, 3), envelope.shape)
+        expected_min = [data[i: i + 8, 1, :, 0].min(axis=0) for i in xrange(0, len(data), 8)]
+        expected_max = [data[i: i + 8, 1, :, 0].max(axis=0) for i in xrange(0, len(data), 8)]
+        self.assertTrue(numpy.allclose(expected_min, envelope[0]))
+        self.assertTrue(numpy.allclose(expected_max, envelope[1]))
+        
+        ## Short windows are read at full resolution.
+        envelope = time_series.read_data_envelope(20, 30, 10, "[null,1,null,0]")
+        self.assertTrue(numpy.allclose(data[20:30, 1, :, 0], envelope[0]))
+        self.assertTrue(numpy.allclose(data[20:30, 1, :, 0], envelope[1]))
+    
+    
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(EnvelopesTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -25,6 +25,10 @@ import unittest
 from tvb_test.core.entities.file import fileshelper_test
 from tvb_test.core.entities.file import metadatahandler_test
 from tvb_test.core.entities.file import hdf5storage_test
+from tvb_test.core.entities.file import payloadcache_test
+from tvb_test.core.entities.file import envelopes_test
+from tvb_test.core.entities.file import zipstream_test
+from tvb_test.core.entities.file import arraystatistics_test
 
 
 def suite():
@@ -35,6 +39,10 @@ def suite():
     test_suite.addTest(fileshelper_test.suite())
     test_suite.addTest(metadatahandler_test.suite())
     test_suite.addTest(hdf5storage_test.suite())
+    test_suite.addTest(payloadcache_test.suite())
+    test_suite.addTest(envelopes_test.suite())
+    test_suite.addTest(zipstream_test.suite())
+    test_suite.addTest(arraystatistics_test.suite())
     return test_suite
 
 
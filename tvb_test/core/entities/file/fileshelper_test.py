@@ -24,7 +24,10 @@
 """
 
 import os
+import json
+import shutil
 import unittest
+import zipfile
 from tvb.basic.config.settings import TVBSettings as cfg
 from tvb.basic.traits.types_mapped import MappedType
 from tvb.core.entities.file.metadatahandler import XMLReader
@@ -237,6 +240,48 @@ class FilesHelperTest(TransactionalTestCase):
         folder_name = "test_folder"
         self.assertFalse(os.path.isdir(folder_name), "Folder should not exist before call.")
         self.assertRaises(FileStructureException, self.files_helper.remove_folder, folder_name, False)
+        
+        
+    def test_unpack_zip_resume(self):
+        """
+        Unpack an archive in parallel, after an interrupted unpack recorded some members in the checkpoint.
+        Recorded members with the correct size on disk should not be extracted again.
+        """
+        temp_folder = os.path.join(cfg.TVB_TEMP_FOLDER, "test_unpack")
+        zip_path = temp_folder + ".zip"
+        checkpoint_file = temp_folder + ".checkpoint"
+        if not os.path.exists(cfg.TVB_TEMP_FOLDER):
+            os.makedirs(cfg.TVB_TEMP_FOLDER)
+        members = dict(("folder_%d/file_%d.txt" % (i % 3, i), "content %d " % i * (i + 1)) for i in range(10))
+        try:
+            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_arch:
+                for name, content in members.iteritems():
+                    zip_arch.writestr(name, content)
+            ## Simulate a previous unpack interrupted after extracting one member (marked to be recognized). 
+            already_extracted = "folder_0/file_3.txt"
+            self.files_helper.copy_file(zipfile.ZipFile(zip_path).open(already_extracted),
+                                        os.path.join(temp_folder, already_extracted))
+            with open(os.path.join(temp_folder, already_extracted), 'r+b') as marked_file:
+                marked_file.write("C")
+            with open(checkpoint_file, 'w') as checkpoint:
+                checkpoint.write(json.dumps(already_extracted) + "\n" + '"folder_1/fi')
+            
+            result = self.files_helper.unpack_zip(zip_path, temp_folder, checkpoint_file)
+            self.assertEqual(len(members), len(result))
+            for name, content in members.iteritems():
+                with open(os.path.join(temp_folder, name), 'rb') as extracted_file:
+                    if name == already_extracted:
+                        content = "C" + content[1:]
+                    self.assertEqual(content, extracted_file.read(), "Member %s not correctly extracted." % name)
+            self.assertEqual(set(members.keys()), self.files_helper._read_unpack_checkpoint(checkpoint_file))
+        finally:
+            for path in (zip_path, checkpoint_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            if os.path.exists(temp_folder):
+                shutil.rmtree(temp_folder)
+        
+        
 
 def suite():
     """
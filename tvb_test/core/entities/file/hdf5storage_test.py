@@ -28,9 +28,12 @@ import unittest
 import os
 import shutil 
 import tvb.core.entities.file.hdf5storage as hdf5
+from tvb.core.entities.file.hdf5pool import HDF5FilePool
 import numpy as numpy 
+from scipy import sparse
 from tvb.basic.config.settings import TVBSettings as cfg
 from tvb.core.entities.file.exceptions import FileStructureException, MissingDataSetException
+from tvb.core.traits.types_mapped import SparseMatrix
 
 
 # Some constants used by tests
@@ -264,6 +267,47 @@ class HDF5StorageTest(unittest.TestCase):
             read_data = self.storage.get_data(DATASET_NAME_1, sl)
             self.assertArrayEqual(self.test_2D_array[sl], read_data, "Did not get the expected data")
             
+    def test_data_group(self):
+        """
+        Store and read back (slices of) several data sets and the meta-data of their node, in one call.
+        """
+        self.storage.store_data_group({DATASET_NAME_1: self.test_2D_array, DATASET_NAME_2: self.test_3D_array},
+                                      META_DICT, STORE_PATH)
+        read_meta, read_2d, read_3d = self.storage.get_data_group([(DATASET_NAME_1, slice(2, 5)), 
+                                                                   (DATASET_NAME_2, None)], STORE_PATH, True)
+        self.assertEqual(META_VALUE, read_meta[META_KEY], "Retrieved meta value is not correct")
+        self.assertArrayEqual(self.test_2D_array[2:5], read_2d, "Did not get the expected data")
+        self.assertArrayEqual(self.test_3D_array, read_3d, "Did not get the expected data")
+        self.assertRaises(MissingDataSetException, self.storage.get_data_group, [("missing", None)], STORE_PATH)
+        
+    def test_sparse_matrix_storage(self):
+        """
+        Store CSR, CSC and COO matrices, then read them back in full, or one row / column at a time.
+        """
+        storage = self.storage
+        
+        class _SparseHolder(object):
+            """ Minimal DataType-like owner of a sparse matrix."""
+            gid = "sparse-test-gid"
+            def _get_file_storage_mng(self):
+                return storage
+        
+        holder = _SparseHolder()
+        matrix = sparse.rand(20, 30, density=0.1, format='csr')
+        for mtx_format in ('csr', 'csc', 'coo'):
+            data_name = "matrix_" + mtx_format
+            SparseMatrix._store_sparse_matrix(holder, matrix.asformat(mtx_format), data_name)
+            read_matrix = SparseMatrix._read_sparse_matrix(holder, data_name)
+            self.assertEqual(mtx_format, read_matrix.format)
+            self.assertEqual((20, 30), read_matrix.shape)
+            self.assertArrayEqual(matrix.toarray(), read_matrix.toarray())
+            for index in (0, 7, 19):
+                self.assertArrayEqual(matrix.toarray()[index], 
+                                      SparseMatrix.read_sparse_vector(holder, data_name, index))
+                self.assertArrayEqual(matrix.toarray()[:, index], 
+                                      SparseMatrix.read_sparse_vector(holder, data_name, index, axis=1))
+        self.assertRaises(IndexError, SparseMatrix.read_sparse_vector, holder, "matrix_csr", 20)
+            
     def test_add_metadata(self):
         """
         This method checks metadata add for root or a dataset
@@ -422,6 +466,187 @@ class HDF5StorageTest(unittest.TestCase):
         self.assertArrayEqual(cfg.DATA_VERSION, read_data[cfg.DATA_VERSION_ATTRIBUTE], 
                               "Did not get the expected data version")
         
+    def test_append_expected_rows(self):
+        """
+        Test appending with a small buffer, when the data set is pre-sized by expected_rows.
+        The data set should be trimmed to the real length when reading it.
+        """
+        storage = hdf5.HDF5StorageManager(self.storage_folder, STORAGE_FILE_NAME, buffer_size=100)
+        for index in range(self.test_2D_array.shape[0]):
+            storage.append_data(DATASET_NAME_1, self.test_2D_array[index:index + 1], grow_dimension=0, 
+                                expected_rows=50, close_file=False)
+        self.assertEqual(self.test_2D_array.shape, storage.get_data_shape(DATASET_NAME_1))
+        read_data = storage.get_data(DATASET_NAME_1)
+        self.assertArrayEqual(self.test_2D_array, read_data, "Did not get the expected data")
+        
+    def test_async_append(self):
+        """
+        Test that appending from a background writer gives the same result as the synchronous path.
+        """
+        storage = hdf5.HDF5StorageManager(self.storage_folder, STORAGE_FILE_NAME, buffer_size=100)
+        storage.enable_async_writes(2)
+        for index in range(self.test_2D_array.shape[0]):
+            chunk = self.test_2D_array[index:index + 1].copy()
+            storage.append_data(DATASET_NAME_1, chunk, grow_dimension=0, close_file=False)
+            ## The caller is free to reuse its array, after append returns.
+            chunk[:] = -1
+        storage.close_file()
+        read_data = self.storage.get_data(DATASET_NAME_1)
+        self.assertArrayEqual(self.test_2D_array, read_data, "Did not get the expected data")
+        
+    def test_async_append_close(self):
+        """
+        Test that close_file=True is honoured with asynchronous writes: data is written and the file released.
+        """
+        files_pool = HDF5FilePool(max_open_files=2)
+        storage = hdf5.HDF5StorageManager(self.storage_folder, STORAGE_FILE_NAME, files_pool=files_pool)
+        storage.enable_async_writes(2)
+        storage.append_data(DATASET_NAME_1, self.test_2D_array, grow_dimension=0)
+        self.assertEqual(0, files_pool.open_files_count())
+        self.assertArrayEqual(self.test_2D_array, storage.get_data(DATASET_NAME_1))
+        
+    def test_async_append_error(self):
+        """
+        Test that an error in the background writer is raised in the caller thread.
+        """
+        storage = hdf5.HDF5StorageManager(self.storage_folder, STORAGE_FILE_NAME)
+        storage.enable_async_writes(2)
+        storage.append_data(DATASET_NAME_1, self.test_2D_array, grow_dimension=0, close_file=False)
+        storage.append_data(DATASET_NAME_1, self.test_3D_array, grow_dimension=0, close_file=False)
+        self.assertRaises(FileStructureException, storage.close_file)
+        
+    def test_memmap_read(self):
+        """
+        Test that contiguous data sets can be read as read-only memory-mapped views.
+        """
+        self.storage.store_data(DATASET_NAME_1, self.test_2D_array)
+        read_data = self.storage.get_data(DATASET_NAME_1, use_memmap=True)
+        self.assertTrue(isinstance(read_data, numpy.memmap), "Expected a memory-mapped view")
+        self.assertFalse(read_data.flags.writeable, "Memory-mapped view should be read-only")
+        self.assertArrayEqual(self.test_2D_array, read_data, "Did not get the expected data")
+        
+        slices = (slice(1, 5, 1), slice(2, 8, 2))
+        read_data = self.storage.get_data(DATASET_NAME_1, slices, use_memmap=True)
+        self.assertArrayEqual(self.test_2D_array[slices], read_data, "Did not get the expected data")
+        
+    def test_memmap_read_chunked(self):
+        """
+        Test that chunked data sets (written through append) fall back to an in-memory copy.
+        """
+        self.storage.append_data(DATASET_NAME_1, self.test_3D_array)
+        read_data = self.storage.get_data(DATASET_NAME_1, use_memmap=True)
+        self.assertFalse(isinstance(read_data, numpy.memmap), "Chunked data should not be memory-mapped")
+        self.assertArrayEqual(self.test_3D_array, read_data, "Did not get the expected data")
+        
+    def test_layout_chunk_shape(self):
+        """
+        Test chunk shapes computed for time-major and space-major access patterns.
+        """
+        data_shape = (1000, 2, 100, 1)
+        time_major = hdf5.DataSetLayout(hdf5.DataSetLayout.ACCESS_TIME_MAJOR, block_size=8 * 2 * 100 * 10)
+        self.assertEqual((10, 2, 100, 1), time_major.compute_chunk_shape(data_shape, 8))
+        space_major = hdf5.DataSetLayout(hdf5.DataSetLayout.ACCESS_SPACE_MAJOR, block_size=8 * 1000 * 2)
+        self.assertEqual((1000, 1, 2, 1), space_major.compute_chunk_shape(data_shape, 8))
+        contiguous = hdf5.DataSetLayout(hdf5.DataSetLayout.ACCESS_CONTIGUOUS)
+        self.assertEqual(None, contiguous.compute_chunk_shape(data_shape, 8))
+        self.assertRaises(FileStructureException, hdf5.DataSetLayout, compression="invalid")
+        
+    def test_store_with_layout(self):
+        """
+        Test storing and appending data with a compressed layout.
+        """
+        layout = hdf5.DataSetLayout(compression=hdf5.DataSetLayout.COMPRESSION_GZIP, shuffle=True)
+        self.storage.store_data(DATASET_NAME_1, self.test_2D_array, layout=layout)
+        for index in range(self.test_3D_array.shape[0]):
+            self.storage.append_data(DATASET_NAME_2, self.test_3D_array[index:index + 1], grow_dimension=0,
+                                     expected_rows=3, close_file=False, layout=layout)
+        self.storage.close_file()
+        self.assertArrayEqual(self.test_2D_array, self.storage.get_data(DATASET_NAME_1), "Did not get the expected data")
+        self.assertArrayEqual(self.test_3D_array, self.storage.get_data(DATASET_NAME_2), "Did not get the expected data")
+        
+    def test_apply_layouts(self):
+        """
+        Test that re-writing a file with a new layout keeps data and meta-data unchanged.
+        """
+        self.storage.store_data(DATASET_NAME_1, self.test_2D_array)
+        self.storage.store_data(DATASET_NAME_2, self.test_3D_array, STORE_PATH)
+        self.storage.set_metadata(META_DICT, DATASET_NAME_1)
+        self.storage.set_metadata(META_DICT)
+        
+        layout = hdf5.DataSetLayout(hdf5.DataSetLayout.ACCESS_SPACE_MAJOR, compression=hdf5.DataSetLayout.COMPRESSION_GZIP)
+        self.storage.apply_layouts({'/' + DATASET_NAME_1: layout})
+        
+        self.assertArrayEqual(self.test_2D_array, self.storage.get_data(DATASET_NAME_1), "Did not get the expected data")
+        self.assertArrayEqual(self.test_3D_array, self.storage.get_data(DATASET_NAME_2, where=STORE_PATH), 
+                              "Did not get the expected data")
+        self.assertEqual(META_VALUE, self.storage.get_metadata(DATASET_NAME_1)[META_KEY])
+        self.assertEqual(META_VALUE, self.storage.get_metadata()[META_KEY])
+        self.assertEqual(cfg.DATA_VERSION, self.storage.get_file_data_version())
+        
+    def test_pooled_file_reused(self):
+        """
+        Test that consecutive reads, from different managers, share the same open file handle.
+        """
+        files_pool = HDF5FilePool(max_open_files=2)
+        storage = hdf5.HDF5StorageManager(self.storage_folder, STORAGE_FILE_NAME, files_pool=files_pool)
+        storage.store_data(DATASET_NAME_1, self.test_2D_array)
+        full_path = os.path.join(self.storage_folder, STORAGE_FILE_NAME)
+        first_handle = files_pool.acquire(full_path, 'r')
+        files_pool.release(full_path)
+        
+        other_storage = hdf5.HDF5StorageManager(self.storage_folder, STORAGE_FILE_NAME, files_pool=files_pool)
+        read_data = other_storage.get_data(DATASET_NAME_1)
+        self.assertArrayEqual(self.test_2D_array, read_data, "Did not get the expected data")
+        self.assertTrue(first_handle is files_pool.acquire(full_path, 'r'), "File was re-opened")
+        files_pool.release(full_path)
+        self.assertEqual(1, files_pool.open_files_count())
+        
+        files_pool.invalidate(full_path)
+        self.assertEqual(0, files_pool.open_files_count())
+        self.assertFalse(first_handle.fid.valid, "File was not closed on invalidate")
+        
+    def test_pool_eviction(self):
+        """
+        Test that the least recently used idle files are closed, when the pool is full.
+        """
+        files_pool = HDF5FilePool(max_open_files=2)
+        for idx in range(4):
+            storage = hdf5.HDF5StorageManager(self.storage_folder, str(idx) + STORAGE_FILE_NAME, 
+                                              files_pool=files_pool)
+            storage.store_data(DATASET_NAME_1, self.test_2D_array)
+            storage.get_data(DATASET_NAME_1)
+        self.assertEqual(2, files_pool.open_files_count())
+        files_pool.close_all()
+        self.assertEqual(0, files_pool.open_files_count())
+        
+    def test_pool_closes_append_handles(self):
+        """
+        Test that files opened for writing are not kept open once released (other processes might write them).
+        """
+        files_pool = HDF5FilePool(max_open_files=2)
+        storage = hdf5.HDF5StorageManager(self.storage_folder, STORAGE_FILE_NAME, files_pool=files_pool)
+        storage.append_data(DATASET_NAME_1, self.test_2D_array, close_file=False)
+        self.assertEqual(1, files_pool.open_files_count())
+        storage.close_file()
+        self.assertEqual(0, files_pool.open_files_count())
+        
+    def test_pool_upgrade_same_thread(self):
+        """
+        Test that a thread still holding a read handle can ask for the same file in append mode.
+        """
+        files_pool = HDF5FilePool(max_open_files=2)
+        storage = hdf5.HDF5StorageManager(self.storage_folder, STORAGE_FILE_NAME, files_pool=files_pool)
+        storage.store_data(DATASET_NAME_1, self.test_2D_array)
+        full_path = os.path.join(self.storage_folder, STORAGE_FILE_NAME)
+        read_handle = files_pool.acquire(full_path, 'r')
+        
+        other_storage = hdf5.HDF5StorageManager(self.storage_folder, STORAGE_FILE_NAME, files_pool=files_pool)
+        other_storage.store_data(DATASET_NAME_2, self.test_3D_array)
+        self.assertFalse(read_handle.fid.valid, "Read handle should have been replaced")
+        files_pool.release(full_path)
+        self.assertEqual(0, files_pool.open_files_count())
+        self.assertArrayEqual(self.test_3D_array, storage.get_data(DATASET_NAME_2))
+        
 def suite():
     """
     Gather all the tests in a test suite.
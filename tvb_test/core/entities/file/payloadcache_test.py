@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Tests for the cache of serialized payloads.
+"""
+
+import unittest
+from tvb.core.entities.file.payloadcache import PayloadsCache
+
+
+
+class PayloadsCacheTest(unittest.TestCase):
+    """
+    Tests for tvb.core.entities.file.payloadcache.PayloadsCache class.
+    """
+    
+    def setUp(self):
+        """
+        Create a small cache, to easily go over its size limit.
+        """
+        self.cache = PayloadsCache(max_size=10)
+        
+        
+    def test_get_put(self):
+        """
+        Check that stored payloads are returned, and hits / misses are counted.
+        """
+        self.assertTrue(self.cache.get(("gid1", "weights")) is None)
+        self.cache.put(("gid1", "weights"), "1234")
+        self.assertEqual("1234", self.cache.get(("gid1", "weights")))
+        statistics = self.cache.get_statistics()
+        self.assertEqual(1, statistics['hits'])
+        self.assertEqual(1, statistics['misses'])
+        self.assertEqual(4, statistics['size'])
+        
+        
+    def test_size_eviction(self):
+        """
+        Check that least recently used payloads are dropped, when over the size limit.
+        """
+        self.cache.put(("gid1", "weights"), "1234")
+        self.cache.put(("gid2", "weights"), "1234")
+        self.cache.get(("gid1", "weights"))
+        self.cache.put(("gid3", "weights"), "1234")
+        self.assertTrue(self.cache.get(("gid2", "weights")) is None)
+        self.assertEqual("1234", self.cache.get(("gid1", "weights")))
+        self.assertEqual("1234", self.cache.get(("gid3", "weights")))
+        self.cache.put(("gid4", "weights"), "12345678901")
+        self.assertTrue(self.cache.get(("gid4", "weights")) is None)
+        self.assertEqual(8, self.cache.get_statistics()['size'])
+        self.assertEqual(1, self.cache.get_statistics()['evictions'])
+        
+        
+    def test_invalidate(self):
+        """
+        Check that all payloads for a GID are removed at once.
+        """
+        self.cache.put(("gid1", "weights"), "12")
+        self.cache.put(("gid1", "centres"), "12")
+        self.cache.put(("gid2", "weights"), "12")
+        self.cache.invalidate("gid1")
+        self.assertTrue(self.cache.get(("gid1", "weights")) is None)
+        self.assertTrue(self.cache.get(("gid1", "centres")) is None)
+        self.assertEqual("12", self.cache.get(("gid2", "weights")))
+        self.assertEqual(2, self.cache.get_statistics()['size'])
+    
+    
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(PayloadsCacheTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and 
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Tests for the streamed ZIP archives.
+"""
+
+import os
+import zlib
+import shutil
+import tempfile
+import unittest
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED
+from tvb.core.entities.file.zipstream import ZipStreamer, ZipMember, crc32_combine
+
+
+
+class ZipStreamerTest(unittest.TestCase):
+    """
+    Tests for tvb.core.entities.file.zipstream module.
+    """
+    
+    def setUp(self):
+        """
+        Create a folder with a few files, spanning multiple chunks.
+        """
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.folder, 'sub'))
+        self.files = {'text.txt': 'TVB ' * 100000,
+                      'empty.txt': '',
+                      os.path.join('sub', 'data.h5'): os.urandom(300000),
+                      os.path.join('sub', 'data.bin'): os.urandom(250000) + 'x' * 100000}
+        for file_name, content in self.files.iteritems():
+            with open(os.path.join(self.folder, file_name), 'wb') as file_writer:
+                file_writer.write(content)
+        self.zip_path = os.path.join(self.folder, 'result.zip')
+        
+        
+    def tearDown(self):
+        """
+        Remove temporary files.
+        """
+        shutil.rmtree(self.folder)
+        
+        
+    def test_crc32_combine(self):
+        """
+        Check that CRC of two blocks combined is the CRC of their concatenation.
+        """
+        first, second = os.urandom(1000), os.urandom(12345)
+        self.assertEqual(zlib.crc32(first + second) & 0xffffffff,
+                         crc32_combine(zlib.crc32(first), zlib.crc32(second), len(second)))
+        self.assertEqual(zlib.crc32(first) & 0xffffffff, crc32_combine(zlib.crc32(first), 0, 0))
+        
+        
+    def _check_archive(self, processes):
+        """
+        Write the test folder (and an in-memory member) in a ZIP and check it can be read back.
+        """
+        streamer = ZipStreamer(processes=processes, deflate_compressed=False, chunk_size=64 * 1024)
+        members = streamer.folder_members(self.folder) + [ZipMember('info.json', data='{"bursts": {}}')]
+        progress = []
+        streamer.write_to_file(self.zip_path, members, lambda processed, total: progress.append((processed, total)))
+        
+        expected_size = sum(len(content) for content in self.files.values()) + len('{"bursts": {}}')
+        self.assertEqual((expected_size, expected_size), progress[-1])
+        zip_file = ZipFile(self.zip_path)
+        try:
+            self.assertTrue(zip_file.testzip() is None)
+            for file_name, content in self.files.iteritems():
+                zip_name = file_name.replace(os.sep, '/')
+                self.assertEqual(content, zip_file.read(zip_name))
+                expected_type = ZIP_STORED if file_name.endswith('.h5') else ZIP_DEFLATED
+                self.assertEqual(expected_type, zip_file.getinfo(zip_name).compress_type)
+            self.assertEqual('{"bursts": {}}', zip_file.read('info.json'))
+        finally:
+            zip_file.close()
+        
+        
+    def test_single_process(self):
+        """
+        Members compressed in the current process.
+        """
+        self._check_archive(1)
+        
+        
+    def test_parallel_processes(self):
+        """
+        Members compressed in worker processes.
+        """
+        self._check_archive(3)
+        
+        
+    def test_stream(self):
+        """
+        Check that the streamed content is the same as the archive written on disk.
+        """
+        streamer = ZipStreamer(processes=1, chunk_size=64 * 1024)
+        members = streamer.folder_members(self.folder)
+        streamed = ''.join(streamer.stream(members))
+        streamer.write_to_file(self.zip_path, members)
+        with open(self.zip_path, 'rb') as zip_file:
+            written = zip_file.read()
+        self.assertEqual(len(written), len(streamed))
+        
+        
+        
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(ZipStreamerTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -66,6 +66,21 @@ class TransactionalTests(BaseTestCase):
         self.assertEqual(initial_user_count + n_of_users, final_user_count, error_msg)
     
     
+    def test_store_entities(self):
+        """
+        Store a list of entities at once, and check they are returned in the same order, with IDs set.
+        """
+        initial_user_count = dao.get_all_users(is_count=True)
+        users = [model.User('bulk_user_%d' % idx, 'password', 'mail', True, 'role') for idx in xrange(15)]
+        stored_users = dao.store_entities(users)
+        self.assertEqual(15, len(stored_users))
+        for idx, user in enumerate(stored_users):
+            self.assertTrue(user.id is not None)
+            self.assertEqual('bulk_user_%d' % idx, user.username)
+        self.assertEqual(initial_user_count + 15, dao.get_all_users(is_count=True))
+        self.assertEqual([], dao.store_entities([]))
+    
+    
     def test_transaction_rollback(self):
         """
         If an unhandled exception is raised by a method marked as transactional, all data should be rolled
@@ -75,7 +75,7 @@ class ImportServiceTest(TransactionalTestCase):
             shutil.rmtree(cfg.TVB_TEMP_FOLDER)
         
         ### Delete folder where data was exported
-        if os.path.exists(self.zip_path):
+        if self.zip_path is not None and os.path.exists(self.zip_path):
             shutil.rmtree(os.path.split(self.zip_path)[0])
             
         self.delete_project_folders()
@@ -165,6 +165,19 @@ class ImportServiceTest(TransactionalTestCase):
         except ProjectImportException:
             #OK, do nothing. The project already exists.
             pass
+        
+        
+    def test_store_datatypes_duplicate_gid(self):
+        """
+        A batch with a duplicate gid is rejected, but only the file of the duplicate DataType is removed.
+        """
+        existing = self.get_all_datatypes()[0]
+        valid = self._build_value_wrapper()
+        duplicate = self._build_value_wrapper(existing.gid)
+        self.assertNotEqual(valid.get_storage_file_path(), duplicate.get_storage_file_path())
+        self.assertRaises(ProjectImportException, self.import_service.store_datatypes, [valid, duplicate])
+        self.assertTrue(os.path.exists(valid.get_storage_file_path()), "File of a valid DataType was removed")
+        self.assertFalse(os.path.exists(duplicate.get_storage_file_path()), "File of the duplicate was kept")
 
 
     def _create_timeseries(self):
@@ -192,6 +205,20 @@ class ImportServiceTest(TransactionalTestCase):
         return ABCAdapter.load_entity_by_gid(valuew[0][2])
 
 
+    def _build_value_wrapper(self, gid=None):
+        """Build a ValueWrapper (not stored in DB yet), with an empty storage file under self.operation"""
+        value_ = ValueWrapper(data_value=5.0, data_name="my_value")
+        if gid is not None:
+            value_.gid = gid
+        value_.type = "ValueWrapper"
+        value_.module = "tvb.datatypes.mapped_values"
+        value_.subject = "John Doe"
+        value_.state = "RAW_STATE"
+        value_.set_operation_id(self.operation.id)
+        open(value_.get_storage_file_path(), 'w').close()
+        return value_
+
+
     def _store_entity(self, entity, type_, module):
         """Launch adapter to store a create a persistent DataType."""
         entity.type = type_
@@ -321,6 +321,34 @@ class OperationServiceTest(BaseTestCase):
         self.assertEqual(len(dts), 0)
         
         
+    def test_prepare_operations_three_ranges(self):
+        """
+        Test that operations are generated for all the combinations of 3 rangers, 
+        with the first ranger varying fastest, and stored in multiple batches.
+        """
+        group = dao.find_group("tvb_test.adapters.testadapter1", "TestAdapter1")
+        adapter = FlowService().build_adapter_instance(group)
+        algo_group = adapter.algorithm_group
+        algo_category = dao.get_category_by_id(algo_group.fk_category)
+        algo = dao.get_algorithm_by_group(algo_group.id)
+        data = {'first_range': 'test1_val1', 'test1_val1': [1, 2],
+                'second_range': 'test1_val2', 'test1_val2': [3, 4, 5],
+                'third_range': 'param_3', 'param_3': [6, 7]}
+        self.operation_service.OPERATIONS_BATCH_SIZE = 5
+        operations, group = self.operation_service.prepare_operations(self.test_user.id, self.test_project.id, algo,
+                                                                      algo_category, {}, ABCAdapter.LAUNCH_METHOD,
+                                                                      **data)
+        self.assertEqual(12, len(operations))
+        self.assertEqual(3, len(group.range_references))
+        self.assertEqual({'test1_val1': 1, 'test1_val2': 3, 'param_3': 6}, json.loads(operations[0].range_values))
+        self.assertEqual({'test1_val1': 2, 'test1_val2': 3, 'param_3': 6}, json.loads(operations[1].range_values))
+        last_parameters = json.loads(operations[-1].parameters)
+        self.assertEqual((2, 5, 7), (last_parameters['test1_val1'], last_parameters['test1_val2'],
+                                     last_parameters['param_3']))
+        self.assertFalse('first_range' in last_parameters)
+        self.assertEqual(12, len(set(operation.range_values for operation in operations)))
+        
+        
     def test_stop_operations(self):
         """
         Test that an operation is successfully stopped.
@@ -33,8 +33,9 @@ from tvb.core.utils import generate_guid
 from tvb.core.entities import model
 from tvb.core.entities.storage import dao
 from tvb.core.entities.transient.context_overlay import DataTypeOverlayDetails
+from tvb.core.entities.transient.pse import PSE_RESULTS_CACHE
 from tvb.core.services.exceptions import ProjectServiceException
-from tvb.core.services.projectservice import ProjectService, PROJECTS_PAGE_SIZE
+from tvb.core.services.projectservice import ProjectService, PROJECTS_PAGE_SIZE, STRUCTURES_CACHE
 from tvb.core.services.operationservice import OperationService
 from tvb.core.services.flowservice import FlowService
 from tvb.core.entities.transient.structure_entities import DataTypeMetaData
@@ -478,6 +479,29 @@ class ProjectServiceTest(TransactionalTestCase):
         self.assertEqual(pages_no, 1, "DataType Factory should only use one operation to store all it's datatypes.")
         resulted_dts = operations[0]['results']
         self.assertEqual(len(resulted_dts), 3, "3 datatypes should be created.")
+        for datatype in resulted_dts:
+            self.assertTrue(isinstance(datatype, Datatype1), "Results should be loaded with their specific class.")
+        self.assertEqual(operations[0]['user'].id, dt_factory.user.id)
+        self.assertTrue(operations[0]['algorithm'] is not None)
+        self.assertEqual(operations[0]['figures'], [])
+        
+        
+    def test_retrieve_project_full_group(self):
+        """
+        Operations in a group are listed as one row, with the group details and no individual results.
+        """
+        test_project = TestFactory.create_project(self.test_user)
+        datatypes, group_id = TestFactory.create_group(self.test_user, test_project)
+        _, ops_nr, operations, _ = self.project_service.retrieve_project_full(test_project.id)
+        self.assertEqual(ops_nr, 1, "Operations in group should be counted once.")
+        self.assertEqual(len(operations), 1)
+        self.assertEqual(operations[0]['count'], 2)
+        self.assertEqual(operations[0]['operation_group_id'], group_id)
+        datatype_group = dao.get_datatype_group_by_id(datatypes[0].fk_datatype_group)
+        self.assertEqual(operations[0]['datatype_group_gid'], datatype_group.gid)
+        self.assertEqual(operations[0]['gid'], dao.get_operationgroup_by_id(group_id).gid)
+        self.assertEqual(operations[0]['user'].id, self.test_user.id)
+        self.assertTrue(operations[0]['results'] is None)
         
         
     def test_get_project_structure(self):
@@ -492,6 +516,72 @@ class ProjectServiceTest(TransactionalTestCase):
             self.assertTrue(dt.gid in node_json, "Should have all datatypes present in resulting json.")
             
             
+    def test_get_project_structure_cached(self):
+        """
+        The tree is served from cache, until a new DataType gets stored in project.
+        """
+        dt_factory = datatypes_factory.DatatypesFactory()
+        self._create_datatypes(dt_factory, 2)
+        node_json = self.project_service.get_project_structure(dt_factory.project, None, 'Data_State', 'Data_Subject', None)
+        hits = STRUCTURES_CACHE.hits
+        cached_json = self.project_service.get_project_structure(dt_factory.project, None, 'Data_State', 'Data_Subject', None)
+        self.assertEqual(hits + 1, STRUCTURES_CACHE.hits)
+        self.assertEqual(node_json, cached_json)
+        
+        self._create_datatypes(dt_factory, 1)
+        node_json = self.project_service.get_project_structure(dt_factory.project, None, 'Data_State', 'Data_Subject', None)
+        project_dts = dao.get_datatypes_for_project(dt_factory.project.id)
+        self.assertEqual(3, len(project_dts))
+        for dt in project_dts:
+            self.assertTrue(dt.gid in node_json, "Should have all datatypes present in resulting json.")
+            
+            
+    def test_get_project_structure_after_remove(self):
+        """
+        Removing the newest DataType and storing another one (same count, maybe same max ID) refreshes the tree.
+        """
+        dt_factory = datatypes_factory.DatatypesFactory()
+        self._create_datatypes(dt_factory, 2)
+        self.project_service.get_project_structure(dt_factory.project, None, 'Data_State', 'Data_Subject', None)
+        removed_gid = dao.get_datatypes_for_project(dt_factory.project.id)[-1].gid
+        self.project_service.remove_datatype(dt_factory.project.id, removed_gid)
+        self._create_datatypes(dt_factory, 1)
+        
+        node_json = self.project_service.get_project_structure(dt_factory.project, None, 'Data_State', 'Data_Subject', None)
+        project_dts = dao.get_datatypes_for_project(dt_factory.project.id)
+        self.assertEqual(2, len(project_dts))
+        self.assertFalse(removed_gid in node_json, "Removed DataType should not be in resulting json.")
+        for dt in project_dts:
+            self.assertTrue(dt.gid in node_json, "Should have all datatypes present in resulting json.")
+            
+            
+    def test_remove_datatype_clears_pse_results(self):
+        """
+        Cached PSE results are dropped when a DataType (possibly a PSE result or measure) gets removed.
+        """
+        dt_factory = datatypes_factory.DatatypesFactory()
+        self._create_datatypes(dt_factory, 1)
+        PSE_RESULTS_CACHE['some_group_gid'] = 'cached results'
+        removed_gid = dao.get_datatypes_for_project(dt_factory.project.id)[-1].gid
+        self.project_service.remove_datatype(dt_factory.project.id, removed_gid)
+        self.assertEqual(0, len(PSE_RESULTS_CACHE))
+            
+            
+    def test_get_project_structure_group(self):
+        """
+        DataTypes from an operation group are shown as a single node, for their DataTypeGroup.
+        """
+        test_project = TestFactory.create_project(self.test_user)
+        datatypes, group_id = TestFactory.create_group(self.test_user, test_project)
+        node_json = self.project_service.get_project_structure(test_project, None, 'Data_State', 'Data_Subject', None)
+        datatype_group = dao.get_datatype_group_by_id(datatypes[0].fk_datatype_group)
+        operation_group = dao.get_operationgroup_by_id(group_id)
+        self.assertTrue(datatype_group.gid in node_json, "DataTypeGroup should be present in resulting json.")
+        self.assertTrue(operation_group.name in node_json, "Operation group name should be in resulting json.")
+        for datatype in datatypes:
+            self.assertFalse(datatype.gid in node_json, "DataTypes in group should not have their own nodes.")
+            
+            
 def suite():
     """
     Gather all the tests in a test suite.
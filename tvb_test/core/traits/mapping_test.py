@@ -31,6 +31,7 @@ from tvb.basic.traits import types_basic as basic
 from tvb.basic.traits.types_mapped import MappedType
 from tvb.core.entities import model
 from tvb.core.entities.storage import dao, SA_SESSIONMAKER
+from tvb.core.entities.file.payloadcache import ARRAYS_CACHE
 from tvb.core.services.flowservice import FlowService
 from tvb_test.core.test_factory import TestFactory
 from tvb_test.core.base_testcase import BaseTestCase
@@ -133,6 +134,74 @@ class MappingTest(BaseTestCase):
             self.assertEqual(metadata[actual_datatype.METADATA_ARRAY_MIN], 0)
             self.assertTrue(actual_datatype.METADATA_ARRAY_MEAN in metadata)
             self.assertEqual(metadata[actual_datatype.METADATA_ARRAY_MEAN], 7.5)
+            
+            
+    def test_arrays_shared_between_instances(self):
+        """
+        Arrays read from storage are shared (read-only) by all instances with the same GID.
+        """
+        ARRAYS_CACHE.clear()
+        gid = self._store_mapped_array("shared")
+        
+        first_data = dao.get_generic_entity(MappedArray, gid, 'gid')[0].array_data
+        second_data = dao.get_generic_entity(MappedArray, gid, 'gid')[0].array_data
+        self.assertTrue(first_data is second_data)
+        self.assertTrue(numpy.equal(numpy.arange(12).reshape((3, 4)), second_data).all())
+        self.assertFalse(second_data.flags.writeable)
+        statistics = ARRAYS_CACHE.get_statistics()
+        self.assertTrue(statistics['hits'] >= 1)
+        self.assertEqual(second_data.nbytes, statistics['size'])
+        
+        ## Writing the array again drops the shared copy.
+        datatype_inst = dao.get_generic_entity(MappedArray, gid, 'gid')[0]
+        datatype_inst.array_data = numpy.ones((2, 2))
+        self.assertEqual(0, ARRAYS_CACHE.get_statistics()['size'])
+        self.assertTrue(numpy.equal(numpy.ones((2, 2)), 
+                                    dao.get_generic_entity(MappedArray, gid, 'gid')[0].array_data).all())
+        
+        
+    def test_arrays_too_big_for_cache(self):
+        """
+        Arrays which do not fit in ARRAYS_CACHE stay on the instance, writeable, and are read only once.
+        """
+        ARRAYS_CACHE.clear()
+        gid = self._store_mapped_array("not shared")
+        initial_max_size = ARRAYS_CACHE.max_size
+        ARRAYS_CACHE.max_size = 8
+        try:
+            datatype_inst = dao.get_generic_entity(MappedArray, gid, 'gid')[0]
+            first_data = datatype_inst.array_data
+            self.assertTrue(first_data is datatype_inst.array_data)
+            self.assertTrue(first_data.flags.writeable)
+            self.assertEqual(0, ARRAYS_CACHE.get_statistics()['size'])
+        finally:
+            ARRAYS_CACHE.max_size = initial_max_size
+            
+            
+    def test_detach_cached_arrays(self):
+        """
+        An instance can get private copies of its shared arrays, and change them without touching other instances.
+        """
+        ARRAYS_CACHE.clear()
+        gid = self._store_mapped_array("detached")
+        shared_data = dao.get_generic_entity(MappedArray, gid, 'gid')[0].array_data
+        datatype_inst = dao.get_generic_entity(MappedArray, gid, 'gid')[0]
+        datatype_inst.detach_cached_arrays()
+        self.assertFalse(datatype_inst.array_data is shared_data)
+        datatype_inst.array_data[0, 0] = 100
+        self.assertEqual(100, datatype_inst.array_data[0, 0])
+        self.assertEqual(0, shared_data[0, 0])
+        self.assertEqual(0, dao.get_generic_entity(MappedArray, gid, 'gid')[0].array_data[0, 0])
+        
+        
+    def _store_mapped_array(self, title):
+        """Store a MappedArray with data 0..11 in a 3x4 array, and return its GID"""
+        storage_path = self.flow_service.file_helper.get_project_folder(self.operation.project, str(self.operation.id))
+        datatype_inst = MappedArray(title=title, d_type="MappedArray", storage_path=storage_path, 
+                                    module="tvb.datatypes.arrays", subject="John Doe", state="RAW", 
+                                    operation_id=self.operation.id)
+        datatype_inst.array_data = numpy.arange(12).reshape((3, 4))
+        return dao.store_entity(datatype_inst).gid
         
         
 def suite():
@@ -57,6 +57,17 @@ class ExplorationContollerTest(TransactionalTestCase, BaseControllersTest):
             self.assertEqual(entry[0]['dataType'], 'Datatype2')
             for key in ['Gid', 'color_weight', 'operationId', 'tooltip']:
                 self.assertTrue(key in entry[0])
+                
+                
+    def test_draw_parameter_exploration_refresh(self):
+        """
+        A second draw (e.g. after changing metrics) uses the cached group results, with the same outcome.
+        """
+        first_result = json.loads(self.param_c.draw_parameter_exploration(self.datatype_group.id, None, None))
+        second_result = json.loads(self.param_c.draw_parameter_exploration(self.datatype_group.id, 
+                                                                           'None', 'None'))
+        self.assertEqual(first_result['data'], second_result['data'])
+        self.assertEqual(first_result['series_array'], second_result['series_array'])
             
 def suite():
     """
@@ -24,7 +24,7 @@
 import unittest
 import cherrypy
 import tvb.interfaces.web.controllers.basecontroller as b_c
-from tvb.interfaces.web.controllers.flowcontroller import FlowController
+from tvb.interfaces.web.controllers.flowcontroller import FlowController, ADAPTER_FRAGMENT_VARS
 from tvb.core.entities.storage import dao
 from tvb_test.adapters.testadapter1 import TestAdapter1
 from tvb_test.datatypes.datatypes_factory import DatatypesFactory
@@ -143,6 +143,22 @@ class FlowContollerTest(TransactionalTestCase, BaseControllersTest):
         result = self.flow_c.get_simple_adapter_interface(adapter.id)
         expected_interface = TestAdapter1().get_input_tree()
         self.assertEqual(result['inputList'], expected_interface)
+        
+        
+    def test_adapter_fragment_key(self):
+        """
+        The cached adapter interface depends on the online help flag of the current user.
+        """
+        adapter = dao.find_group('tvb_test.adapters.testadapter1', 'TestAdapter1')
+        result = self.flow_c.get_simple_adapter_interface(adapter.id)
+        fragment_key = b_c.template_vars_key(*ADAPTER_FRAGMENT_VARS)
+        self.assertTrue(b_c.KEY_SHOW_ONLINE_HELP in result)
+        other_user_result = dict(result)
+        other_user_result[b_c.KEY_SHOW_ONLINE_HELP] = not result[b_c.KEY_SHOW_ONLINE_HELP]
+        self.assertNotEqual(fragment_key(result), fragment_key(other_user_result))
+        other_user_result = dict(result)
+        other_user_result[b_c.KEY_PARAMETERS_CONFIG] = not result[b_c.KEY_PARAMETERS_CONFIG]
+        self.assertNotEqual(fragment_key(result), fragment_key(other_user_result))
 
 def suite():
     """